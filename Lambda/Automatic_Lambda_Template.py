@@ -8,7 +8,6 @@ from formCell2EdgeMatrix import formCell2EdgeMatrix
 from formEdge2EdgeMatrix import formEdge2EdgeMatrix
 from formFace2EdgeMatrix import formFace2EdgeMatrix
 from formRectMeshConnectivity import formRectMeshConnectivity
-from makeRectMeshModelBlocks import makeRectMeshModelBlocks
 from solveRESnet import solveRESnet
 
 if __name__ == '__main__':
@@ -33,8 +32,7 @@ if __name__ == '__main__':
     # A model includes some blocks that can represent objects like sheets or lines when one or two dimensions vanish.
     blkLoc = np.array([-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf])  # a uniform half-space
     blkCon = np.array([1e-2])  # conductive property of the volumetric object (S/m)
-    # Get conductive property model vectors (convert the block-model description to values on edges, faces and cells)
-    cellCon, faceCon, edgeCon = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCon, [], [], [])
+    # The block-model description is converted to values on edges, faces and cells by Lambda (expandModelSpec)
 
     '''Setup the electric surveys (pole-dipole)'''
     # Define the current sources in the format of [x y z current(Ampere)]
@@ -54,7 +52,9 @@ if __name__ == '__main__':
 
 
 # Log in AWS
-# Send variables (nodeX, nodeY, nodeZ, cellCon、faceCon、edgeCon、tx、rx) to S3
+# Send variables (nodeX, nodeY, nodeZ, blkLoc, blkCon, tx, rx) to S3 with binary_payload.encode_arrays
+# Lambda expands the model on cells, faces and edges itself (expandModelSpec), so cellCon, faceCon and
+# edgeCon, each as long as the mesh is large, are not uploaded; add cellInd/cellVal etc. for sparse overrides
 # Wait until Lambda finishes
 # Get "data" back and run the following codes
 
@@ -1,14 +1,14 @@
-import json
-import time
-import boto3
 import numpy as np
 from matplotlib import pyplot as plt
-from makeRectMeshModelBlocks import makeRectMeshModelBlocks
+from cost_model import CostModel
+from lambda_dispatcher import merge_results
+from lambda_dispatcher import run_auto
+from result_cache import ResultCache
 
-# AWS S3 and Lambda configuration
+# AWS S3 and Lambda configuration (set RESNET_BACKEND=local to run offline with local_backend)
 bucket_name = 'inputdataset1'
-data_file_name = 'data1.json'
-result_file_name = 'processed-data1.json'
+data_file_prefix = 'data1'
+Nshards = 16  # maximum number of concurrent Lambda invocations
 lambda_function_name = 'resnet-0'
 
 # Generate data
@@ -23,7 +23,6 @@ def generate_data():
 
     blkLoc = np.array([-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf])
     blkCon = np.array([1e-2])
-    cellCon, faceCon, edgeCon = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCon, [], [], [])
 
     tx = np.array([[(0, 0, 0, 1), [-np.inf, 0, 0, -1]]])
     rx = np.array([[[10, 0, 0, 20, 0, 0],
@@ -37,57 +36,19 @@ def generate_data():
                     [90, 0, 0, 100, 0, 0]]])
 
     data = {
-        'nodeX': nodeX.tolist(),
-        'nodeY': nodeY.tolist(),
-        'nodeZ': nodeZ.tolist(),
-        'edgeCon': edgeCon.tolist(),
-        'faceCon': faceCon.tolist(),
-        'cellCon': cellCon.tolist(),
-        'tx': tx.tolist(),
-        'rx': rx.tolist()
+        'nodeX': nodeX,
+        'nodeY': nodeY,
+        'nodeZ': nodeZ,
+        'blkLoc': blkLoc,  # the model is expanded on the cells, faces and edges by Lambda
+        'blkCon': blkCon,
+        'tx': tx,
+        'rx': rx
     }
     
     return data, rx
 
-# Upload data to S3
-def upload_to_s3(data, bucket_name, file_name):
-    s3 = boto3.client('s3')
-    s3.put_object(Body=json.dumps(data), Bucket=bucket_name, Key=file_name)
-    print(f"Data uploaded to S3 bucket {bucket_name} with key {file_name}.")
-
-# Trigger Lambda function
-def trigger_lambda(lambda_function_name, payload):
-    lambda_client = boto3.client('lambda')
-    response = lambda_client.invoke(
-        FunctionName=lambda_function_name,
-        InvocationType='RequestResponse',
-        Payload=json.dumps(payload)
-    )
-    response_payload = json.loads(response['Payload'].read())
-    print(f"Lambda function {lambda_function_name} triggered. Response: {response_payload}")
-    return response_payload
-
-# Download results from S3
-def download_from_s3(bucket_name, file_name, local_file_path):
-    s3 = boto3.client('s3')
-    try:
-        s3.download_file(bucket_name, file_name, local_file_path)
-        print(f"Data downloaded from S3 bucket {bucket_name} with key {file_name} to {local_file_path}.")
-    except boto3.exceptions.S3UploadFailedError as e:
-        print(f"Failed to download file from S3: {e}")
-    except s3.exceptions.NoSuchKey as e:
-        print(f"The file {file_name} does not exist in the bucket {bucket_name}: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-
 # Process and plot results
-def process_and_plot(local_file_path, rx):
-    with open(local_file_path, 'r') as f:
-        data = json.load(f)
-    
-    potentials = np.array(data['potentials'])
-    dV = np.array(data['data'])
-
+def process_and_plot(dV, rx):
     '''Compare against analytic solutions'''
     Aloc = np.array([0, 0, 0])
     rAM = rx[0][:, 0] - Aloc[0]
@@ -122,37 +83,22 @@ def process_and_plot(local_file_path, rx):
 def main():
     # Step 1: Generate data
     data, rx = generate_data()
-    
-    # Step 2: Upload generated data to S3
-    upload_to_s3(data, bucket_name, data_file_name)
-    
-    # Step 3: Trigger Lambda function
-    lambda_payload = {'bucket_name': bucket_name, 'file_name': data_file_name}
-    trigger_lambda(lambda_function_name, lambda_payload)
-    
-    # Step 4: Wait for Lambda function to complete (this can be improved with event notifications)
-    time.sleep(10)  # 增加等待时间，确保Lambda函数完成
-    
-    # Step 5: Download results from S3
-    local_file_path = 'downloaded_data.json'
-    if check_file_exists(bucket_name, 'processed-data1.json'):
-        download_from_s3(bucket_name, 'processed-data1.json', local_file_path)
-    
-        # Step 6: Process and plot results
-        process_and_plot(local_file_path, rx)
-    else:
-        print("File not found, aborting download.")
 
-# Function to check if a file exists in S3
-def check_file_exists(bucket_name, file_name):
-    s3 = boto3.client('s3')
-    try:
-        s3.head_object(Bucket=bucket_name, Key=file_name)
-        print(f"File {file_name} exists in bucket {bucket_name}.")
-        return True
-    except s3.exceptions.ClientError as e:
-        print(f"File {file_name} does not exist in bucket {bucket_name}: {e}")
-        return False
+    # Step 2: Run locally or fan the shards of the survey out to Lambda, whichever the cost model predicts
+    # to finish first; shards computed before (same mesh, model and survey) are read from the result cache
+    results, plan = run_auto(data, CostModel(), lambda_function_name, bucket_name, outputs=['data'],
+                             max_concurrency=Nshards, prefix=data_file_prefix, cache=ResultCache(), remote_cache=True)
+    print(f"Ran on {plan['backend']} in {plan['Nshards']} shards: {plan['elapsed']:.3f} seconds "
+          f"(predicted {plan['time']:.3f} seconds)")
+    for i, result in enumerate(results):
+        if result['cached']:
+            print(f"Shard {i}: cached")
+        else:
+            print(f"Shard {i}: execution time {result['meta']['execution_time']:.3f} seconds")
+
+    # Step 3: Process and plot results (only the data are computed into the results and downloaded)
+    _, dV = merge_results(results)
+    process_and_plot(dV, rx)
 
 if __name__ == "__main__":
     main()
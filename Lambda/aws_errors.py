@@ -0,0 +1,12 @@
+# The ClientError of botocore, shared by the handler, the dispatcher and the local_backend stand-ins so
+# that the deployed handler does not import the local test harness
+try:
+    from botocore.exceptions import ClientError
+except ImportError:  # offline without boto3
+    class ClientError(Exception):
+        # Same attributes as botocore's, raised by the local_backend stand-ins
+        def __init__(self, error_response, operation_name):
+            super().__init__(f"An error occurred ({error_response['Error']['Code']}) when calling the "
+                             f"{operation_name} operation")
+            self.response = error_response
+            self.operation_name = operation_name
@@ -0,0 +1,260 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy
+
+from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from cost_model import CostModel
+from cost_model import problem_size
+from expandModelSpec import expandModelSpec
+from formCell2EdgeMatrix import formCell2EdgeMatrix
+from formEdge2EdgeMatrix import formEdge2EdgeMatrix
+from formFace2EdgeMatrix import formFace2EdgeMatrix
+from formRectMeshConnectivity import formRectMeshConnectivity
+from solveRESnet import factorizeRESnet
+from solveRESnet import solveRESnet
+
+# Scaling benchmark of the RESnet stages on synthetic meshes, configured by:
+#   RESNET_BENCH_NODES      numbers of nodes of the meshes (default 1e3,1e4,1e5,1e6)
+#   RESNET_BENCH_SOURCES    numbers of sources of the surveys on each mesh (default 1,16,64)
+#   RESNET_BENCH_REPEAT     runs of each stage, the fastest is reported (default 3)
+#   RESNET_BENCH_OUTPUT     JSON file of the results (default benchmark-results.json)
+#   RESNET_BENCH_BASELINE   JSON file of the results to compare with (default benchmark_baseline.json
+#                           next to this script); regressions exit with status 1. Times and peak memory
+#                           are compared only on the machine of the baseline (same fingerprint)
+#   RESNET_BENCH_TOLERANCE  relative increase of a time, peak memory or fill taken as a regression (default 0.25)
+#   RESNET_BENCH_RECORD     if set, the runs are recorded in the cost model (see cost_model.CostModel.record)
+MIN_TIME = 0.05  # s; smaller changes are noise of a shared machine
+MIN_MEMORY = 10  # MB; smaller changes are noise
+
+
+def make_spec(Nnodes, Ntx, Nrx=20, seed=0):
+    # Cube mesh of about Nnodes nodes over a conductive block in a half-space, surveyed by Ntx
+    # surface dipoles with Nrx receiver dipoles each
+    n = max(2, round(Nnodes ** (1 / 3)))
+    rng = np.random.default_rng(seed)
+    A = rng.uniform(-90, 80, size=(Ntx, 2))
+    M = rng.uniform(-90, 80, size=(Ntx, Nrx, 2))
+    tx = np.stack((np.column_stack((A, 0 * A[:, 0], 0 * A[:, 0] + 1)),
+                   np.column_stack((A + [10, 0], 0 * A[:, 0], 0 * A[:, 0] - 1))), axis=1)
+    rx = np.concatenate((M, 0 * M[:, :, :1], M + [10, 0], 0 * M[:, :, :1]), axis=2)
+    return {'nodeX': np.linspace(-100, 100, num=n), 'nodeY': np.linspace(-100, 100, num=n),
+            'nodeZ': np.linspace(0, -100, num=n),
+            'blkLoc': np.array([[-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf], [-20, 20, -20, 20, -10, -40]]),
+            'blkCon': np.array([1e-2, 1e-1]), 'tx': tx, 'rx': rx}
+
+
+def machine_fingerprint():
+    # Hardware the times and peak memory depend on: architecture, CPU model, number of CPUs and memory
+    cpu = platform.processor()
+    if os.path.isfile('/proc/cpuinfo'):
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 2 ** 30
+    return f'{platform.machine()} {cpu}, {os.cpu_count()} CPUs, {memory:.0f} GB'
+
+
+def bench_mesh(Nnodes, sourceCounts, repeat):
+    """
+    Time the stages of RESnet on one mesh and its surveys; run in a fresh
+    process so that the peak memory is that of this mesh.
+
+    Parameters:
+    -----------
+    Nnodes: int
+        approximate number of nodes of the cube mesh
+    sourceCounts: list
+        numbers of sources of the surveys solved with the factorization
+    repeat: int
+        runs of each stage; the fastest is reported
+
+    Returns:
+    --------
+    mesh: dict
+        'Nnodes', 'nnz' of the system matrix, 'fill' of the factors
+        ((nnz(L) + nnz(U) - Nnodes) / nnz), and 'stages' (stage -> 'time' (s)
+        and 'rss', the peak resident memory (MB) of the process by the end of
+        the stage) of the mesh and of each of its 'surveys' ('Ntx', 'stages')
+    """
+
+    spec = make_spec(Nnodes, max(sourceCounts))
+    nodeX, nodeY, nodeZ = spec['nodeX'], spec['nodeY'], spec['nodeZ']
+    stages = {}
+
+    def run(name, compute):
+        times = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            value = compute()
+            times.append(time.perf_counter() - start_time)
+        stages[name] = {'time': min(times), 'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+        return value
+
+    nodes, edges, lengths, faces, areas, cells, volumes = run(
+        'connectivity', lambda: formRectMeshConnectivity(nodeX, nodeY, nodeZ))
+    cellCon, faceCon, edgeCon = run('blocks', lambda: expandModelSpec(spec))
+    Edge2Edge, Face2Edge, Cell2Edge = run('mapping', lambda: (
+        formEdge2EdgeMatrix(edges, lengths),
+        formFace2EdgeMatrix(edges, lengths, faces, areas),
+        formCell2EdgeMatrix(edges, lengths, faces, cells, volumes)))
+    C = run('assembly', lambda: Edge2Edge.dot(edgeCon) + Face2Edge.dot(faceCon) + Cell2Edge.dot(cellCon))
+    factorization = run('factorization', lambda: factorizeRESnet(edges, C))
+
+    _, nnz, _ = problem_size(spec)
+    factor = factorization[1]
+    mesh = {'Nnodes': nodes.shape[0], 'nnz': nnz, 'fill': (factor.L.nnz + factor.U.nnz - nodes.shape[0]) / nnz,
+            'stages': stages, 'surveys': []}
+
+    for Ntx in sourceCounts:
+        tx = spec['tx'][:Ntx]
+        rx = spec['rx'][:Ntx]
+        stages = {}
+        sources = run('interpolation', lambda: np.column_stack([
+            calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, tx[i][:, 0:3]).dot(tx[i][:, 3]) for i in range(Ntx)]))
+        potentials, _, _ = run('solve', lambda: solveRESnet(edges, C, sources, factorization))
+        run('data', lambda: np.array([
+            (calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, :3]).T
+             - calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, 3:6]).T) @ potentials[:, i]
+            for i in range(Ntx)]))
+        mesh['surveys'].append({'Ntx': Ntx, 'stages': stages})
+    return mesh
+
+
+def flatten(results):
+    # Compared quantities of the results: 'Nnodes[/Ntx]/stage/time' -> value, etc.
+    values = {}
+    for mesh in results['meshes']:
+        if 'error' in mesh or 'not_recorded' in mesh:
+            continue
+        values[f"{mesh['Nnodes']}/nnz"] = mesh['nnz']
+        values[f"{mesh['Nnodes']}/fill"] = mesh['fill']
+        for name, stage in mesh['stages'].items():
+            values[f"{mesh['Nnodes']}/{name}/time"] = stage['time']
+            values[f"{mesh['Nnodes']}/{name}/rss"] = stage['rss']
+        for survey in mesh['surveys']:
+            for name, stage in survey['stages'].items():
+                values[f"{mesh['Nnodes']}/{survey['Ntx']}/{name}/time"] = stage['time']
+                values[f"{mesh['Nnodes']}/{survey['Ntx']}/{name}/rss"] = stage['rss']
+    return values
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compare benchmark results with a baseline.
+
+    Parameters:
+    -----------
+    results, baseline: dict
+        results of the benchmark (as written to RESNET_BENCH_OUTPUT)
+    tolerance: float
+        relative increase of a time, peak memory or fill taken as a
+        regression (default 0.25)
+
+    Returns:
+    --------
+    regressions: list
+        (quantity, baseline value, value) of the quantities that grew
+        beyond the tolerance, or of nnz that changed (a different mesh);
+        time changes under MIN_TIME and memory changes under MIN_MEMORY are
+        ignored, and times and peak memory are compared only if the machine
+        fingerprints of the results and the baseline are the same
+    """
+
+    base = flatten(baseline)
+    timed = results['machine'].get('fingerprint') == baseline['machine'].get('fingerprint')
+    regressions = []
+    for key, value in flatten(results).items():
+        if key not in base or (not timed and key.endswith(('/time', '/rss'))):
+            continue
+        if key.endswith('/nnz'):
+            regressed = value != base[key]
+        elif key.endswith('/time'):
+            regressed = value > (1 + tolerance) * base[key] and value - base[key] > MIN_TIME
+        elif key.endswith('/rss'):
+            regressed = value > (1 + tolerance) * base[key] and value - base[key] > MIN_MEMORY
+        else:
+            regressed = value > (1 + tolerance) * base[key]
+        if regressed:
+            regressions.append((key, base[key], value))
+    return regressions
+
+
+def record(model, mesh):
+    # Add the surveys of a mesh to the cost model as in-process ('local') runs
+    setup = {'model': mesh['stages']['blocks']['time'], 'connectivity': mesh['stages']['connectivity']['time'],
+             'operators': mesh['stages']['mapping']['time'], 'assembly': mesh['stages']['assembly']['time'],
+             'factorization': mesh['stages']['factorization']['time']}
+    for survey in mesh['surveys']:
+        timings = dict(setup, solve=survey['stages']['interpolation']['time'] + survey['stages']['solve']['time'],
+                       receivers=survey['stages']['data']['time'])
+        model.record('local', mesh['Nnodes'], mesh['nnz'],
+                     [{'Ntx': survey['Ntx'], 'timings': timings, 'memory': survey['stages']['data']['rss']}],
+                     sum(timings.values()))
+
+
+if __name__ == '__main__':
+    nodeCounts = [int(float(n)) for n in os.environ.get('RESNET_BENCH_NODES', '1e3,1e4,1e5,1e6').split(',')]
+    sourceCounts = [int(n) for n in os.environ.get('RESNET_BENCH_SOURCES', '1,16,64').split(',')]
+    repeat = int(os.environ.get('RESNET_BENCH_REPEAT', 3))
+    output = os.environ.get('RESNET_BENCH_OUTPUT', 'benchmark-results.json')
+    baselineFile = os.environ.get('RESNET_BENCH_BASELINE',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json'))
+    tolerance = float(os.environ.get('RESNET_BENCH_TOLERANCE', 0.25))
+    model = CostModel() if os.environ.get('RESNET_BENCH_RECORD') else None
+
+    results = {'machine': {'platform': platform.platform(), 'processor': platform.processor(),
+                           'cpu_count': os.cpu_count(), 'python': platform.python_version(),
+                           'numpy': np.__version__, 'scipy': scipy.__version__,
+                           'fingerprint': machine_fingerprint()},
+               'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'repeat': repeat, 'meshes': []}
+    print(f'{"nodes":>8s} {"sources":>7s} {"stage":>13s} {"time (s)":>9s} {"peak (MB)":>9s}')
+    for Nnodes in nodeCounts:
+        # A fresh process per mesh; a mesh that runs out of memory kills only its process
+        try:
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                mesh = pool.submit(bench_mesh, Nnodes, sourceCounts, repeat).result()
+        except Exception as e:
+            print(f'{Nnodes:8d} failed: {type(e).__name__} {e}')
+            results['meshes'].append({'Nnodes': Nnodes, 'error': f'{type(e).__name__}: {e}'})
+            continue
+        results['meshes'].append(mesh)
+        if model is not None:
+            record(model, mesh)
+
+        for name, stage in mesh['stages'].items():
+            print(f"{mesh['Nnodes']:8d} {'':>7s} {name:>13s} {stage['time']:9.4f} {stage['rss']:9.1f}")
+        print(f"{mesh['Nnodes']:8d} {'':>7s} {'nnz(A), fill':>13s} {mesh['nnz']:9d} {mesh['fill']:9.2f}")
+        for survey in mesh['surveys']:
+            for name, stage in survey['stages'].items():
+                print(f"{mesh['Nnodes']:8d} {survey['Ntx']:7d} {name:>13s} {stage['time']:9.4f} {stage['rss']:9.1f}")
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f'Results written to {output}')
+
+    if os.path.isfile(baselineFile):
+        with open(baselineFile) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance)
+        print(f"Compared with {baselineFile} ({baseline['machine']['platform']}, {baseline['date']}): "
+              f'{len(regressions)} regressions beyond {tolerance:.0%}')
+        if baseline['machine'].get('fingerprint') != results['machine']['fingerprint']:
+            print(f"  times and peak memory not compared: the baseline machine "
+                  f"({baseline['machine'].get('fingerprint', 'unknown')}) is not this one")
+        baseMeshes = {mesh['Nnodes']: mesh for mesh in baseline['meshes']}
+        for mesh in results['meshes']:
+            if mesh['Nnodes'] not in baseMeshes:
+                print(f"  {mesh['Nnodes']} nodes: not in the baseline")
+            elif 'not_recorded' in baseMeshes[mesh['Nnodes']]:
+                print(f"  {mesh['Nnodes']} nodes: not recorded in the baseline, "
+                      f"{baseMeshes[mesh['Nnodes']]['not_recorded']}")
+        for key, base, value in regressions:
+            print(f'  {key}: {base:.4g} -> {value:.4g}')
+        sys.exit(1 if regressions else 0)
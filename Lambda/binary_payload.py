@@ -0,0 +1,122 @@
+import json
+import struct
+
+import numpy as np
+
+# Container layout (little-endian):
+#   magic b'RSNT' | version u1 | compression u1 | reserved u2 | header length u4 | header (JSON) | body
+# The header lists every array as {name, dtype, shape, offset, nbytes} into the body, where the arrays
+# are stored back to back in C order and 8-byte aligned; the body as a whole may be compressed.
+MAGIC = b'RSNT'
+VERSION = 1
+COMPRESSIONS = {None: 0, 'zstd': 1, 'lz4': 2}
+PREFIX = struct.Struct('<4sBBHI')
+ALIGNMENT = 8
+
+
+def encode_arrays(arrays, compression=None, meta=None):
+    """
+    Pack named numpy arrays into a versioned binary container.
+
+    Parameters:
+    -----------
+    arrays: dict
+        name -> numpy.ndarray (or anything np.asarray accepts, e.g. a scalar)
+    compression: str
+        None (default), 'zstd' (needs the zstandard package) or 'lz4' (needs
+        the lz4 package)
+    meta: dict
+        optional JSON-serializable values stored in the header
+
+    Returns:
+    --------
+    payload: bytes
+        the container, e.g. the Body of an S3 put_object
+    """
+
+    if compression not in COMPRESSIONS:
+        raise ValueError("compression must be None, 'zstd' or 'lz4'")
+
+    entries = []
+    chunks = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        if array.dtype.hasobject:
+            raise TypeError(f"array '{name}' has dtype object and cannot be stored")
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        padding = -offset % ALIGNMENT
+        chunks.append(b'\0' * padding)
+        offset += padding
+        entries.append({'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape),
+                        'offset': offset, 'nbytes': array.nbytes})
+        chunks.append(array.tobytes(order='C'))
+        offset += array.nbytes
+    body = b''.join(chunks)
+
+    header = json.dumps({'arrays': entries, 'meta': meta or {}, 'size': len(body)}).encode('utf-8')
+    header += b' ' * (-(PREFIX.size + len(header)) % ALIGNMENT)  # keep the body aligned in the container
+    body = compress(body, compression)
+
+    return PREFIX.pack(MAGIC, VERSION, COMPRESSIONS[compression], 0, len(header)) + header + body
+
+
+def decode_arrays(payload):
+    """
+    Unpack a container of encode_arrays.
+
+    Parameters:
+    -----------
+    payload: bytes
+        the container, e.g. the Body of an S3 get_object read into memory
+
+    Returns:
+    --------
+    arrays: dict
+        name -> numpy.ndarray; read-only views into the payload (or into the
+        decompressed body) without copying
+    meta: dict
+        the values stored with meta in encode_arrays
+    """
+
+    payload = memoryview(payload)
+    magic, version, compression, _, headerLength = PREFIX.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError('not a RESnet binary payload')
+    if version > VERSION:
+        raise ValueError(f'payload version {version} is newer than the supported version {VERSION}')
+
+    header = json.loads(bytes(payload[PREFIX.size:PREFIX.size + headerLength]).decode('utf-8'))
+    body = payload[PREFIX.size + headerLength:]
+    if compression != 0:
+        body = decompress(body, compression, header['size'])
+
+    arrays = {}
+    for entry in header['arrays']:
+        dtype = np.dtype(entry['dtype'])
+        array = np.frombuffer(body, dtype=dtype, count=entry['nbytes'] // dtype.itemsize, offset=entry['offset'])
+        arrays[entry['name']] = array.reshape(entry['shape'])
+
+    return arrays, header['meta']
+
+
+def compress(body, compression):
+    # Compress the body with an optional codec
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(body)
+    if compression == 'lz4':
+        import lz4.frame
+        return lz4.frame.compress(body)
+    return body
+
+
+def decompress(body, compression, size):
+    # Decompress the body by the codec id in the prefix
+    if compression == COMPRESSIONS['zstd']:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(body, max_output_size=size)
+    if compression == COMPRESSIONS['lz4']:
+        import lz4.frame
+        return lz4.frame.decompress(body)
+    raise ValueError(f'unknown compression id {compression}')
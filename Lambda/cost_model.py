@@ -0,0 +1,301 @@
+import json
+import math
+import os
+
+import numpy as np
+
+# Power laws value = coef * nnz ** exponent of the system matrix size, per backend:
+# 'setup' (s) is the work once per shard (model, connectivity, operators, factorization),
+# 'per_source' (s) the solve and reduction per source, 'memory' (MB) the peak above the
+# interpreter. Priors measured with SuperLU on one core; replaced by fits of recorded runs.
+PRIORS = {'setup': (5 / 2.85e5 ** 2.21, 2.21), 'per_source': (0.04 / 2.85e5 ** 1.54, 1.54),
+          'memory': (250 / 2.85e5 ** 1.3, 1.3)}
+OVERHEADS = {'local': 0, 'pool': 2, 'remote': 1.5}  # s; process start-up, or upload, invoke and download
+BASE_MEMORY = 100  # MB of the interpreter with numpy and scipy loaded
+LAMBDA_MEMORY_SIZES = [512, 1024, 1769, 2048, 3008, 4096, 6144, 8192, 10240]  # MB
+LAMBDA_FULL_CPU = 1769  # MB at which a function gets one full vCPU; the solver uses one
+
+
+def problem_size(spec):
+    """
+    Size of a forward-modelling request.
+
+    Parameters:
+    -----------
+    spec: dict
+        model and survey arrays (nodeX, nodeY, nodeZ, tx, ...)
+
+    Returns:
+    --------
+    Nnodes: int
+        number of nodes
+    nnz: int
+        number of nonzeros of the system matrix (a diagonal entry per node and
+        two off-diagonal entries per edge)
+    Ntx: int
+        number of sources
+    """
+
+    Nx = len(spec['nodeX'])
+    Ny = len(spec['nodeY'])
+    Nz = len(spec['nodeZ'])
+    Nnodes = Nx * Ny * Nz
+    Nedges = (Nx - 1) * Ny * Nz + Nx * (Ny - 1) * Nz + Nx * Ny * (Nz - 1)
+    return Nnodes, Nnodes + 2 * Nedges, len(spec['tx'])
+
+
+def shard_sizes(Ntx, setups, perSources):
+    """
+    Split the sources among workers of unequal costs so that they are
+    predicted to finish together.
+
+    Parameters:
+    -----------
+    Ntx: int
+        number of sources
+    setups: list
+        predicted time (s) of each worker before its first source, e.g. the
+        overhead and the factorization (see CostModel.costs)
+    perSources: list
+        predicted time (s) of each worker per source
+
+    Returns:
+    --------
+    sizes: numpy.ndarray
+        number of sources of each worker; zero for workers that would not
+        finish their first source before the others finish all
+    """
+
+    setups = np.asarray(setups, dtype=float)
+    perSources = np.asarray(perSources, dtype=float)
+
+    def counts(T):  # sources each worker finishes by time T, up to rounding of the division
+        return np.maximum(0, np.floor((T - setups) / perSources + 1e-9)).astype(int)
+
+    # Bisect the earliest time by which the workers together finish all the sources
+    lower = setups.min()
+    upper = np.min(setups + Ntx * perSources)
+    for _ in range(100):
+        middle = 0.5 * (lower + upper)
+        if counts(middle).sum() >= Ntx:
+            upper = middle
+        else:
+            lower = middle
+    sizes = counts(upper)
+
+    # Hand back the surplus of rounding from the workers finishing last, and any shortfall to the
+    # workers that would finish one more source first
+    for _ in range(sizes.sum() - Ntx):
+        finish = np.where(sizes > 0, setups + sizes * perSources, -np.inf)
+        sizes[np.argmax(finish)] -= 1
+    for _ in range(Ntx - sizes.sum()):
+        sizes[np.argmin(setups + (sizes + 1) * perSources)] += 1
+    assert sizes.sum() == Ntx
+    return sizes
+
+
+class CostModel:
+    """
+    Runtime and memory predictor of the local, local process pool and remote
+    (Lambda fan-out) backends, refined by the runs recorded in a JSON-lines
+    file.
+
+    Parameters:
+    -----------
+    filename: str
+        file of the recorded runs (default ~/.resnet_cost_model.jsonl)
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename or os.path.expanduser('~/.resnet_cost_model.jsonl')
+        self.records = []
+        if os.path.isfile(self.filename):
+            with open(self.filename) as f:
+                self.records = [json.loads(line) for line in f if line.strip()]
+        self.fit()
+
+    def fit(self):
+        # Fit the power laws and overheads of each backend to its records; too few records keep the priors
+        self.laws = {}
+        self.overheads = dict(OVERHEADS)
+        for backend in OVERHEADS:
+            records = [record for record in self.records if record['backend'] == backend]
+            for name, (coef, exponent) in PRIORS.items():
+                points = [(math.log(record['nnz']), math.log(record[name])) for record in records if record[name] > 0]
+                if points:
+                    x, y = np.array(points).T
+                    if len(points) >= 3 and np.ptp(x) > 0.5:  # sizes spread enough to fit the exponent
+                        exponent, logCoef = np.polyfit(x, y, 1)
+                    else:
+                        logCoef = np.median(y - exponent * x)
+                    coef = math.exp(logCoef)
+                self.laws[backend, name] = (coef, exponent)
+            if records:
+                self.overheads[backend] = max(0, float(np.median([record['overhead'] for record in records])))
+
+    def law(self, backend, name, nnz):
+        coef, exponent = self.laws[backend, name]
+        return coef * nnz ** exponent
+
+    def predict(self, backend, Nnodes, nnz, Ntx, Nshards=1, memory=None):
+        """
+        Predict the wall time and the peak memory of a run.
+
+        Parameters:
+        -----------
+        backend: str
+            'local', 'pool' or 'remote'
+        Nnodes, nnz, Ntx: int
+            size of the request (see problem_size)
+        Nshards: int
+            number of shards solved in parallel (processes or functions)
+        memory: int
+            memory size (MB) of the functions for 'remote'
+
+        Returns:
+        --------
+        time: float
+            wall time (s)
+        peakMemory: float
+            peak memory (MB) of one process or function
+        """
+
+        Nper = math.ceil(Ntx / Nshards)
+        setup, perSource = self.costs(backend, nnz, memory)
+        peakMemory = BASE_MEMORY + self.law(backend, 'memory', nnz) + 16 * Nnodes * Nper / 2 ** 20
+        return setup + Nper * perSource, peakMemory
+
+    def costs(self, backend, nnz, memory=None):
+        # Predicted time (s) of a worker before its first source (overhead and setup), and per source
+        setup = self.law(backend, 'setup', nnz)
+        perSource = self.law(backend, 'per_source', nnz)
+        if backend == 'remote' and memory is not None:  # below one full vCPU the compute slows down in proportion
+            setup /= min(1, memory / LAMBDA_FULL_CPU)
+            perSource /= min(1, memory / LAMBDA_FULL_CPU)
+        return self.overheads[backend] + setup, perSource
+
+    def plan(self, Nnodes, nnz, Ntx, local_workers=None, local_memory=None, max_concurrency=16, remote=True):
+        """
+        Choose the backend, the number of shards and the function memory size
+        with the shortest predicted wall time.
+
+        Parameters:
+        -----------
+        Nnodes, nnz, Ntx: int
+            size of the request (see problem_size)
+        local_workers: int
+            number of processes of the local pool (default os.cpu_count())
+        local_memory: float
+            memory (MB) available locally (default the available physical
+            memory)
+        max_concurrency: int
+            maximum number of concurrent functions (default 16)
+        remote: bool
+            whether the remote backend may be chosen (default True)
+
+        Returns:
+        --------
+        plan: dict
+            'backend', 'Nshards', 'memory' (MB, the function memory size for
+            'remote'), and the predicted 'time' (s) and 'peakMemory' (MB)
+        """
+
+        local_workers = local_workers or os.cpu_count()
+        if local_memory is None:
+            local_memory = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+        candidates = []
+        time, peakMemory = self.predict('local', Nnodes, nnz, Ntx)
+        if peakMemory <= local_memory:
+            candidates.append({'backend': 'local', 'Nshards': 1, 'memory': None, 'time': time,
+                               'peakMemory': peakMemory})
+        Nshards = min(local_workers, Ntx)
+        time, peakMemory = self.predict('pool', Nnodes, nnz, Ntx, Nshards)
+        if Nshards > 1 and Nshards * peakMemory <= local_memory:
+            candidates.append({'backend': 'pool', 'Nshards': Nshards, 'memory': None, 'time': time,
+                               'peakMemory': peakMemory})
+        if remote:
+            Nshards = min(max_concurrency, Ntx)
+            _, peakMemory = self.predict('remote', Nnodes, nnz, Ntx, Nshards)
+            sizes = [size for size in LAMBDA_MEMORY_SIZES if size >= max(1.25 * peakMemory, LAMBDA_FULL_CPU)]
+            if sizes:
+                time, _ = self.predict('remote', Nnodes, nnz, Ntx, Nshards, sizes[0])
+                candidates.append({'backend': 'remote', 'Nshards': Nshards, 'memory': sizes[0], 'time': time,
+                                   'peakMemory': peakMemory})
+
+        if not candidates:
+            raise MemoryError(f'no backend is predicted to fit {Nnodes} nodes and {Ntx} sources')
+        return min(candidates, key=lambda candidate: candidate['time'])
+
+    def record(self, backend, Nnodes, nnz, shards, elapsed, plan=None):
+        """
+        Record an actual run, e.g. of run_auto or a benchmark, and refit.
+
+        Parameters:
+        -----------
+        backend: str
+            'local', 'pool' or 'remote'
+        Nnodes, nnz: int
+            size of the request (see problem_size)
+        shards: list
+            per shard dict of 'Ntx', 'timings' (stage -> s, as reported by
+            lambda_function), 'memory' (peak MB, or None) and 'warm' (whether
+            the factorization came from the cache of the process, in which
+            case the setup time is not fitted)
+        elapsed: float
+            wall time (s) of the whole run
+        plan: dict
+            the plan of the run, to keep its predictions next to the actual
+            values
+        """
+
+        perSource = [sum(shard['timings'].get(stage, 0) for stage in ('solve', 'receivers', 'reduction'))
+                     / shard['Ntx'] for shard in shards]
+        setup = [sum(shard['timings'].get(stage, 0) for stage in
+                     ('imports', 'model', 'connectivity', 'operators', 'assembly', 'factorization'))
+                 for shard in shards]
+        compute = max(s + p * shard['Ntx'] for s, p, shard in zip(setup, perSource, shards))
+        coldSetup = [s for s, shard in zip(setup, shards) if not shard.get('warm')]
+        memories = [shard['memory'] - BASE_MEMORY - 16 * Nnodes * shard['Ntx'] / 2 ** 20
+                    for shard in shards if shard.get('memory')]
+        record = {'backend': backend, 'Nnodes': Nnodes, 'nnz': nnz, 'Ntx': sum(shard['Ntx'] for shard in shards),
+                  'Nshards': len(shards), 'setup': float(np.median(coldSetup)) if coldSetup else 0, 'per_source': float(np.median(perSource)),
+                  'memory': max(memories) if memories else 0, 'overhead': elapsed - compute, 'time': elapsed}
+        if plan is not None:
+            record['predicted_time'] = plan['time']
+            record['predicted_memory'] = plan['peakMemory']
+
+        self.records.append(record)
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        self.fit()
+        return record
+
+
+if __name__ == '__main__':
+    """
+    Check of shard_sizes on random workers: the sizes add up to the sources,
+    including when the bisected time falls on a source finishing exactly
+    (rounded divisions), and the predicted finish is that of handing the
+    sources out one by one to the worker that would finish it first.
+    """
+
+    rng = np.random.default_rng(0)
+    Ncases = 20000
+    worst = 0
+    for _ in range(Ncases):
+        Ntx = int(rng.integers(0, 200))
+        setups = rng.uniform(0, 40, size=rng.integers(1, 6))
+        perSources = rng.uniform(0.01, 3, size=len(setups))
+        if rng.random() < 0.5:  # costs of few digits, where rounding bites
+            setups, perSources = np.round(setups, 1), np.round(perSources, 2)
+        sizes = shard_sizes(Ntx, setups, perSources)
+        greedy = np.zeros(len(setups), dtype=int)
+        for _ in range(Ntx):
+            greedy[np.argmin(setups + (greedy + 1) * perSources)] += 1
+        finish = np.max(np.where(sizes > 0, setups + sizes * perSources, 0))
+        worst = max(worst, finish - np.max(np.where(greedy > 0, setups + greedy * perSources, 0)))
+    print(f"{Ncases} random cases: sizes add up to the sources, finish at most {worst:.1e} s later than greedy")
+    # Both workers finish exactly at 2.8 s, where the division of the first rounds below 1
+    print(f"13 sources on workers of 2.5 s + 0.3 s and 1.5 s + 0.1 s per source: "
+          f"{shard_sizes(13, [2.5, 1.5], [0.3, 0.1])}")
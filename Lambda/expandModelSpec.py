@@ -0,0 +1,47 @@
+import numpy as np
+
+from makeRectMeshModelBlocks import makeRectMeshModelBlocks
+
+
+def expandModelSpec(spec):
+    """
+    Expand a compact model specification into the conductive property
+    vectors on the cells, faces and edges of a rectilinear mesh.
+
+    Parameters:
+    -----------
+    spec: dict
+        nodeX, nodeY, nodeZ: numpy.ndarray
+            node locations in X, Y, Z of a rectilinear mesh
+        blkLoc: numpy.ndarray
+            a Nblock x 6 matrix of [xmin xmax ymin ymax zmax zmin] of the
+            blocks (see makeRectMeshModelBlocks)
+        blkCon: numpy.ndarray
+            conductive property values of the blocks
+        cellInd, faceInd, edgeInd: numpy.ndarray (optional)
+            indices (starting from 1) of individual cells, faces or edges
+            whose values are overridden after the blocks are applied
+        cellVal, faceVal, edgeVal: numpy.ndarray (optional)
+            the override values, one per index
+
+    Returns:
+    --------
+    cellCon, faceCon, edgeCon: numpy.ndarray
+        conductive property vectors as from makeRectMeshModelBlocks
+
+    Note:
+    -----
+    The spec is a few kilobytes regardless of the mesh size, whereas the
+    expanded vectors have one value per cell, face and edge.
+    """
+
+    blkLoc = np.array(spec['blkLoc'], dtype=float)  # makeRectMeshModelBlocks writes into blkLoc
+    cellCon, faceCon, edgeCon = makeRectMeshModelBlocks(spec['nodeX'], spec['nodeY'], spec['nodeZ'],
+                                                        blkLoc, np.atleast_1d(spec['blkCon']), [], [], [])
+
+    # Sparse overrides
+    for name, values in (('cell', cellCon), ('face', faceCon), ('edge', edgeCon)):
+        if name + 'Ind' in spec:
+            values[np.asarray(spec[name + 'Ind'], dtype=np.int64) - 1] = spec[name + 'Val']
+
+    return cellCon, faceCon, edgeCon
@@ -0,0 +1,405 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from aws_errors import ClientError
+from binary_payload import decode_arrays
+from binary_payload import encode_arrays
+from cost_model import problem_size
+from cost_model import shard_sizes
+from result_cache import request_key
+
+
+def split_survey(spec, Nshards):
+    """
+    Split the sources of a survey into shards of a model spec.
+
+    Parameters:
+    -----------
+    spec: dict
+        model and survey arrays to upload (nodeX, nodeY, nodeZ, the model,
+        tx as Ntx x Nelectrodes x 4 and rx as Ntx x Nrx x 6)
+    Nshards: int or list
+        number of shards of equal size (at most Ntx), or the number of
+        sources of each shard (e.g. from cost_model.shard_sizes)
+
+    Returns:
+    --------
+    shards: list
+        one spec per shard sharing the mesh and model arrays, with the tx
+        and rx of consecutive sources
+    """
+
+    if np.ndim(Nshards) == 0:
+        chunks = np.array_split(np.arange(len(spec['tx'])), min(Nshards, len(spec['tx'])))
+    else:
+        chunks = np.split(np.arange(len(spec['tx'])), np.cumsum(Nshards)[:-1])
+    return [dict(spec, tx=spec['tx'][chunk], rx=spec['rx'][chunk]) for chunk in chunks]
+
+
+async def dispatch(function_name, bucket_name, shards, prefix='shard', max_concurrency=16, retries=3,
+                   backoff=1, wait_for='response', timeout=900, compression=None, backend=None,
+                   cache=None, remote_cache=False, outputs=None):
+    """
+    Upload the shards, invoke one Lambda instance per shard concurrently and
+    gather the results in order.
+
+    Parameters:
+    -----------
+    function_name: str
+        name of the Lambda function (see lambda_function.lambda_handler)
+    bucket_name: str
+        S3 bucket for the shard inputs and results
+    shards: list
+        specs to solve, e.g. from split_survey or a list of scenarios
+    prefix: str
+        key prefix of the shard files (default 'shard')
+    max_concurrency: int
+        maximum number of uploads, invocations and downloads in flight
+        (default 16)
+    retries: int
+        number of retries of a failed invocation (default 3); throttled
+        invocations wait for a free instance, up to the timeout, without
+        using up the retries
+    backoff: float
+        base delay (s) of the exponential backoff between retries (default 1)
+    wait_for: str
+        'response' (default) to invoke synchronously and complete on the
+        response payload, or 'object' to invoke asynchronously and poll for
+        the result object with exponentially growing intervals
+    timeout: float
+        time (s) to wait for a shard (default 900, the Lambda maximum)
+    compression: str
+        compression of the shard inputs and results (see encode_arrays)
+    backend: str
+        'aws' for S3 and Lambda through boto3, or 'local' for the stand-ins
+        of local_backend; the default is the RESNET_BACKEND environment
+        variable, else 'aws'
+    cache: result_cache.ResultCache
+        if given, shards whose request is in the cache are not uploaded or
+        invoked, and new results are added to it
+    remote_cache: bool
+        whether the function instances look results up in and add them to
+        their disk cache and the object-store cache of the bucket (default
+        False)
+    outputs: list
+        results computed by the function instances and downloaded, e.g.
+        ['data'] (see lambda_function.run_resnet); default ['potentials',
+        'data']
+
+    Returns:
+    --------
+    results: list
+        dict of result arrays (as of outputs), 'meta', 'latency' (s, from
+        the upload to the download of the shard) and 'cached' of each shard,
+        in the order of shards
+    """
+
+    s3, lambda_client = make_clients(backend, timeout, max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_shard(i, shard):
+        start_time = time.time()
+        if cache is not None:
+            key = request_key(shard, outputs)
+            result = await asyncio.to_thread(cache.get, key)
+            if result is not None:
+                arrays, meta = result
+                return dict(arrays, meta=meta, latency=time.time() - start_time, cached=True)
+
+        file_name = f'{prefix}-{i}.rsnt'
+        result_file_name = f'processed-{prefix}-{i}.rsnt'
+        event = {'bucket_name': bucket_name, 'file_name': file_name, 'result_file_name': result_file_name,
+                 'compression': compression,
+                 'cache': remote_cache}
+        if outputs is not None:
+            event['outputs'] = outputs
+
+        async with semaphore:
+            await asyncio.to_thread(s3.put_object, Body=encode_arrays(shard, compression=compression),
+                                    Bucket=bucket_name, Key=file_name)
+            if wait_for == 'object':  # a result left by an earlier run would end the wait early
+                await asyncio.to_thread(s3.delete_object, Bucket=bucket_name, Key=result_file_name)
+            await invoke(lambda_client, function_name, event, wait_for, retries, backoff, timeout)
+        if wait_for == 'object':
+            await wait_for_object(s3, bucket_name, result_file_name, timeout)
+        async with semaphore:
+            body = await asyncio.to_thread(lambda: s3.get_object(Bucket=bucket_name, Key=result_file_name)['Body'].read())
+
+        arrays, meta = decode_arrays(body)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, arrays, payload=body)
+        return dict(arrays, meta=meta, latency=time.time() - start_time, cached=False)
+
+    return await asyncio.gather(*(run_shard(i, shard) for i, shard in enumerate(shards)))
+
+
+def run_auto(spec, model, function_name, bucket_name, outputs=None, max_concurrency=16, remote=True, **kwargs):
+    """
+    Run a request where the cost model predicts it to finish first: in this
+    process, in a local process pool, or fanned out to Lambda; the actual run
+    is recorded in the model.
+
+    Parameters:
+    -----------
+    spec: dict
+        model and survey arrays of the request
+    model: cost_model.CostModel
+        the predictor, refined with this run
+    function_name: str
+        name of the Lambda function; '{memory}' in it is replaced by the
+        memory size (MB) of the plan, e.g. 'resnet-{memory}' for one function
+        per memory size
+    bucket_name: str
+        S3 bucket of the remote backend
+    outputs: list
+        results to compute (see lambda_function.run_resnet)
+    max_concurrency: int
+        maximum number of concurrent functions (default 16)
+    remote: bool
+        whether the request may be fanned out to Lambda (default True)
+    kwargs:
+        further arguments of dispatch (retries, cache, backend, ...)
+
+    Returns:
+    --------
+    results: list
+        results of the shards as of dispatch (see merge_results)
+    plan: dict
+        the plan of the cost model (see CostModel.plan) and the actual
+        'elapsed' time (s)
+    """
+
+    Nnodes, nnz, Ntx = problem_size(spec)
+    plan = model.plan(Nnodes, nnz, Ntx, max_concurrency=max_concurrency, remote=remote)
+    results, run = run_sharded(spec, model, {plan['backend']: plan['Nshards']}, function_name, bucket_name,
+                               outputs=outputs, memory=plan['memory'], max_concurrency=max_concurrency, **kwargs)
+    return results, dict(plan, elapsed=run['elapsed'])
+
+
+def run_sharded(spec, model, workers, function_name, bucket_name, outputs=None, memory=None, max_concurrency=16,
+                **kwargs):
+    """
+    Partition the sources of a survey among local and remote workers, each
+    of which factorizes once and solves its slice, and gather the results in
+    the original order of the sources.
+
+    Parameters:
+    -----------
+    spec: dict
+        model and survey arrays of the request
+    model: cost_model.CostModel
+        the predictor sizing the shards, refined with this run
+    workers: dict
+        number of workers of each backend: 'local' (0 or 1, in this
+        process), 'pool' (processes) and 'remote' (functions), e.g.
+        {'pool': 4, 'remote': 32}
+    function_name: str
+        name of the Lambda function ('{memory}' is replaced by memory)
+    bucket_name: str
+        S3 bucket of the remote backend
+    outputs: list
+        results to compute (see lambda_function.run_resnet)
+    memory: int
+        memory size (MB) of the functions
+    max_concurrency: int
+        maximum number of remote calls in flight (see dispatch)
+    kwargs:
+        further arguments of dispatch (retries, cache, backend, ...); the
+        cache is also consulted for the local workers
+
+    Returns:
+    --------
+    results: list
+        results of the shards as of dispatch, in the order of the sources
+        (see merge_results)
+    run: dict
+        'backends' and 'sizes' (number of sources) of the shards, and the
+        predicted 'time' and the actual 'elapsed' time (s)
+
+    Note:
+    -----
+    Shards are sized by the predicted setup (overhead and factorization) and
+    per-source times of their backends (see cost_model.shard_sizes), so
+    that, e.g., a local process starting at once takes more sources than a
+    function that first pays the round trip; workers that would not finish
+    a source before the others finish all get none.
+    """
+
+    Nnodes, nnz, Ntx = problem_size(spec)
+    outputs = outputs or ['potentials', 'data']
+    if workers.get('local', 0) > 1:
+        raise ValueError("there is one 'local' worker, use 'pool' for more processes")
+
+    # Size the shards by the predicted costs of their workers
+    backends = [backend for backend, count in workers.items() for _ in range(count)]
+    costs = np.array([model.costs(backend, nnz, memory) for backend in backends])
+    sizes = shard_sizes(Ntx, costs[:, 0], costs[:, 1])
+    used = sizes > 0
+    backends = [backend for backend, use in zip(backends, used) if use]
+    costs = costs[used]
+    sizes = sizes[used]
+    shards = split_survey(spec, sizes)
+
+    start_time = time.time()
+    results = asyncio.run(gather_shards(shards, backends, outputs, function_name.format(memory=memory), bucket_name,
+                                        max_concurrency, kwargs))
+    run = {'backends': backends, 'sizes': sizes.tolist(), 'time': float(np.max(costs[:, 0] + sizes * costs[:, 1])),
+           'elapsed': time.time() - start_time}
+
+    # Record the run of each backend; cache hits say nothing about the cost
+    for backend in set(backends):
+        group = [i for i, b in enumerate(backends) if b == backend]
+        computed = [i for i in group if not results[i]['cached']]
+        if computed:
+            model.record(backend, Nnodes, nnz, [{'Ntx': int(sizes[i]), 'timings': results[i]['meta']['timings'],
+                                                 'memory': results[i]['meta'].get('memory'),
+                                                 'warm': results[i]['meta']['cache_hits'].get('factorization', False)}
+                                                for i in computed],
+                         max(results[i]['latency'] for i in group),
+                         {'time': float(np.max(costs[group, 0] + sizes[group] * costs[group, 1])),
+                          'peakMemory': model.predict(backend, Nnodes, nnz, int(sizes[group].max()))[1]})
+    return results, run
+
+
+async def gather_shards(shards, backends, outputs, function_name, bucket_name, max_concurrency, kwargs):
+    # Solve the shards on their backends concurrently; results in the order of shards
+    loop = asyncio.get_running_loop()
+    cache = kwargs.get('cache')
+    Npool = backends.count('pool')
+    pool = ProcessPoolExecutor(Npool, mp_context=multiprocessing.get_context('spawn')) if Npool else None
+    start_time = time.time()
+
+    async def run_local_shard(i):
+        if cache is not None:
+            key = request_key(shards[i], outputs)
+            hit = await asyncio.to_thread(cache.get, key)
+            if hit is not None:
+                return dict(hit[0], meta=hit[1], latency=time.time() - start_time, cached=True)
+        result = await loop.run_in_executor(pool if backends[i] == 'pool' else None, run_local, shards[i], outputs)
+        result['latency'] = time.time() - start_time  # including the start-up of the pool
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, {name: value for name, value in result.items()
+                                                     if name not in ('meta', 'latency', 'cached')}, meta=result['meta'])
+        return result
+
+    remote = [i for i, backend in enumerate(backends) if backend == 'remote']
+    local = [i for i, backend in enumerate(backends) if backend != 'remote']
+    tasks = [run_local_shard(i) for i in local]
+    if remote:
+        tasks.append(dispatch(function_name, bucket_name, [shards[i] for i in remote], max_concurrency=max_concurrency,
+                              outputs=outputs, **kwargs))
+    try:
+        done = await asyncio.gather(*tasks)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    results = [None] * len(shards)
+    for i, result in zip(local, done):
+        results[i] = result
+    for i, result in zip(remote, done[-1] if remote else []):
+        results[i] = result
+    return results
+
+
+def run_local(spec, outputs):
+    # Solve a shard in this process as the handler would, with the same results and meta
+    from lambda_function import peak_memory
+    from lambda_function import run_resnet
+    start_time = time.time()
+    timings = {}
+    hits = {}
+    results = run_resnet(spec, timings, hits, outputs)
+    meta = {'execution_time': sum(timings.values()), 'timings': timings, 'cache_hits': hits, 'memory': peak_memory()}
+    return dict(results, meta=meta, latency=time.time() - start_time, cached=False)
+
+
+def make_clients(backend=None, timeout=900, max_concurrency=16):
+    # S3 and Lambda clients of the backend
+    backend = backend or os.environ.get('RESNET_BACKEND', 'aws')
+    if backend == 'local':
+        from local_backend import local_clients
+        return local_clients()
+    if backend != 'aws':
+        raise ValueError("backend must be 'aws' or 'local'")
+
+    import boto3
+    from botocore.config import Config
+    config = Config(read_timeout=timeout, max_pool_connections=max_concurrency, retries={'max_attempts': 0})
+    return boto3.client('s3', config=config), boto3.client('lambda', config=config)
+
+
+async def invoke(lambda_client, function_name, event, wait_for, retries, backoff, timeout=900, max_interval=8):
+    # Invoke with retries and exponential backoff on service and function errors; throttled invocations
+    # are retried with the backoff capped at max_interval until the timeout, as they wait for a free instance
+    invocation_type = 'RequestResponse' if wait_for == 'response' else 'Event'
+    deadline = time.time() + timeout
+    attempt = 0
+    throttled = 0
+    while True:
+        try:
+            response = await asyncio.to_thread(lambda_client.invoke, FunctionName=function_name,
+                                               InvocationType=invocation_type, Payload=json.dumps(event))
+            if 'FunctionError' in response:
+                raise RuntimeError(f"{event['file_name']}: {response['Payload'].read().decode('utf-8')}")
+            if invocation_type == 'RequestResponse':
+                return json.loads(response['Payload'].read())
+            return None
+        except (ClientError, RuntimeError) as e:
+            if (isinstance(e, ClientError) and e.response['Error']['Code'] == 'TooManyRequestsException'
+                    and time.time() < deadline):
+                delay = min(backoff * 2 ** throttled, max_interval)
+                throttled += 1
+            elif attempt == retries:
+                raise
+            else:
+                delay = backoff * 2 ** attempt
+                attempt += 1
+            await asyncio.sleep(delay * (1 + random.random()))  # full jitter
+
+
+async def wait_for_object(s3, bucket_name, file_name, timeout, interval=0.5, max_interval=8):
+    # Poll head_object with exponentially growing intervals until the object exists
+    deadline = time.time() + timeout
+    while True:
+        try:
+            await asyncio.to_thread(s3.head_object, Bucket=bucket_name, Key=file_name)
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+        if time.time() + interval > deadline:
+            raise TimeoutError(f'{file_name} did not appear in {bucket_name} within {timeout} s')
+        await asyncio.sleep(interval)
+        interval = min(2 * interval, max_interval)
+
+
+def merge_results(results):
+    """
+    Concatenate the results of the shards of split_survey.
+
+    Parameters:
+    -----------
+    results: list
+        results of dispatch
+
+    Returns:
+    --------
+    potentials: numpy.ndarray
+        a Nnodes x Ntx matrix of the potentials of all the sources (None if
+        not among the outputs)
+    data: numpy.ndarray
+        a Ntx x Nrx matrix of the potential differences (None if not among
+        the outputs)
+    """
+
+    potentials = np.hstack([result['potentials'] for result in results]) if 'potentials' in results[0] else None
+    data = np.vstack([result['data'] for result in results]) if 'data' in results[0] else None
+    return potentials, data
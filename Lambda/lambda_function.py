@@ -0,0 +1,211 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from binary_payload import decode_arrays
+from binary_payload import encode_arrays
+from result_cache import ResultCache
+from result_cache import request_key
+
+# Module-level state is kept by a warm container between invocations
+CACHE_SIZE = 4  # entries per cache; a factorization of a large mesh takes hundreds of MB
+caches = {'connectivity': OrderedDict(), 'operators': OrderedDict(), 'factorization': OrderedDict()}
+cold = True
+s3 = None
+result_cache = None
+
+
+def lambda_handler(event, context):
+    # Read the model and survey from S3, solve the resistor network and write the results back to S3
+    # event: {'bucket_name', 'file_name', optional 'result_file_name', 'compression', 'outputs' and 'cache'};
+    # 'outputs' lists the results to return (see run_resnet, default ['potentials', 'data']);
+    # with 'cache' true, results are looked up in and added to the disk cache of the instance
+    # and the object-store cache under cache/ of the bucket before anything is computed
+    global cold, s3, result_cache
+    is_cold = cold
+    cold = False
+    bucket_name = event['bucket_name']
+    file_name = event['file_name']
+    result_file_name = event.get('result_file_name', 'processed-' + file_name)
+    outputs = event.get('outputs', ['potentials', 'data'])
+    timings = {}
+    hits = {}
+
+    # Heavy packages are imported on first use rather than at init
+    t = time.time()
+    if s3 is None:
+        import boto3
+        s3 = boto3.client('s3')
+    t = lap(timings, 'imports', t)
+
+    payload = s3.get_object(Bucket=bucket_name, Key=file_name)['Body'].read()
+    t = lap(timings, 'download', t)
+    arrays, _ = decode_arrays(payload)
+    t = lap(timings, 'decode', t)
+
+    cache = event.get('cache')
+    if cache:
+        if result_cache is None:
+            result_cache = ResultCache(max_bytes=2 ** 28, s3=s3)  # /tmp is 512 MB
+        result_cache.bucket_name = bucket_name
+        key = request_key(arrays, outputs)
+        cached_result = result_cache.get(key)
+        hits['result'] = cached_result is not None
+        t = lap(timings, 'cache', t)
+
+    if cache and cached_result is not None:
+        results, meta = cached_result
+        meta = dict(meta, execution_time=sum(timings.values()), cold=is_cold, timings=timings, cache_hits=hits)
+    else:
+        results = run_resnet(arrays, timings, hits, outputs)
+        meta = {'execution_time': sum(timings.values()), 'cold': is_cold, 'timings': timings, 'cache_hits': hits,
+                'memory': peak_memory()}
+        if cache:
+            result_cache.put(key, results, meta=meta)
+
+    t = time.time()
+    result = encode_arrays(results, compression=event.get('compression'), meta=meta)
+    t = lap(timings, 'encode', t)
+    s3.put_object(Body=result, Bucket=bucket_name, Key=result_file_name)
+    lap(timings, 'upload', t)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'result_file_name': result_file_name, 'execution_time': sum(timings.values()),
+                            'cold': is_cold, 'timings': timings, 'cache_hits': hits})
+    }
+
+
+def run_resnet(arrays, timings=None, hits=None, outputs=('potentials', 'data')):
+    # Results of a rectilinear mesh model reduced to the outputs asked for:
+    #   'potentials'       potentials on all the nodes (Nnodes x Ntx)
+    #   'data'             potential differences of the receivers (Ntx x Nrx)
+    #   'node_potentials'  potentials on the nodes arrays['nodeIndex'] (starting from 1)
+    #   'edge_currents'    'edgeIndex' (starting from 1) and 'edgeCurrents' (Nselected x Ntx) of the
+    #                      edges centered in arrays['bbox'] = [xmin xmax ymin ymax zmax zmin]
+    #   'summary'          per source [min max] of the potentials and [min max mean] of the data
+    # Connectivity, mapping operators and factorizations are reused from the caches when the
+    # mesh (and the model) hash to those of an earlier invocation
+    t = time.time()
+    import numpy as np
+    from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+    from expandModelSpec import expandModelSpec
+    from formCell2EdgeMatrix import formCell2EdgeMatrix
+    from formEdge2EdgeMatrix import formEdge2EdgeMatrix
+    from formFace2EdgeMatrix import formFace2EdgeMatrix
+    from formRectMeshConnectivity import formRectMeshConnectivity
+    from solveRESnet import factorizeRESnet
+    from solveRESnet import solveRESnet
+    timings = {} if timings is None else timings
+    hits = {} if hits is None else hits
+    t = lap(timings, 'imports', t)
+
+    nodeX = arrays['nodeX']
+    nodeY = arrays['nodeY']
+    nodeZ = arrays['nodeZ']
+    tx = arrays['tx']  # Ntx x Nelectrodes x 4
+    rx = arrays['rx']  # Ntx x Nrx x 6
+
+    # The model is either a compact spec (blkLoc, blkCon, sparse overrides) or dense property vectors
+    if 'blkLoc' in arrays:
+        cellCon, faceCon, edgeCon = expandModelSpec(arrays)
+    else:
+        cellCon, faceCon, edgeCon = arrays['cellCon'], arrays['faceCon'], arrays['edgeCon']
+    t = lap(timings, 'model', t)
+
+    meshKey = content_hash(nodeX, nodeY, nodeZ)
+    nodes, edges, lengths, faces, areas, cells, volumes = cached(
+        'connectivity', meshKey, hits, lambda: formRectMeshConnectivity(nodeX, nodeY, nodeZ))
+    t = lap(timings, 'connectivity', t)
+
+    # Convert all conductive objects to conductance on edges
+    Edge2Edge, Face2Edge, Cell2Edge = cached('operators', meshKey, hits, lambda: (
+        formEdge2EdgeMatrix(edges, lengths),
+        formFace2EdgeMatrix(edges, lengths, faces, areas),
+        formCell2EdgeMatrix(edges, lengths, faces, cells, volumes)))
+    t = lap(timings, 'operators', t)
+    C = Edge2Edge.dot(edgeCon) + Face2Edge.dot(faceCon) + Cell2Edge.dot(cellCon)
+    t = lap(timings, 'assembly', t)
+
+    factorization = cached('factorization', meshKey + content_hash(C), hits, lambda: factorizeRESnet(edges, C))
+    t = lap(timings, 'factorization', t)
+
+    Ntx = tx.shape[0]
+    sources = np.zeros((nodes.shape[0], Ntx))
+    for i in range(Ntx):
+        sources[:, i] = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, tx[i][:, 0:3]).dot(tx[i][:, 3])
+
+    potentials, _, _ = solveRESnet(edges, C, sources, factorization)
+    potentials = potentials.reshape((nodes.shape[0], Ntx))
+    t = lap(timings, 'solve', t)
+
+    if 'data' in outputs or 'summary' in outputs:
+        data = np.zeros(rx.shape[:2])
+        for i in range(Ntx):
+            Mw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, :3])
+            Nw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, 3:6])
+            data[i, :] = (Mw.T - Nw.T) @ potentials[:, i]
+        t = lap(timings, 'receivers', t)
+
+    # Reduce the results on the server rather than returning everything
+    results = {}
+    for output in outputs:
+        if output == 'potentials':
+            results['potentials'] = potentials
+        elif output == 'data':
+            results['data'] = data
+        elif output == 'node_potentials':
+            results['nodePotentials'] = potentials[np.asarray(arrays['nodeIndex'], dtype=np.int64) - 1, :]
+        elif output == 'edge_currents':
+            bbox = arrays['bbox']
+            centers = 0.5 * (nodes[edges[:, 0] - 1, :] + nodes[edges[:, 1] - 1, :])
+            ind = np.flatnonzero((centers[:, 0] >= bbox[0]) & (centers[:, 0] <= bbox[1]) &
+                                 (centers[:, 1] >= bbox[2]) & (centers[:, 1] <= bbox[3]) &
+                                 (centers[:, 2] <= bbox[4]) & (centers[:, 2] >= bbox[5]))
+            G = factorization[0]
+            results['edgeIndex'] = ind + 1
+            results['edgeCurrents'] = C[ind, None] * (G[ind, :] @ potentials)  # only the selected edges
+        elif output == 'summary':
+            results['summary'] = np.column_stack((potentials.min(axis=0), potentials.max(axis=0),
+                                                  data.min(axis=1), data.max(axis=1), data.mean(axis=1)))
+        else:
+            raise ValueError(f'unknown output {output}')
+    lap(timings, 'reduction', t)
+
+    return results
+
+
+def content_hash(*arrays):
+    # Digest of the dtypes, shapes and contents of arrays
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        digest.update(f'{array.dtype.str}{array.shape}'.encode('utf-8'))
+        digest.update(array.tobytes() if not array.flags['C_CONTIGUOUS'] else memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+
+def cached(name, key, hits, compute):
+    # Look up the least-recently-used cache name, computing and inserting the value on a miss
+    cache = caches[name]
+    hits[name] = key in cache
+    if hits[name]:
+        cache.move_to_end(key)
+    else:
+        cache[key] = compute()
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    return cache[key]
+
+
+def peak_memory():
+    # Peak resident memory (MB) of the process
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def lap(timings, stage, start):
+    # Add the time since start to the stage and return the current time
+    now = time.time()
+    timings[stage] = timings.get(stage, 0) + now - start
+    return now
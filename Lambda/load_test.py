@@ -0,0 +1,70 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from lambda_dispatcher import dispatch
+from lambda_dispatcher import merge_results
+from lambda_dispatcher import split_survey
+
+if __name__ == '__main__':
+    """
+    Load test of the cloud path (upload, concurrent invocations, completion
+    waits, download) against the local S3 and Lambda stand-ins by default;
+    set RESNET_BACKEND=aws to measure the same fan-out on AWS. The number of
+    function instances and the simulated cold start are set by
+    RESNET_LOCAL_CONCURRENCY and RESNET_LOCAL_COLD_START (see local_backend).
+    """
+
+    os.environ.setdefault('RESNET_BACKEND', 'local')
+    bucket_name = 'inputdataset1'
+    lambda_function_name = 'resnet-0'
+    shardCounts = [1, 2, 4, 8, 16]  # numbers of shards (concurrent invocations) tested
+    # Invocations in flight: the function instances of the stand-in, or the default of dispatch on AWS
+    if os.environ['RESNET_BACKEND'] == 'local':
+        max_concurrency = int(os.environ.get('RESNET_LOCAL_CONCURRENCY', os.cpu_count()))
+    else:
+        max_concurrency = 16
+    Nrepeat = 2  # the first round of a shard count may hit cold instances, the later ones are warm
+
+    '''Setup the 3D mesh and the model'''
+    nodeX = np.linspace(-100, 100, num=31)  # node locations in X
+    nodeY = np.linspace(-100, 100, num=31)  # node locations in Y
+    nodeZ = np.linspace(0, -100, num=16)    # node locations in Z
+    blkLoc = np.array([[-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf],  # a uniform half-space
+                       [-20, 20, -20, 20, -10, -40]])  # a conductive block
+    blkCon = np.array([1e-2, 1e-1])
+
+    '''Setup the survey (dipole-dipole lines)'''
+    # Define the current sources in the format of [x y z current(Ampere)] and the
+    # receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
+    A = np.arange(-90, 80, 10)
+    lines = np.arange(-40, 41, 20)
+    tx = np.array([[(a, y, 0, 1), (a + 10, y, 0, -1)] for y in lines for a in A], dtype=float)
+    M = np.arange(-90, 90, 10)
+    rx = np.array([np.column_stack((M, 0 * M + y, 0 * M, M + 10, 0 * M + y, 0 * M)) for y in lines for a in A],
+                  dtype=float)
+    spec = {'nodeX': nodeX, 'nodeY': nodeY, 'nodeZ': nodeZ, 'blkLoc': blkLoc, 'blkCon': blkCon, 'tx': tx, 'rx': rx}
+    print(f"Backend {os.environ['RESNET_BACKEND']}: {len(tx)} sources on {len(nodeX) * len(nodeY) * len(nodeZ)} nodes")
+
+    '''Fan out'''
+    reference = None
+    for Nshards in shardCounts:
+        for repeat in range(Nrepeat):
+            shards = split_survey(spec, Nshards)
+            start_time = time.time()
+            results = asyncio.run(dispatch(lambda_function_name, bucket_name, shards, prefix=f'load-{Nshards}',
+                                           max_concurrency=max_concurrency, backoff=0.2))
+            elapsed = time.time() - start_time
+
+            _, data = merge_results(results)
+            if reference is None:
+                reference = data
+            latency = np.array([result['latency'] for result in results])
+            compute = np.array([result['meta']['execution_time'] for result in results])
+            Ncold = sum(result['meta']['cold'] for result in results)
+            print(f"{Nshards:3d} shards: {elapsed:7.2f} s, {len(tx) / elapsed:7.1f} sources/s, "
+                  f"latency p50 {np.percentile(latency, 50):6.2f} s p95 {np.percentile(latency, 95):6.2f} s, "
+                  f"handler p50 {np.percentile(compute, 50):6.2f} s, {Ncold} cold, "
+                  f"max deviation {np.max(np.abs(data - reference)):.1e}")
@@ -0,0 +1,136 @@
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from aws_errors import ClientError
+
+# Stand-ins for the boto3 S3 and Lambda clients, so that the cloud path (upload, fan-out,
+# completion waits, download) runs and can be load tested on one machine. Configured by:
+#   RESNET_LOCAL_ROOT         directory of the object store (default <tmp>/resnet-local)
+#   RESNET_LOCAL_CONCURRENCY  number of function instances (default os.cpu_count())
+#   RESNET_LOCAL_COLD_START   extra seconds of the first invocation of an instance (default 0)
+clients = None
+container = None  # the handler loaded in a function instance (worker process)
+
+
+def local_clients():
+    # The S3 and Lambda stand-ins of this process, created once so that warm instances are reused
+    global clients
+    if clients is None:
+        root = os.environ.get('RESNET_LOCAL_ROOT', os.path.join(tempfile.gettempdir(), 'resnet-local'))
+        concurrency = int(os.environ.get('RESNET_LOCAL_CONCURRENCY', os.cpu_count()))
+        cold_start = float(os.environ.get('RESNET_LOCAL_COLD_START', 0))
+        clients = LocalS3(root), LocalLambda(root, concurrency, cold_start)
+    return clients
+
+
+class LocalS3:
+    """
+    Filesystem-backed object store with the subset of the boto3 S3 client
+    used here; the object bucket/key is the file root/bucket/key.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, Bucket, Key):
+        return os.path.join(self.root, Bucket, Key)
+
+    def put_object(self, Body, Bucket, Key):
+        path = self.path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(Body)
+        os.replace(tmp, path)  # readers never see a partial object
+        return {}
+
+    def get_object(self, Bucket, Key):
+        self.head_object(Bucket, Key)
+        with open(self.path(Bucket, Key), 'rb') as f:
+            return {'Body': io.BytesIO(f.read())}
+
+    def head_object(self, Bucket, Key):
+        path = self.path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        return {'ContentLength': os.path.getsize(path)}
+
+    def delete_object(self, Bucket, Key):
+        try:
+            os.remove(self.path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def download_file(self, Bucket, Key, Filename):
+        with open(Filename, 'wb') as f:
+            f.write(self.get_object(Bucket, Key)['Body'].read())
+
+
+class LocalLambda:
+    """
+    Function runner with the invoke method of the boto3 Lambda client. Each
+    worker process of a pool is one function instance: it loads the handler
+    on its first invocation (a cold start, lengthened by cold_start seconds)
+    and keeps its module state afterwards. Synchronous invocations beyond
+    concurrency instances are throttled with TooManyRequestsException as by
+    reserved concurrency; asynchronous ('Event') ones wait in a queue.
+    """
+
+    def __init__(self, root, concurrency, cold_start=0, handler='lambda_function.lambda_handler'):
+        self.root = root
+        self.concurrency = concurrency
+        self.cold_start = cold_start
+        self.handler = handler
+        self.pool = ProcessPoolExecutor(concurrency, mp_context=multiprocessing.get_context('spawn'))
+        self.inflight = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        with self.lock:
+            if InvocationType != 'Event' and self.inflight >= self.concurrency:  # events are queued instead
+                raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate Exceeded.'}},
+                                  'Invoke')
+            self.inflight += 1
+        future = self.pool.submit(run_handler, self.root, self.handler, json.loads(Payload), self.cold_start)
+        future.add_done_callback(self.finished)
+
+        if InvocationType == 'Event':
+            return {'StatusCode': 202, 'Payload': io.BytesIO(b'')}
+        result, error = future.result()
+        response = {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(result if error is None else error).encode())}
+        if error is not None:
+            response['FunctionError'] = 'Unhandled'
+        return response
+
+    def finished(self, future):
+        with self.lock:
+            self.inflight -= 1
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+def run_handler(root, handler, event, cold_start):
+    # Invoke the handler in a worker process; returns (result, None) or (None, error)
+    global container
+    try:
+        if container is None:
+            time.sleep(cold_start)
+            module_name, function_name = handler.rsplit('.', 1)
+            module = importlib.import_module(module_name)
+            if hasattr(module, 's3'):
+                module.s3 = LocalS3(root)  # the handler talks to the local store
+            container = getattr(module, function_name)
+        return container(event, None), None
+    except Exception as e:
+        return None, {'errorMessage': str(e), 'errorType': type(e).__name__,
+                      'stackTrace': traceback.format_exc().splitlines()}
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from aws_errors import ClientError
+from binary_payload import decode_arrays
+from binary_payload import encode_arrays
+
+KEY_VERSION = 1  # bump when a solver change makes earlier results stale
+
+
+def request_key(arrays, outputs=None):
+    """
+    Canonical hash of a forward-modelling request.
+
+    Parameters:
+    -----------
+    arrays: dict
+        name -> numpy.ndarray of the mesh, model and survey (e.g. nodeX, nodeY,
+        nodeZ, blkLoc, blkCon, tx, rx)
+    outputs: list
+        names of the results asked for (see lambda_function.run_resnet), if
+        the request is reduced on the server
+
+    Returns:
+    --------
+    key: str
+        SHA-256 hex digest of the names, dtypes, shapes and values; it does
+        not depend on the order of the names, the memory layout or the byte
+        order of the arrays
+    """
+
+    digest = hashlib.sha256(f'resnet-{KEY_VERSION}'.encode('utf-8'))
+    for name in sorted(arrays):
+        array = np.asarray(arrays[name])
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        digest.update(f'{name}:{array.dtype.str}:{array.shape}:'.encode('utf-8'))
+        digest.update(array.tobytes(order='C'))
+    if outputs is not None:
+        digest.update(f'outputs:{",".join(outputs)}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of results with a local disk tier and an
+    optional object-store tier.
+
+    Parameters:
+    -----------
+    directory: str
+        directory of the disk tier (default <tmp>/resnet-cache)
+    max_bytes: int
+        size of the disk tier; the least recently used results are evicted
+        beyond it (default 1 GB)
+    s3: object
+        S3 client (boto3 or local_backend.LocalS3) of the object-store tier,
+        shared by all machines and function instances; None for disk only
+    bucket_name: str
+        bucket of the object-store tier
+    prefix: str
+        key prefix of the object-store tier (default 'cache/'); expire it
+        with a bucket lifecycle rule, it is not evicted here
+    """
+
+    def __init__(self, directory=None, max_bytes=2 ** 30, s3=None, bucket_name=None, prefix='cache/'):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'resnet-cache')
+        self.max_bytes = max_bytes
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.rsnt')
+
+    def get(self, key):
+        # Arrays and meta of a cached result, or None
+        payload = None
+        try:
+            with open(self.path(key), 'rb') as f:
+                payload = f.read()
+            os.utime(self.path(key))  # recently used
+        except FileNotFoundError:
+            if self.s3 is not None:
+                try:
+                    payload = self.s3.get_object(Bucket=self.bucket_name, Key=self.prefix + key)['Body'].read()
+                except ClientError as e:
+                    if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                        raise
+                else:
+                    self.store(key, payload)
+        return None if payload is None else decode_arrays(payload)
+
+    def put(self, key, arrays, meta=None, payload=None):
+        # Cache a result given as arrays and meta, or as an encoded payload
+        payload = encode_arrays(arrays, meta=meta) if payload is None else payload
+        self.store(key, payload)
+        if self.s3 is not None:
+            self.s3.put_object(Body=payload, Bucket=self.bucket_name, Key=self.prefix + key)
+
+    def store(self, key, payload):
+        # Write to the disk tier and evict the least recently used results beyond max_bytes
+        tmp = f'{self.path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, self.path(key))
+
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.rsnt'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:  # evicted by another process
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
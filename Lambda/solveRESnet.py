@@ -1,10 +1,9 @@
 import numpy as np
 from scipy.sparse import csr_matrix
 from scipy.sparse import spdiags
-from scipy.sparse import triu
-from scipy.sparse.linalg import spsolve
+from scipy.sparse.linalg import splu
 
-def solveRESnet(edges, C, sources):
+def solveRESnet(edges, C, sources, factorization=None):
     """
     Solve an arbitrary 3D resistor network circuit problem using the potential's
     formulation and Kirchoff's current law.
@@ -19,6 +18,9 @@ def solveRESnet(edges, C, sources):
         A vector of conductance values on edges.
     sources: numpy.ndarray
         A vector for the source (current injection amplitude at each node).
+    factorization: tuple
+        (G, factor) of factorizeRESnet for the same edges and C, e.g. kept
+        across warm invocations; if not given, the system is factorized here.
 
     Returns
     -------
@@ -30,6 +32,27 @@ def solveRESnet(edges, C, sources):
         Current flowing along each edge (branch).
     """
 
+    Nedges = edges.shape[0]  # Number of edges
+
+    if factorization is None:
+        factorization = factorizeRESnet(edges, C)
+    G, factor = factorization
+    Cdiag = spdiags(C, 0, Nedges, Nedges)
+
+    # Solve the linear system for all sources at once
+    potentials = factor.solve(np.asarray(sources, dtype=np.float64))
+
+    # Compute potential difference (E field) on all edges
+    potentialDiffs = G @ potentials
+
+    # Compute current on all edges
+    currents = Cdiag @ potentialDiffs
+
+    return potentials, potentialDiffs, currents
+
+
+def factorizeRESnet(edges, C):
+    # Potential difference matrix (node to edge) and the sparse LU factor of the system matrix
     Nnodes = np.max(edges)  # Number of nodes
     Nedges = edges.shape[0]  # Number of edges
 
@@ -41,25 +64,10 @@ def solveRESnet(edges, C, sources):
 
     Cdiag = spdiags(C, 0, Nedges, Nedges)
     E = csr_matrix(([1], ([0], [0])), shape=(Nnodes, Nnodes))
-    G_csc = G.tocsc()
-    E_csc = E.tocsc()
-    A_csr = G_csc.T @ Cdiag @ G_csc + E_csc
-    A_upper_triangular = triu(A_csr, format='csr')
-
-    # Solve the linear system
-    if sources.shape[1] == 1:
-        potentials = spsolve(A_upper_triangular, sources)
-    else:
-        potentials = np.zeros((Nnodes, sources.shape[1]))
-        for i in range(sources.shape[1]):
-            source = sources[:, i]
-            source = source.astype(np.float64)
-            potentials[:, i] = spsolve(A_upper_triangular, source)
-
-    # Compute potential difference (E field) on all edges
-    potentialDiffs = G @ potentials
+    A = G.T @ Cdiag @ G + E
 
-    # Compute current on all edges
-    currents = Cdiag @ potentialDiffs
+    # The full symmetric matrix is factorized (a triangular half alone is a different system);
+    # minimum degree ordering on A + A' and diagonal pivoting suit the symmetric positive definite A
+    factor = splu(A.tocsc(), permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0, options=dict(SymmetricMode=True))
 
-    return potentials, potentialDiffs, currents
+    return G, factor
@@ -1,7 +1,11 @@
 import numpy as np
+import os
+import tempfile
 import time
 import matplotlib.pyplot as plt
 
+from calcPointFields import calcPointFields
+from calcTrilinearGradientWeights import calcTrilinearGradientWeights
 from calcTrilinearInterpWeights import calcTrilinearInterpWeights
 from formCell2EdgeMatrix import formCell2EdgeMatrix
 from formEdge2EdgeMatrix import formEdge2EdgeMatrix
@@ -84,22 +88,14 @@ if __name__ == '__main__':
                   [-250, 0, 0, -1]])  # return electrode 250 m away
     ]
 
-    # Define the receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
-    spacing = 20  # M-N distance
-    datagridx = np.arange(-1250, 1251, spacing)  # data grid in X
+    # Define the data grid where the electric field is evaluated
+    datagridx = np.arange(-1250, 1251, 20)  # data grid in X
     Ndatagridx = len(datagridx)  # number of data grid in X
-    datagridy = np.arange(-1250, 1251, spacing)  # data grid in Y
+    datagridy = np.arange(-1250, 1251, 20)  # data grid in Y
     Ndatagridy = len(datagridy)  # number of data grid in Y
-    N = Ndatagridx * Ndatagridy  # total number of receivers
+    N = Ndatagridx * Ndatagridy  # total number of data points
     datax, datay = np.meshgrid(datagridx, datagridy)
-    rx = np.concatenate((
-        np.vstack((datax.flatten('F') - spacing / 2, datay.flatten('F'), np.zeros(N), datax.flatten('F') + spacing / 2,
-                   datay.flatten('F'), np.zeros(N))),  # measuring Ex
-        np.vstack((datax.flatten('F'), datay.flatten('F') - spacing / 2, np.zeros(N), datax.flatten('F'),
-                   datay.flatten('F') + spacing / 2, np.zeros(N)))  # measuring Ey
-    ), axis=1)
-    rx = rx.T
-    rx = [rx, rx, rx, rx]  # same receiver locations for four different source configurations
+    points = np.column_stack((datax.flatten('F'), datay.flatten('F'), np.zeros(N)))
 
     '''Form a resistor network'''
     # Get connectivity properties of nodes, edges, faces, cells
@@ -129,38 +125,34 @@ if __name__ == '__main__':
         sources[:, i] = weights.dot(tx[i][:, 3])
 
     # Obtain potentials at the nodes, potential differences and current along the edges
+    # (written to disk one source at a time and read back lazily as memory maps)
+    filename = os.path.join(tempfile.gettempdir(), 'Example_Casing')
     start_time = time.time()
-    potentials, potentialDiffs, currents = solveRESnet(edges, C, sources)
+    potentials, potentialDiffs, currents = solveRESnet(edges, C, sources, filename=filename)
     end_time = time.time()
     print(f"Time: {(end_time - start_time):.6f} seconds")
 
-    # Get simulated data
-    data = []
-    for i in range(Ntx):
-        # weights for the interpolation of potential data at the M-electrode location
-        Mw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, 0:3])
-        # weights for the interpolation of potential data at the N-electrode location
-        Nw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, 3:6])
-        # calculate the potential difference data as "M - N"
-        data.append((Mw.T - Nw.T) @ potentials[:, i])
-    data = np.array(data)
+    # Get simulated data: the electric field from the gradient of the interpolated potentials
+    weights = calcTrilinearGradientWeights(nodeX, nodeY, nodeZ, points)  # one operator for all the sources
+    E, J = calcPointFields(weights, potentials, blkCon[0])
+    data = np.concatenate((E[:, 0, :], E[:, 1, :]), axis=0).T  # [Ex Ey] of each source set
 
     '''Plot the results'''
     # The top row in Figure 5 (Heagy and Oldenburg, 2019)
     fig1 = plt.figure()
-    E1 = data[0] / spacing  # first set of source
+    E1 = data[0]  # first set of source
     draw_figure(E1, '(a) Return electrode offset = 2000 m')
 
     fig2 = plt.figure()
-    E2 = data[1] / spacing  # second set of source
+    E2 = data[1]  # second set of source
     draw_figure(E2, '(b) Return electrode offset = 750 m')
 
     fig3 = plt.figure()
-    E3 = data[2] / spacing  # third set of source
+    E3 = data[2]  # third set of source
     draw_figure(E3, '(c) Return electrode offset = 500 m')
 
     fig4 = plt.figure()
-    E4 = data[3] / spacing  # forth set of source
+    E4 = data[3]  # forth set of source
     draw_figure(E4, '(d) Return electrode offset = 250 m')
 
     plt.show()
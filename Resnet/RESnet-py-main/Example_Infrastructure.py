@@ -3,7 +3,10 @@ import time
 
 from matplotlib import pyplot as plt
 
+from calcApparentResistivity import calcApparentResistivity
+from calcPseudoLocations import calcPseudoLocations
 from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from eliminateAirNodes import eliminateAirNodes
 from formCell2EdgeMatrix import formCell2EdgeMatrix
 from formEdge2EdgeMatrix import formEdge2EdgeMatrix
 from formFace2EdgeMatrix import formFace2EdgeMatrix
@@ -58,6 +61,13 @@ if __name__ == '__main__':
                                  Nloc, np.zeros_like(Nloc), np.zeros_like(Nloc)))  # Mx My(=0) Mz(=0) Nx Ny(=0) Nz(=0)
     Ndata = sum(range(1, Ntx + 1))  # total number of data
 
+    # Flat electrode arrays of all the data (one row per datum)
+    A = np.vstack([np.tile(tx[i][0, 0:3], (rx[i].shape[0], 1)) for i in range(Ntx)])  # A electrodes
+    B = np.vstack([np.tile(tx[i][1, 0:3], (rx[i].shape[0], 1)) for i in range(Ntx)])  # B electrodes
+    M = np.vstack([rx[i][:, 0:3] for i in range(Ntx)])  # M electrodes
+    N = np.vstack([rx[i][:, 3:6] for i in range(Ntx)])  # N electrodes
+    midpoints, pseudoDepths = calcPseudoLocations(A, B, M, N)  # pseudo-section locations
+
     '''Define Model #1: Uniform half-space'''
     blkLoc = [[-np.inf, np.inf, -np.inf, np.inf, np.inf, 0],  # a uniform layer for the air (above surface)
               [-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf]]  # a uniform half-space below surface
@@ -91,9 +101,13 @@ if __name__ == '__main__':
         # total current intensities at all the nodes
         sources[:, i] = weights.dot(tx[i][:, 3])
 
-    # Obtain potentials at the nodes, potential differences and current along the edges
+    # Remove the air nodes that carry no conductor (smaller and better conditioned system)
+    edgesNet, CNet, sourcesNet, nodeInd, _ = eliminateAirNodes(edges, C, sources, Cell2Edge, cellCon, Ce + Cf)
+
+    # Obtain potentials at the nodes kept (the air nodes removed are left at zero)
     start_time = time.time()
-    potentials, potentialDiffs, currents = solveRESnet(edges, C, sources)
+    potentials = np.zeros((nodes.shape[0], Ntx))
+    potentials[nodeInd, :], _, _ = solveRESnet(edgesNet, CNet, sourcesNet)
     end_time = time.time()
     print(f"Time: {(end_time - start_time):.6f} seconds")
 
@@ -109,31 +123,16 @@ if __name__ == '__main__':
     data1 = data  # save to data1
 
     '''Plot Model #1's apparent resistivity'''
-    ABMNKVR1 = np.zeros((Ndata, 7))
-    count = 0
-
-    for i in range(Ntx):
-        A = tx[i][0, 0]
-        B = tx[i][1, 0]
-
-        for j in range(rx[i].shape[0]):
-            M = rx[i][j, 0]
-            N = rx[i][j, 3]
-            K = 2 * np.pi / (1 / (M - A) - 1 / (M - B) - 1 / (N - A) + 1 / (N - B))  # geometric factor
-            count += 1
-            # [A B M N geometric_factor potential_difference apparent_resistivity]
-            ABMNKVR1[count - 1, :] = [A, B, M, N, K, data1[i][j], K * data1[i][j]]
-
-    x = np.sum(ABMNKVR1[:, :4], axis=1) / 4  # mid-point of four electrodes
-    n = (ABMNKVR1[:, 2] - ABMNKVR1[:, 1]) / spacing  # n-spacing as pseudo-depth
+    rhoApp1, K = calcApparentResistivity(A, B, M, N, np.concatenate(data1))
+    x = midpoints[:, 0]  # mid-point of four electrodes
 
     plt.figure()
-    plt.scatter(x, n, 500, np.log10(ABMNKVR1[:, 6]), marker='s', cmap='jet')
+    plt.scatter(x, pseudoDepths, 500, np.log10(rhoApp1), marker='s', cmap='jet')
     plt.gca().invert_yaxis()
     plt.grid(True)
     plt.colorbar(label='Apparent resistivity log(Ohm*m)')
     plt.xlabel('X (m)')
-    plt.ylabel('n-spacing')
+    plt.ylabel('Pseudo-depth (m)')
     plt.title('(1) Model #1: Half-space')
 
     '''Define Model #2: Two blocks in half-space'''
@@ -173,9 +172,13 @@ if __name__ == '__main__':
         # total current intensities at all the nodes
         sources[:, i] = weights.dot(tx[i][:, 3])
 
-    # Obtain potentials at the nodes, potential differences and current along the edges
+    # Remove the air nodes that carry no conductor (smaller and better conditioned system)
+    edgesNet, CNet, sourcesNet, nodeInd, _ = eliminateAirNodes(edges, C, sources, Cell2Edge, cellCon, Ce + Cf)
+
+    # Obtain potentials at the nodes kept (the air nodes removed are left at zero)
     start_time = time.time()
-    potentials, potentialDiffs, currents = solveRESnet(edges, C, sources)
+    potentials = np.zeros((nodes.shape[0], Ntx))
+    potentials[nodeInd, :], _, _ = solveRESnet(edgesNet, CNet, sourcesNet)
     end_time = time.time()
     print(f"Time: {(end_time - start_time):.6f} seconds")
 
@@ -191,30 +194,15 @@ if __name__ == '__main__':
     data2 = data  # save to data2
 
     '''Plot Model #2's apparent resistivity'''
-    ABMNKVR2 = np.zeros((Ndata, 7))
-    count = 0
-
-    for i in range(Ntx):
-        A = tx[i][0, 0]
-        B = tx[i][1, 0]
-
-        for j in range(rx[i].shape[0]):
-            M = rx[i][j, 0]
-            N = rx[i][j, 3]
-            K = 2 * np.pi / (1 / (M - A) - 1 / (M - B) - 1 / (N - A) + 1 / (N - B))  # geometric factor
-            count += 1
-            # [A B M N geometric_factor potential_difference apparent_resistivity]
-            ABMNKVR2[count - 1, :] = [A, B, M, N, K, data2[i][j], K * data2[i][j]]
-
-    x = np.sum(ABMNKVR2[:, :4], axis=1) / 4  # mid-point of four electrodes
-    n = (ABMNKVR2[:, 2] - ABMNKVR2[:, 1]) / spacing  # n-spacing as pseudo-depth
+    rhoApp2, K = calcApparentResistivity(A, B, M, N, np.concatenate(data2))
+    x = midpoints[:, 0]  # mid-point of four electrodes
 
     plt.figure()
-    plt.scatter(x, n, s=500, c=np.log10(ABMNKVR2[:, 6]), marker='s', cmap='viridis', alpha=1.0)
+    plt.scatter(x, pseudoDepths, s=500, c=np.log10(rhoApp2), marker='s', cmap='viridis', alpha=1.0)
     plt.gca().invert_yaxis()
     plt.colorbar(label='Apparent resistivity log(Ohm*m)')
     plt.xlabel('X (m)')
-    plt.ylabel('n-spacing')
+    plt.ylabel('Pseudo-depth (m)')
     plt.title('(2) Model #2: Two blocks')
     plt.grid(True)
 
@@ -268,9 +256,13 @@ if __name__ == '__main__':
         # total current intensities at all the nodes
         sources[:, i] = weights.dot(tx[i][:, 3])
 
-    # Obtain potentials at the nodes, potential differences, and current along the edges
+    # Remove the air nodes that carry no conductor (smaller and better conditioned system)
+    edgesNet, CNet, sourcesNet, nodeInd, _ = eliminateAirNodes(edges, C, sources, Cell2Edge, cellCon, Ce + Cf)
+
+    # Obtain potentials at the nodes kept (the air nodes removed are left at zero)
     start_time = time.time()
-    potentials, potentialDiffs, currents = solveRESnet(edges, C, sources)
+    potentials = np.zeros((nodes.shape[0], Ntx))
+    potentials[nodeInd, :], _, _ = solveRESnet(edgesNet, CNet, sourcesNet)
     end_time = time.time()
     print(f"Time: {(end_time - start_time):.6f} seconds")
 
@@ -286,31 +278,16 @@ if __name__ == '__main__':
     data3 = data  # save to data3
 
     '''Plot Model #3's apparent resistivity'''
-    ABMNKVR3 = np.zeros((Ndata, 7))
-    count = 0
-
-    for i in range(Ntx):
-        A = tx[i][0, 0]
-        B = tx[i][1, 0]
-
-        for j in range(rx[i].shape[0]):
-            M = rx[i][j, 0]
-            N = rx[i][j, 3]
-            K = 2 * np.pi / (1 / (M - A) - 1 / (M - B) - 1 / (N - A) + 1 / (N - B))  # geometric factor
-            count += 1
-            # [A B M N geometric_factor potential_difference apparent_resistivity]
-            ABMNKVR3[count - 1, :] = [A, B, M, N, K, data3[i][j], K * data3[i][j]]
-
-    x = np.sum(ABMNKVR3[:, :4], axis=1) / 4  # mid-point of four electrodes
-    n = (ABMNKVR3[:, 2] - ABMNKVR3[:, 1]) / spacing  # n-spacing as pseudo-depth
+    rhoApp3, K = calcApparentResistivity(A, B, M, N, np.concatenate(data3))
+    x = midpoints[:, 0]  # mid-point of four electrodes
 
     plt.figure()
-    plt.scatter(x, n, s=500, c=np.log10(ABMNKVR3[:, 6]), marker='s', cmap='viridis')
+    plt.scatter(x, pseudoDepths, s=500, c=np.log10(rhoApp3), marker='s', cmap='viridis')
     plt.gca().invert_yaxis()
     plt.colorbar(label='Apparent resistivity log(Ohm*m)')
     plt.grid(True)
     plt.xlabel('X (m)')
-    plt.ylabel('n-spacing')
+    plt.ylabel('Pseudo-depth (m)')
     plt.title('(3) Model #3: Infrastructure')
 
     '''Define Model #4: Above-ground pipe'''
@@ -380,9 +357,13 @@ if __name__ == '__main__':
         # total current intensities at all the nodes
         sources[:, i] = weights.dot(tx[i][:, 3])
 
-    # Obtain potentials at the nodes, potential differences, and current along the edges
+    # Remove the air nodes that carry no conductor (smaller and better conditioned system)
+    edgesNet, CNet, sourcesNet, nodeInd, _ = eliminateAirNodes(edges, C, sources, Cell2Edge, cellCon, Ce + Cf)
+
+    # Obtain potentials at the nodes kept (the air nodes removed are left at zero)
     start_time = time.time()
-    potentials, potentialDiffs, currents = solveRESnet(edges, C, sources)
+    potentials = np.zeros((nodes.shape[0], Ntx))
+    potentials[nodeInd, :], _, _ = solveRESnet(edgesNet, CNet, sourcesNet)
     end_time = time.time()
     print(f"Time: {(end_time - start_time):.6f} seconds")
 
@@ -398,30 +379,15 @@ if __name__ == '__main__':
     data4 = data  # save to data4
 
     '''Plot Model #4's apparent resistivity'''
-    ABMNKVR4 = np.zeros((Ndata, 7))
-    count = 0
-
-    for i in range(Ntx):
-        A = tx[i][0, 0]
-        B = tx[i][1, 0]
-
-        for j in range(rx[i].shape[0]):
-            M = rx[i][j, 0]
-            N = rx[i][j, 3]
-            K = 2 * np.pi / (1 / (M - A) - 1 / (M - B) - 1 / (N - A) + 1 / (N - B))  # geometric factor
-            count += 1
-            # [A, B, M, N, geometric_factor, potential_difference, apparent_resistivity]
-            ABMNKVR4[count - 1, :] = [A, B, M, N, K, data4[i][j], K * data4[i][j]]
-
-    x = np.sum(ABMNKVR4[:, 0:4], axis=1) / 4  # mid-point of four electrodes
-    n = (ABMNKVR4[:, 2] - ABMNKVR4[:, 1]) / spacing  # n-spacing as pseudo-depth
+    rhoApp4, K = calcApparentResistivity(A, B, M, N, np.concatenate(data4))
+    x = midpoints[:, 0]  # mid-point of four electrodes
 
     plt.figure()
-    plt.scatter(x, n, s=500, c=np.log10(ABMNKVR4[:, 6]), marker='s', cmap='viridis')
+    plt.scatter(x, pseudoDepths, s=500, c=np.log10(rhoApp4), marker='s', cmap='viridis')
     plt.gca().invert_yaxis()
     plt.colorbar(label='Apparent resistivity log(Ohm*m)')
     plt.xlabel('X (m)')
-    plt.ylabel('n-spacing')
+    plt.ylabel('Pseudo-depth (m)')
     plt.title('(4) Model #4: Above-ground pipe')
     plt.grid(True)
     plt.show()
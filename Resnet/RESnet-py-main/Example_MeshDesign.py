@@ -0,0 +1,121 @@
+import time
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from designRectMesh import designRectMesh
+from formCell2EdgeMatrix import formCell2EdgeMatrix
+from formMixedBoundaryConductances import formMixedBoundaryConductances
+from formRectMeshConnectivity import formRectMeshConnectivity
+from makeRectMeshModelBlocks import makeRectMeshModelBlocks
+from solveRESnet import solveRESnet
+
+if __name__ == '__main__':
+    """
+    Automatic mesh design
+    designRectMesh searches the coarsest mesh whose half-space data of the
+    survey of Example_Halfspace.py are within 3% of the analytic solution,
+    once for the grounded network (zero flux on the outer faces) and once for
+    the mixed boundary conductances. The designed meshes are compared with
+    the hand-built mesh of Example_Halfspace.py.
+    """
+
+    '''Setup the geo-electrical model'''
+    blkLoc = np.array([-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf])  # a uniform half-space
+    blkCon = np.array([1e-2])  # conductive property of the volumetric object (S/m)
+
+    '''Setup the electric surveys (pole-dipole)'''
+    # Define the current sources in the format of [x y z current(Ampere)]
+    tx = np.array([[(0, 0, 0, 1),  # A electrode
+                    [-np.inf, 0, 0, -1]]])  # B electrode
+
+    # Define the receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
+    rx = np.array([[[10, 0, 0, 20, 0, 0],  # nine M-N pairs for the source
+                    [20, 0, 0, 30, 0, 0],
+                    [30, 0, 0, 40, 0, 0],
+                    [40, 0, 0, 50, 0, 0],
+                    [50, 0, 0, 60, 0, 0],
+                    [60, 0, 0, 70, 0, 0],
+                    [70, 0, 0, 80, 0, 0],
+                    [80, 0, 0, 90, 0, 0],
+                    [90, 0, 0, 100, 0, 0]]])
+    Ntx = len(tx)  # number of tx-rx sets
+
+    '''Simulate on the meshes'''
+    # (mesh, boundary condition): the meshes designed with cells of at least 2 m for a target error of 3%,
+    # and the hand-built mesh of Example_Halfspace.py
+    cases = [('Designed', 'Zero flux'), ('Designed', 'Mixed'), ('Hand-built', 'Zero flux')]
+    data = {}
+    Nnodes = {}
+    for mesh, boundary in cases:
+        if mesh == 'Designed':
+            start_time = time.time()
+            nodeX, nodeY, nodeZ, error = designRectMesh(tx, rx, 2, 0.03, mixedBoundary=boundary == 'Mixed')
+            end_time = time.time()
+            print(f"Designed for {boundary}: {len(nodeX) * len(nodeY) * len(nodeZ)} nodes, "
+                  f"error {error:.4f}. Time: {(end_time - start_time):.6f} seconds")
+        else:
+            h = 2
+            ratio = 1.14
+            nctbc = 30
+            tmp = np.cumsum(h * np.power(ratio, np.arange(nctbc + 1)))
+            nodeX = np.round(np.concatenate((-tmp[::-1], [0], tmp)))  # node locations in X
+            nodeY = np.round(np.concatenate((-tmp[::-1], [0], tmp)))  # node locations in Y
+            nodeZ = np.round(np.concatenate(([0], -tmp)))  # node locations in Z
+
+        # Get connectivity properties of nodes, edges, faces, cells
+        nodes, edges, lengths, faces, areas, cells, volumes = formRectMeshConnectivity(nodeX, nodeY, nodeZ)
+
+        # Conductance on edges of the half-space (the model has cells only)
+        cellCon, faceCon, edgeCon = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCon, [], [], [])
+        C = formCell2EdgeMatrix(edges, lengths, faces, cells, volumes).dot(cellCon)
+
+        # Zero flux: electrodes at infinity snapped to the boundary and the first node grounded;
+        # mixed: electrodes at infinity dropped and the side and bottom boundary nodes connected to infinity
+        sources = np.zeros((nodes.shape[0], Ntx))
+        Cg = None
+        for i in range(Ntx):
+            electrodes = tx[i] if boundary == 'Zero flux' else tx[i][np.all(np.isfinite(tx[i][:, 0:3]), axis=1)]
+            weights = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, electrodes[:, 0:3])
+            sources[:, i] = weights.dot(electrodes[:, 3])
+        if boundary == 'Mixed':
+            Cg = formMixedBoundaryConductances(nodes, edges, faces, areas, cells, cellCon, np.vstack(tx))
+
+        start_time = time.time()
+        potentials, _, _ = solveRESnet(edges, C, sources, Cg)
+        potentials = potentials.reshape((nodes.shape[0], Ntx))
+        end_time = time.time()
+        print(f"{mesh} mesh, {boundary}, {nodes.shape[0]} nodes. Time: {(end_time - start_time):.6f} seconds")
+
+        # Get simulated data
+        Mw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, :3])
+        Nw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, 3:6])
+        data[mesh, boundary] = (Mw.T - Nw.T) @ potentials[:, 0]
+        Nnodes[mesh, boundary] = nodes.shape[0]
+
+    '''Compare against analytic solutions'''
+    Aloc = np.array([0, 0, 0])  # location of A electrode
+    rAM = rx[0][:, 0] - Aloc[0]  # A-M distance
+    rAN = rx[0][:, 3] - Aloc[0]  # A-N distance
+    rho = 100  # half-space resistivity
+    I = 1
+    dV = rho * I / 2 / np.pi * (1 / rAM - 1 / rAN)  # potential differences (analytic solution)
+    X = 0.5 * (rx[0][:, 0] + rx[0][:, 3])  # centers of M-N (x-coordinate)
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 5))
+    for (mesh, boundary), style in zip(cases, ['k.-', 'ro-', 'b.-']):
+        error = (data[mesh, boundary] - dV) / dV
+        print(f"{mesh} mesh, {boundary}: max relative error {np.max(np.abs(error)):.4f}")
+        ax.plot(X, error, style, label=f'{mesh}, {boundary}, {Nnodes[mesh, boundary]} nodes',
+                markerfacecolor='none')
+    ax.axhline(0.03, color='0.5', linestyle='--')
+    ax.axhline(-0.03, color='0.5', linestyle='--')
+    ax.set_title('Numerical errors of the designed and hand-built meshes')
+    ax.set_xlabel('Tx-Rx offset (m)')
+    ax.set_ylabel('Relative error')
+    ax.set_xlim(10, 100)
+    ax.legend()
+    ax.grid(True)
+
+    plt.show()
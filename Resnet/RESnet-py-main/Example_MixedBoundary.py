@@ -0,0 +1,116 @@
+import time
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from formCell2EdgeMatrix import formCell2EdgeMatrix
+from formEdge2EdgeMatrix import formEdge2EdgeMatrix
+from formFace2EdgeMatrix import formFace2EdgeMatrix
+from formMixedBoundaryConductances import formMixedBoundaryConductances
+from formRectMeshConnectivity import formRectMeshConnectivity
+from makeRectMeshModelBlocks import makeRectMeshModelBlocks
+from solveRESnet import solveRESnet
+
+if __name__ == '__main__':
+    """
+    Mixed boundary condition on a mesh with less padding
+    The half-space survey of Example_Halfspace.py is simulated on a mesh with
+    18 instead of 30 padding cells, once with the default grounded network
+    (zero flux on the outer faces) and once with the mixed boundary
+    conductances, and compared against the analytic solution together with
+    the grounded 30-cell mesh of Example_Halfspace.py.
+    """
+
+    '''Setup the geo-electrical model'''
+    blkLoc = np.array([-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf])  # a uniform half-space
+    blkCon = np.array([1e-2])  # conductive property of the volumetric object (S/m)
+
+    '''Setup the electric surveys (pole-dipole)'''
+    # Define the current sources in the format of [x y z current(Ampere)]
+    tx = np.array([[(0, 0, 0, 1),  # A electrode
+                    [-np.inf, 0, 0, -1]]])  # B electrode
+
+    # Define the receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
+    rx = np.array([[[10, 0, 0, 20, 0, 0],  # nine M-N pairs for the source
+                    [20, 0, 0, 30, 0, 0],
+                    [30, 0, 0, 40, 0, 0],
+                    [40, 0, 0, 50, 0, 0],
+                    [50, 0, 0, 60, 0, 0],
+                    [60, 0, 0, 70, 0, 0],
+                    [70, 0, 0, 80, 0, 0],
+                    [80, 0, 0, 90, 0, 0],
+                    [90, 0, 0, 100, 0, 0]]])
+    Ntx = len(tx)  # number of tx-rx sets
+
+    '''Simulate on the meshes'''
+    # (number of padding cells, boundary condition): the mesh of Example_Halfspace.py and the smaller mesh
+    cases = [(30, 'Zero flux'), (18, 'Zero flux'), (18, 'Mixed')]
+    data = {}
+    Nnodes = {}
+    for nctbc, boundary in cases:
+        # Create a 3D rectilinear mesh
+        h = 2
+        ratio = 1.14
+        tmp = np.cumsum(h * np.power(ratio, np.arange(nctbc + 1)))
+        nodeX = np.round(np.concatenate((-tmp[::-1], [0], tmp)))  # node locations in X
+        nodeY = np.round(np.concatenate((-tmp[::-1], [0], tmp)))  # node locations in Y
+        nodeZ = np.round(np.concatenate(([0], -tmp)))  # node locations in Z
+
+        # Get connectivity properties of nodes, edges, faces, cells
+        nodes, edges, lengths, faces, areas, cells, volumes = formRectMeshConnectivity(nodeX, nodeY, nodeZ)
+
+        # Get conductive property model vectors
+        cellCon, faceCon, edgeCon = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCon, [], [], [])
+
+        # Convert all conductive objects to conductance on edges
+        Edge2Edge = formEdge2EdgeMatrix(edges, lengths)
+        Face2Edge = formFace2EdgeMatrix(edges, lengths, faces, areas)
+        Cell2Edge = formCell2EdgeMatrix(edges, lengths, faces, cells, volumes)
+        C = Edge2Edge.dot(edgeCon) + Face2Edge.dot(faceCon) + Cell2Edge.dot(cellCon)  # total conductance
+
+        # Zero flux: electrodes at infinity snapped to the boundary and the first node grounded;
+        # mixed: electrodes at infinity dropped and the side and bottom boundary nodes connected to infinity
+        sources = np.zeros((nodes.shape[0], Ntx))
+        Cg = None
+        for i in range(Ntx):
+            electrodes = tx[i] if boundary == 'Zero flux' else tx[i][np.all(np.isfinite(tx[i][:, 0:3]), axis=1)]
+            weights = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, electrodes[:, 0:3])
+            sources[:, i] = weights.dot(electrodes[:, 3])
+        if boundary == 'Mixed':
+            Cg = formMixedBoundaryConductances(nodes, edges, faces, areas, cells, cellCon, np.vstack(tx))
+
+        start_time = time.time()
+        potentials, _, _ = solveRESnet(edges, C, sources, Cg)
+        potentials = potentials.reshape((nodes.shape[0], Ntx))
+        end_time = time.time()
+        print(f"{boundary}, {nctbc} padding cells, {nodes.shape[0]} nodes. Time: {(end_time - start_time):.6f} seconds")
+
+        # Get simulated data
+        Mw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, :3])
+        Nw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, 3:6])
+        data[nctbc, boundary] = (Mw.T - Nw.T) @ potentials[:, 0]
+        Nnodes[nctbc, boundary] = nodes.shape[0]
+
+    '''Compare against analytic solutions'''
+    Aloc = np.array([0, 0, 0])  # location of A electrode
+    rAM = rx[0][:, 0] - Aloc[0]  # A-M distance
+    rAN = rx[0][:, 3] - Aloc[0]  # A-N distance
+    rho = 100  # half-space resistivity
+    I = 1
+    dV = rho * I / 2 / np.pi * (1 / rAM - 1 / rAN)  # potential differences (analytic solution)
+    X = 0.5 * (rx[0][:, 0] + rx[0][:, 3])  # centers of M-N (x-coordinate)
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 5))
+    for (nctbc, boundary), style in zip(cases, ['b.-', 'k.-', 'ro-']):
+        error = (data[nctbc, boundary] - dV) / dV
+        print(f"{boundary}, {nctbc} padding cells: max relative error {np.max(np.abs(error)):.4f}")
+        ax.plot(X, error, style, label=f'{boundary}, {Nnodes[nctbc, boundary]} nodes', markerfacecolor='none')
+    ax.set_title('Numerical errors')
+    ax.set_xlabel('Tx-Rx offset (m)')
+    ax.set_ylabel('Relative error')
+    ax.set_xlim(10, 100)
+    ax.legend()
+    ax.grid(True)
+
+    plt.show()
@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+from calcHalfspacePotentials import calcHalfspacePotentials
+from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from formCell2EdgeMatrix import formCell2EdgeMatrix
+from formMixedBoundaryConductances import formMixedBoundaryConductances
+from formRectMeshConnectivity import formRectMeshConnectivity
+from makeRectMeshModelBlocks import makeRectMeshModelBlocks
+from solveRESnet import solveRESnet
+from solveRESnetSecondary import solveRESnetSecondary
+
+if __name__ == '__main__':
+    """
+    Secondary-potential formulation
+    A pole-dipole survey over a conductive block in a half-space is simulated
+    on a 5 m mesh with the total potentials (solveRESnet) and with the
+    secondary potentials (solveRESnetSecondary), and both are compared
+    against the total potentials on a 2 m mesh as the reference. The
+    secondary potentials remove the error of the source singularity at the
+    receivers next to the source; the error of the coarse block above its
+    edges is the same for both.
+    """
+
+    '''Setup the geo-electrical model'''
+    con0 = 1e-2  # conductivity of the background half-space (S/m)
+    blkLoc = np.array([[-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf],  # a uniform half-space
+                       [20, 40, -10, 10, -5, -20]])  # a conductive block
+    blkCon = np.array([con0, 1e-1])  # conductive property of the volumetric objects (S/m)
+
+    '''Setup the electric surveys (pole-dipole)'''
+    # Define the current sources in the format of [x y z current(Ampere)]
+    tx = np.array([[(0, 0, 0, 1),  # A electrode
+                    [-np.inf, 0, 0, -1]]])  # B electrode
+
+    # Define the receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
+    rx = np.array([[[10, 0, 0, 20, 0, 0],  # nine M-N pairs for the source
+                    [20, 0, 0, 30, 0, 0],
+                    [30, 0, 0, 40, 0, 0],
+                    [40, 0, 0, 50, 0, 0],
+                    [50, 0, 0, 60, 0, 0],
+                    [60, 0, 0, 70, 0, 0],
+                    [70, 0, 0, 80, 0, 0],
+                    [80, 0, 0, 90, 0, 0],
+                    [90, 0, 0, 100, 0, 0]]])
+
+    '''Simulate on the meshes'''
+    # (core cell size, formulation); the last case is the reference
+    cases = [(5, 'Total'), (5, 'Secondary'), (2, 'Total')]
+    data = {}
+    for h, formulation in cases:
+        # Create a 3D rectilinear mesh with a core of h m cells and 12 padding cells
+        pad = np.cumsum(h * np.power(1.35, np.arange(1, 13)))
+        core = np.arange(-20, 120 + h, h)
+        nodeX = np.round(np.concatenate((core[0] - pad[::-1], core, core[-1] + pad)))  # node locations in X
+        core = np.arange(-30, 30 + h, h)
+        nodeY = np.round(np.concatenate((core[0] - pad[::-1], core, core[-1] + pad)))  # node locations in Y
+        nodeZ = np.round(np.concatenate((-np.arange(0, 40 + h, h), -40 - pad)))  # node locations in Z
+
+        # Get connectivity properties of nodes, edges, faces, cells
+        nodes, edges, lengths, faces, areas, cells, volumes = formRectMeshConnectivity(nodeX, nodeY, nodeZ)
+
+        # Conductances of the model and of the background half-space (the model has cells only)
+        cellCon, faceCon, edgeCon = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCon, [], [], [])
+        Cell2Edge = formCell2EdgeMatrix(edges, lengths, faces, cells, volumes)
+        C = Cell2Edge.dot(cellCon)
+        C0 = Cell2Edge.dot(np.full(cells.shape[0], con0))
+
+        # Conductances from the side and bottom boundary nodes to infinity
+        Cg = formMixedBoundaryConductances(nodes, edges, faces, areas, cells, cellCon, np.vstack(tx))
+
+        start_time = time.time()
+        Mw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, :3])
+        Nw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, 3:6])
+        if formulation == 'Total':
+            finite = np.all(np.isfinite(tx[0][:, 0:3]), axis=1)  # the electrode at infinity is dropped
+            sources = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, tx[0][finite, 0:3]).dot(tx[0][finite, 3])
+            potentials, _, _ = solveRESnet(edges, C, sources.reshape((-1, 1)), Cg)
+            data[h, formulation] = (Mw.T - Nw.T) @ potentials.reshape(-1)
+        else:
+            # Interpolated secondary potentials plus the analytic primary potentials at the receivers
+            secondaryPotentials, _, _, _ = solveRESnetSecondary(nodes, edges, C, C0, con0, tx, 0, Cg)
+            data[h, formulation] = ((Mw.T - Nw.T) @ secondaryPotentials[:, 0]
+                                    + calcHalfspacePotentials(rx[0][:, :3], tx[0], con0)
+                                    - calcHalfspacePotentials(rx[0][:, 3:6], tx[0], con0))
+        end_time = time.time()
+        print(f"{formulation}, {h} m mesh, {nodes.shape[0]} nodes. Time: {(end_time - start_time):.6f} seconds")
+
+    '''Compare against the reference'''
+    reference = data[cases[-1]]
+    X = 0.5 * (rx[0][:, 0] + rx[0][:, 3])  # centers of M-N (x-coordinate)
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 5))
+    for (h, formulation), style in zip(cases[:-1], ['k.-', 'ro-']):
+        error = (data[h, formulation] - reference) / reference
+        print(f"{formulation}, {h} m mesh: max relative difference from the {cases[-1][0]} m mesh "
+              f"{np.max(np.abs(error)):.4f}, at the first receiver {error[0]:.4f}")
+        ax.plot(X, error, style, label=f'{formulation}, {h} m mesh', markerfacecolor='none')
+    ax.set_title(f'Relative differences from the total potentials on the {cases[-1][0]} m mesh')
+    ax.set_xlabel('Tx-Rx offset (m)')
+    ax.set_ylabel('Relative difference')
+    ax.set_xlim(10, 100)
+    ax.legend()
+    ax.grid(True)
+
+    plt.show()
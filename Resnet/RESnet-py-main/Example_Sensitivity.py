@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+from matplotlib import pyplot as plt
+from scipy.sparse import hstack
+
+from calcSensitivity import calcSensitivity
+from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from formCell2EdgeMatrix import formCell2EdgeMatrix
+from formFace2EdgeMatrix import formFace2EdgeMatrix
+from formRectMeshConnectivity import formRectMeshConnectivity
+from makeRectMeshModelBlocks import makeRectMeshModelBlocks
+from solveRESnet import solveRESnet
+
+if __name__ == '__main__':
+    """
+    Checking the adjoint sensitivity against finite differences
+    The Jacobian of dipole-dipole data with respect to the cell
+    conductivities and the face conductances (a conductive sheet) is computed
+    by calcSensitivity and compared, column by column, with central finite
+    differences of the data simulated by solveRESnet.
+    """
+
+    '''Setup the 3D mesh'''
+    nodeX = np.arange(-50, 51, 10)  # node locations in X
+    nodeY = np.arange(-40, 41, 10)  # node locations in Y
+    nodeZ = np.arange(0, -61, -10)  # node locations in Z
+
+    '''Setup the geo-electrical model'''
+    blkLoc = np.array([[-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf],  # a uniform half-space
+                       [-20, 20, -20, 20, -10, -30],  # a conductive block
+                       [10, 10, -20, 20, 0, -40]])  # a vertical conductive sheet
+    blkCon = np.array([1e-2, 1e-1, 1])  # conductive property of the objects (S/m for volumes, S for sheets)
+
+    '''Setup the electric surveys (dipole-dipole)'''
+    # Define the current sources in the format of [x y z current(Ampere)]
+    tx = np.array([[(-40, 0, 0, 1), (-30, 0, 0, -1)],
+                   [(-20, 0, 0, 1), (-10, 0, 0, -1)],
+                   [(0, 0, 0, 1), (10, 0, 0, -1)]])
+
+    # Define the receiver electrodes in the format of [Mx My Mz Nx Ny Nz], the same for all the sources
+    M = np.arange(-40, 40, 10)
+    rx = [np.column_stack((M, 0 * M + 5, 0 * M, M + 10, 0 * M + 5, 0 * M))] * len(tx)
+
+    '''Form a resistor network'''
+    nodes, edges, lengths, faces, areas, cells, volumes = formRectMeshConnectivity(nodeX, nodeY, nodeZ)
+    cellCon, faceCon, edgeCon = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCon, [], [], [])
+
+    # The model is the cell conductivities followed by the face conductances
+    Face2Edge = formFace2EdgeMatrix(edges, lengths, faces, areas)
+    Cell2Edge = formCell2EdgeMatrix(edges, lengths, faces, cells, volumes)
+    Prop2Edge = hstack([Cell2Edge, Face2Edge]).tocsr()
+    model = np.concatenate((cellCon, faceCon))
+    C = Prop2Edge @ model
+
+    # Sources and receivers on the nodes
+    Ntx = len(tx)
+    sources = np.zeros((nodes.shape[0], Ntx))
+    receivers = []
+    for i in range(Ntx):
+        sources[:, i] = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, tx[i][:, 0:3]).dot(tx[i][:, 3])
+        receivers.append(calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, :3])
+                         - calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, 3:6]))
+
+    '''Sensitivity by the adjoint method'''
+    start_time = time.time()
+    J, data = calcSensitivity(edges, C, sources, receivers, Prop2Edge)
+    end_time = time.time()
+    print(f"Jacobian {J.shape[0]} x {J.shape[1]}. Time: {(end_time - start_time):.6f} seconds")
+
+    def simulate(model):
+        # Data of all the source sets stacked in order
+        potentials, _, _ = solveRESnet(edges, Prop2Edge @ model, sources)
+        potentials = potentials.reshape((nodes.shape[0], Ntx))
+        return np.concatenate([receivers[i].T @ potentials[:, i] for i in range(Ntx)])
+
+    '''Compare against central finite differences'''
+    # Cells in the block, the most sensitive cells, faces of the sheet and a face of the background
+    Ncells = cells.shape[0]
+    columns = np.concatenate((np.flatnonzero(cellCon == 1e-1)[:3], np.argsort(np.abs(J[:, :Ncells]).max(axis=0))[-3:],
+                              Ncells + np.flatnonzero(faceCon == 1)[:3], [Ncells]))
+    errors = []
+    for k in columns:
+        step = 1e-4 * max(model[k], 1e-2)
+        perturbation = np.zeros_like(model)
+        perturbation[k] = step
+        Jfd = (simulate(model + perturbation) - simulate(model - perturbation)) / (2 * step)
+        errors.append(np.max(np.abs(J[:, k] - Jfd)) / np.max(np.abs(Jfd)))
+        print(f"{'Cell' if k < Ncells else 'Face'} {k if k < Ncells else k - Ncells}: "
+              f"relative difference {errors[-1]:.2e}")
+    print(f"Simulated data match solveRESnet: {np.allclose(data, simulate(model))}")
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 5))
+    ax.semilogy(np.arange(len(columns)), errors, 'ko')
+    ax.set_title('Adjoint sensitivities against central finite differences')
+    ax.set_xlabel('Parameter tested')
+    ax.set_ylabel('Relative difference')
+    ax.grid(True)
+
+    plt.show()
@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+from calcColeColeConductivity import calcColeColeConductivity
+from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from formCell2EdgeMatrix import formCell2EdgeMatrix
+from formMixedBoundaryConductances import formMixedBoundaryConductances
+from formRectMeshConnectivity import formRectMeshConnectivity
+from makeRectMeshModelBlocks import makeRectMeshModelBlocks
+from solveRESnet import solveRESnet
+from solveRESnetSpectral import solveRESnetSpectral
+
+if __name__ == '__main__':
+    """
+    Spectral induced polarization
+    A chargeable Cole-Cole block below a pole-dipole profile is simulated at
+    the frequencies extracted from the field time series (1, 3, 5 and 10 Hz);
+    the phase of the modelled potential differences is comparable to the
+    phase output of the field FFT processing. Without chargeability, the
+    complex networks are checked against the d.c. network of solveRESnet.
+    """
+
+    '''Setup the 3D mesh'''
+    h = 2
+    ratio = 1.3
+    nctbc = 8
+    tmp = np.cumsum(h * np.power(ratio, np.arange(nctbc + 1)))
+    core = np.arange(-40, 41, h)
+    nodeX = np.round(np.concatenate((core[0] - tmp[::-1], core, core[-1] + tmp)))  # node locations in X
+    nodeY = np.round(np.concatenate((-12 - tmp[::-1], np.arange(-12, 13, h), 12 + tmp)))  # node locations in Y
+    nodeZ = np.round(np.concatenate((np.arange(0, -21, -h), -20 - tmp)))  # node locations in Z
+
+    '''Setup the geo-electrical model'''
+    blkLoc = np.array([[-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf],  # a uniform half-space
+                       [-6, 6, -6, 6, -4, -14]])  # a chargeable block
+    blkCon = np.array([1e-2, 2e-2])  # d.c. conductivity (S/m)
+    blkCharge = np.array([0, 0.3])  # Cole-Cole chargeability
+    tau = 0.1  # Cole-Cole time constant (s)
+    c = 0.5  # Cole-Cole frequency exponent
+    frequencies = np.array([1, 3, 5, 10])  # frequencies (Hz)
+
+    '''Setup the electric surveys (pole-dipole)'''
+    # Define the current sources in the format of [x y z current(Ampere)]
+    tx = np.array([[(-30, 0, 0, 1),  # A electrode
+                    [-np.inf, 0, 0, -1]]])  # B electrode
+
+    # Define the receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
+    M = np.arange(-24, 36, 4)
+    rx = [np.column_stack((M, 0 * M, 0 * M, M + 4, 0 * M, 0 * M))]
+
+    '''Form a resistor network'''
+    # Get connectivity properties of nodes, edges, faces, cells
+    nodes, edges, lengths, faces, areas, cells, volumes = formRectMeshConnectivity(nodeX, nodeY, nodeZ)
+
+    # Get the d.c. conductivity and the chargeability on cells
+    cellCon, _, _ = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCon, [], [], [])
+    cellCharge, _, _ = makeRectMeshModelBlocks(nodeX, nodeY, nodeZ, blkLoc, blkCharge, [], [], [])
+
+    # Complex conductivity at each frequency converted to admittance on edges
+    Cell2Edge = formCell2EdgeMatrix(edges, lengths, faces, cells, volumes)
+    C = Cell2Edge @ calcColeColeConductivity(cellCon, cellCharge, tau, c, frequencies)
+
+    # Conductances from the side and bottom boundary nodes to infinity
+    Cg = formMixedBoundaryConductances(nodes, edges, faces, areas, cells, cellCon, np.vstack(tx))
+
+    '''Solve the resistor network problem'''
+    Ntx = len(tx)  # number of tx-rx sets
+    sources = np.zeros((nodes.shape[0], Ntx))
+    for i in range(Ntx):
+        finite = np.all(np.isfinite(tx[i][:, 0:3]), axis=1)  # electrodes at infinity dropped
+        weights = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, tx[i][finite, 0:3])
+        sources[:, i] = weights.dot(tx[i][finite, 3])
+
+    start_time = time.time()
+    potentials, _, _ = solveRESnetSpectral(edges, C, sources, Cg)
+    end_time = time.time()
+    print(f"Time: {(end_time - start_time):.6f} seconds")
+
+    # Get simulated data (complex potential differences at each frequency)
+    Mw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, :3])
+    Nw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[0][:, 3:6])
+    data = (Mw.T - Nw.T) @ potentials[:, 0, :]
+
+    '''Check against the d.c. solution'''
+    # Without chargeability the conductivity is real at all frequencies and the d.c. potentials are recovered
+    potentialsDC, _, _ = solveRESnet(edges, Cell2Edge @ cellCon, sources, Cg)
+    potentialsDC = potentialsDC.reshape((nodes.shape[0], Ntx))
+    C0 = Cell2Edge @ calcColeColeConductivity(cellCon, 0, tau, c, frequencies)
+    potentials0, _, _ = solveRESnetSpectral(edges, C0, sources, Cg)
+    difference = np.max(np.abs(potentials0 - potentialsDC[:, :, np.newaxis])) / np.max(np.abs(potentialsDC))
+    print(f"Zero chargeability: max relative difference from the d.c. potentials {difference:.2e}")
+
+    '''Plot the phase along the profile'''
+    X = 0.5 * (rx[0][:, 0] + rx[0][:, 3])  # centers of M-N (x-coordinate)
+    fig, ax = plt.subplots(1, 1, figsize=(10, 5))
+    for k in range(len(frequencies)):
+        ax.plot(X, 1000 * np.angle(data[:, k]), '.-', label='%g Hz' % frequencies[k])
+    ax.axvspan(-6, 6, color='0.9')
+    ax.set_title('Phase of the potential differences with %d nodes' % nodes.shape[0])
+    ax.set_xlabel('X (m)')
+    ax.set_ylabel('Phase (mrad)')
+    ax.legend()
+    ax.grid(True)
+
+    plt.show()
@@ -0,0 +1,142 @@
+import time
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+from calcTreeInterpWeights import calcTreeInterpWeights
+from constrainHangingNodes import constrainHangingNodes
+from formEdge2EdgeMatrix import formEdge2EdgeMatrix
+from formRESnetMatrix import formRESnetMatrix
+from formTreeCell2EdgeMatrix import formTreeCell2EdgeMatrix
+from formTreeFace2EdgeMatrix import formTreeFace2EdgeMatrix
+from formTreeMesh import formTreeMesh
+from formTreeMeshConnectivity import formTreeMeshConnectivity
+from makeTreeMeshModelBlocks import makeTreeMeshModelBlocks
+from solveRESnet import solveRESnet
+
+if __name__ == '__main__':
+    """
+    Testing the solution of half-space on a tree mesh
+    The pole-dipole survey of Example_Halfspace.py is simulated on a coarse
+    16 m mesh refined down to 2 m cells around the electrodes only, and
+    compared against the analytic solution. The hanging nodes are constrained
+    to the linear interpolation of the coarse cells' corners, and the
+    networks with and without the constraint are checked on a uniform field.
+    """
+
+    '''Setup the 3D tree mesh'''
+    # Create a coarse base rectilinear mesh
+    h = 16
+    ratio = 1.3
+    nctbc = 11
+    tmp = np.cumsum(h * np.power(ratio, np.arange(1, nctbc + 1)))
+    core = np.arange(-32, 128 + h, h)
+    nodeX = np.concatenate((core[0] - tmp[::-1], core, core[-1] + tmp))  # node locations in X
+    core = np.arange(-32, 32 + h, h)
+    nodeY = np.concatenate((core[0] - tmp[::-1], core, core[-1] + tmp))  # node locations in Y
+    nodeZ = np.concatenate((-np.arange(0, 32 + h, h), -32 - tmp))  # node locations in Z
+
+    # Refine around the electrodes: each level halves the cells within a shrinking margin
+    refineLoc = np.array([[-32, 132, -32, 32, 0, -32],  # 8 m cells
+                          [-16, 116, -16, 16, 0, -16],  # 4 m cells
+                          [-8, 108, -8, 8, 0, -8]])  # 2 m cells
+    refineLevel = np.array([1, 2, 3])
+    cellBox = formTreeMesh(nodeX, nodeY, nodeZ, refineLoc, refineLevel)
+
+    '''Setup the geo-electrical model'''
+    blkLoc = np.array([-np.inf, np.inf, -np.inf, np.inf, 0, -np.inf])  # a uniform half-space
+    blkCon = np.array([1e-2])  # conductive property of the volumetric object (S/m)
+
+    '''Setup the electric surveys (pole-dipole)'''
+    # Define the current sources in the format of [x y z current(Ampere)]
+    tx = np.array([[(0, 0, 0, 1),  # A electrode
+                    [-np.inf, 0, 0, -1]]])  # B electrode
+
+    # Define the receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
+    rx = np.array([[[10, 0, 0, 20, 0, 0],  # nine M-N pairs for the source
+                    [20, 0, 0, 30, 0, 0],
+                    [30, 0, 0, 40, 0, 0],
+                    [40, 0, 0, 50, 0, 0],
+                    [50, 0, 0, 60, 0, 0],
+                    [60, 0, 0, 70, 0, 0],
+                    [70, 0, 0, 80, 0, 0],
+                    [80, 0, 0, 90, 0, 0],
+                    [90, 0, 0, 100, 0, 0]]])
+
+    '''Form a resistor network'''
+    # Get connectivity properties of nodes, edges, faces, cells (hanging nodes included)
+    nodes, edges, lengths, faces, faceBox, areas, cells, volumes = formTreeMeshConnectivity(cellBox)
+    print(f"Tree mesh: {nodes.shape[0]} nodes, {cellBox.shape[0]} cells")
+
+    # Get conductive property model vectors
+    cellCon, faceCon, edgeCon = makeTreeMeshModelBlocks(nodes, edges, faceBox, cellBox, blkLoc, blkCon, [], [], [])
+
+    # Convert all conductive objects to conductance on edges
+    Edge2Edge = formEdge2EdgeMatrix(edges, lengths)
+    Face2Edge = formTreeFace2EdgeMatrix(nodes, edges, lengths, faces, faceBox)
+    Cell2Edge = formTreeCell2EdgeMatrix(nodes, edges, lengths, cells, cellBox)
+    C = Edge2Edge.dot(edgeCon) + Face2Edge.dot(faceCon) + Cell2Edge.dot(cellCon)  # total conductance
+
+    # Calculate current sources on the nodes using info in tx
+    Ntx = len(tx)  # number of tx-rx sets
+    sources = np.zeros((nodes.shape[0], Ntx))
+    for i in range(Ntx):
+        weights = calcTreeInterpWeights(nodeX, nodeY, nodeZ, nodes, cellBox, tx[i][:, 0:3])
+        sources[:, i] = weights.dot(tx[i][:, 3])
+
+    # Constrain the hanging nodes to the interpolation of the coarse cells' corners
+    edgesNet, CNet, sourcesNet = constrainHangingNodes(nodes, edges, C, sources, cellBox)
+
+    '''Check a uniform field'''
+    # A linear potential must leave no current imbalance at the nodes inside the mesh
+    interior = np.all((nodes > nodes.min(axis=0)) & (nodes < nodes.max(axis=0)), axis=1)
+    interior[0] = False  # the grounded node
+    for name, e, c in [('Mesh edges', edges, C), ('Constrained', edgesNet, CNet)]:
+        _, A = formRESnetMatrix(e, c)
+        imbalance = np.abs(A @ nodes[:, 0])[interior]
+        print(f"{name}: {e.shape[0]} edges, max current imbalance of a uniform field {np.max(imbalance):.3e} A")
+
+    '''Solve the resistor network problem'''
+    start_time = time.time()
+    potentials, _, _ = solveRESnet(edgesNet, CNet, sourcesNet)
+    end_time = time.time()
+    print(f"Time: {(end_time - start_time):.6f} seconds")
+
+    # Get simulated data
+    potentials = potentials.reshape((-1, Ntx))
+    data = []
+    for i in range(Ntx):
+        Mw = calcTreeInterpWeights(nodeX, nodeY, nodeZ, nodes, cellBox, rx[i][:, :3])
+        Nw = calcTreeInterpWeights(nodeX, nodeY, nodeZ, nodes, cellBox, rx[i][:, 3:6])
+        data.append((Mw.T - Nw.T) @ potentials[:, i])
+
+    '''Compare against analytic solutions'''
+    rAM = rx[0][:, 0]  # A-M distance
+    rAN = rx[0][:, 3]  # A-N distance
+    rho = 100  # half-space resistivity
+    I = 1
+    dV = rho * I / 2 / np.pi * (1 / rAM - 1 / rAN)  # potential differences (analytic solution)
+    X = 0.5 * (rx[0][:, 0] + rx[0][:, 3])  # centers of M-N (x-coordinate)
+
+    fig, axs = plt.subplots(2, 1, figsize=(10, 10))
+    axs[0].semilogy(X, data[0], '.-', label='RESnet (tree mesh)')
+    axs[0].plot(X, dV, 'o-', label='Analytic', markerfacecolor='none')
+    axs[0].set_title('(a) Numerical and analytic solutions')
+    axs[0].set_xlabel('Tx-Rx offset (m)')
+    axs[0].set_ylabel('Potential difference (V)')
+    axs[0].set_xlim(10, 100)
+    axs[0].set_ylim(0.01, 1)
+    axs[0].legend()
+    axs[0].grid(True)
+
+    print(f"Max relative error: {np.max(np.abs((data[0] - dV) / dV)):.4f}")
+
+    axs[1].plot(X, ((data[0] - dV) / dV), 'k.-')
+    axs[1].set_title('(b) Numerical errors')
+    axs[1].set_xlabel('Tx-Rx offset (m)')
+    axs[1].set_ylabel('Relative error')
+    axs[1].set_xlim(10, 100)
+    axs[1].set_ylim(-0.04, 0.02)
+    axs[1].grid(True)
+
+    plt.show()
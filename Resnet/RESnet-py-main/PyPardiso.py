@@ -15,7 +15,9 @@ import os
 
 
 class PyPardiso:
-    def __init__(self,A=None,b=None,matrix_type=13,phase=12):
+    def __init__(self,A=None,b=None,matrix_type=13,phase=12,single_precision=False):
+        if single_precision:
+            A = A.astype(np.complex64 if np.iscomplexobj(A.data) else np.float32)
         self.A = A
         self.mkl_dll = None
 
@@ -111,6 +113,9 @@ class PyPardiso:
         c_int64_p=ctypes.POINTER(ctypes.c_int64)
         c_float64_p = ctypes.POINTER(ctypes.c_double)
         self.mkl_dll.pardisoinit(self.pt.ctypes.data_as(c_int64_p),ctypes.byref(ctypes.c_int32(self.mtype)),self.iparm.ctypes.data_as(c_int32_p))
+        if single_precision:
+            self.iparm[0] = 1  # Keep the defaults set by pardisoinit except
+            self.iparm[27] = 1  # single precision factorization (A, b and x in single precision)
         self.mkl_dll.pardiso(self.pt.ctypes.data_as(c_int64_p),
                           ctypes.byref(ctypes.c_int32(self.maxfct)),
                           ctypes.byref(ctypes.c_int32(self.mnum)),
@@ -130,7 +135,10 @@ class PyPardiso:
 
 
     def solve(self,b):
-        x = np.zeros_like(b)
+        # Multiple right-hand sides are solved in one call as the columns of a Fortran-ordered b
+        b = np.asfortranarray(b, dtype=self.A.data.dtype if self.iparm[27] == 1 else np.result_type(b, self.A.data))
+        nrhs = 1 if b.ndim == 1 else b.shape[1]
+        x = np.zeros_like(b, order='F')
         phase=33
         nullptr = ctypes.c_void_p()
         pardiso_error = ctypes.c_int32(0)
@@ -150,7 +158,7 @@ class PyPardiso:
                           self.ia.ctypes.data_as(c_int32_p),
                           self.ja.ctypes.data_as(c_int32_p),
                           self.perm.ctypes.data_as(c_int32_p),
-                          ctypes.byref(ctypes.c_int32(1)),
+                          ctypes.byref(ctypes.c_int32(nrhs)),
                           self.iparm.ctypes.data_as(c_int32_p),
                           ctypes.byref(ctypes.c_int32(self.msglvl)),
                           b.ctypes.data_as(c_float64_p),
@@ -158,6 +166,34 @@ class PyPardiso:
                           ctypes.byref((self.error)))
 
         return x
+
+    def refactorize(self, A):
+        # Numerical factorization of a matrix with the same sparsity pattern, reusing the analysis
+        if self.iparm[27] == 1:
+            A = A.astype(self.A.data.dtype)
+        self.A = A
+        phase = 22
+        nullptr = ctypes.c_void_p()
+        c_int32_p = ctypes.POINTER(ctypes.c_int32)
+        c_int64_p = ctypes.POINTER(ctypes.c_int64)
+        c_float64_p = ctypes.POINTER(ctypes.c_double)
+        self.mkl_dll.pardiso(self.pt.ctypes.data_as(c_int64_p),
+                          ctypes.byref(ctypes.c_int32(self.maxfct)),
+                          ctypes.byref(ctypes.c_int32(self.mnum)),
+                          ctypes.byref(ctypes.c_int32(self.mtype)),
+                          ctypes.byref(ctypes.c_int32(phase)),
+                          ctypes.byref(ctypes.c_int32(self.n)),
+                          self.A.data.ctypes.data_as(c_float64_p),
+                          self.ia.ctypes.data_as(c_int32_p),
+                          self.ja.ctypes.data_as(c_int32_p),
+                          self.perm.ctypes.data_as(c_int32_p),
+                          ctypes.byref(ctypes.c_int32(1)),
+                          self.iparm.ctypes.data_as(c_int32_p),
+                          ctypes.byref(ctypes.c_int32(self.msglvl)),
+                          nullptr,
+                          nullptr,
+                          ctypes.byref(self.error))
+
     def set_phase(self, phase):
         self.phase = phase
 
@@ -0,0 +1,44 @@
+import numpy as np
+from scipy.optimize import nnls
+from scipy.special import k0
+
+
+def calc2p5DWavenumbers(rmin, rmax, Nk=10):
+    """
+    Calculate the wavenumbers and quadrature weights of the inverse Fourier
+    cosine transform used by the 2.5D resistor network.
+
+    Parameters:
+    -----------
+    rmin, rmax: float
+        The shortest and the longest source-receiver distance (in meter) that
+        the quadrature should be accurate for
+    Nk: int
+        Number of wavenumbers (default is 10)
+
+    Returns:
+    --------
+    k: numpy.ndarray
+        A vector of Nk wavenumbers (1/m), logarithmically spaced
+    g: numpy.ndarray
+        A vector of Nk quadrature weights; the factor 2/pi of the inverse
+        transform is included
+
+    Note:
+    -----
+    The potential in 3D is recovered from the wavenumber-domain potentials as
+        V(x, y=0, z) = sum(g * U(x, k, z))
+    The weights are fitted in the least-squares sense (non-negative) so that
+    the sum reproduces the whole-space kernel 1/r = 2/pi * int K0(k*r) dk for
+    r in [rmin, rmax]; 10 wavenumbers give ~0.1% error for rmax/rmin = 1000.
+    """
+
+    # Wavenumbers that cover the decay of K0(k*r) for all distances of interest
+    k = np.logspace(np.log10(0.1 / rmax), np.log10(5 / rmin), Nk)
+
+    # Fit the weights on more distances than unknowns
+    r = np.logspace(np.log10(rmin), np.log10(rmax), 4 * Nk)
+    kernel = k0(np.outer(r, k)) * r.reshape(-1, 1)
+    g, _ = nnls(kernel, np.ones(len(r)), maxiter=50 * Nk)
+
+    return k, g
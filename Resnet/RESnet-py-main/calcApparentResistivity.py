@@ -0,0 +1,33 @@
+from calcGeometricFactors import calcGeometricFactors
+
+
+def calcApparentResistivity(A, B, M, N, data, current=1, zSurface=0):
+    """
+    Calculate the apparent resistivity of potential difference data of
+    four-electrode arrays with arbitrary 3D electrode positions.
+
+    Parameters:
+    -----------
+    A, B, M, N: numpy.ndarray
+        Ndata x 3 matrices of the X, Y, Z coordinates of the electrodes of
+        every datum (see calcGeometricFactors)
+    data: numpy.ndarray
+        a vector of the potential differences VM - VN (V), e.g. the data of
+        all the source sets concatenated
+    current: float
+        the source current (A) (scalar or vector, default is 1)
+    zSurface: float
+        elevation of the air-earth interface (default is 0)
+
+    Returns:
+    --------
+    rhoApp: numpy.ndarray
+        a vector of the apparent resistivity (Ohm*m)
+    K: numpy.ndarray
+        a vector of the geometric factors
+    """
+
+    K = calcGeometricFactors(A, B, M, N, zSurface)
+    rhoApp = K * data / current
+
+    return rhoApp, K
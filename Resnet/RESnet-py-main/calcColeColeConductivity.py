@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def calcColeColeConductivity(con0, chargeability, tau, c, frequencies):
+    """
+    Calculate the complex conductivity of a Cole-Cole (Pelton) model at
+    several frequencies for spectral induced polarization.
+
+    Parameters:
+    -----------
+    con0: numpy.ndarray
+        a vector of the d.c. conductivity (S/m), e.g. cellCon
+    chargeability: numpy.ndarray
+        the intrinsic chargeability (0 to 1) of each value in con0 (scalar or
+        vector)
+    tau: numpy.ndarray
+        the time constant (s) (scalar or vector)
+    c: numpy.ndarray
+        the frequency exponent (0 to 1) (scalar or vector)
+    frequencies: numpy.ndarray
+        a vector of the frequencies (Hz)
+
+    Returns:
+    --------
+    con: numpy.ndarray
+        a Ncon x Nfreq matrix of the complex conductivity (S/m), one column
+        per frequency
+
+    Note:
+    -----
+    rho(w) = rho0 * (1 - m * (1 - 1 / (1 + (i * w * tau) ^ c))) with the
+    exp(i * w * t) time dependence, so con = 1 / rho has a positive phase and
+    the potentials lag the current. A zero chargeability gives con0 at all
+    frequencies, so the d.c. network of the same model is recovered.
+    """
+
+    con0 = np.asarray(con0, dtype=np.float64)[:, np.newaxis]
+    chargeability = np.broadcast_to(chargeability, con0.shape[:1])[:, np.newaxis]
+    tau = np.broadcast_to(tau, con0.shape[:1])[:, np.newaxis]
+    c = np.broadcast_to(c, con0.shape[:1])[:, np.newaxis]
+    omega = 2 * np.pi * np.atleast_1d(frequencies)[np.newaxis, :]
+
+    con = con0 / (1 - chargeability * (1 - 1 / (1 + (1j * omega * tau) ** c)))
+
+    return con
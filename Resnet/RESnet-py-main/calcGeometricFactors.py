@@ -0,0 +1,49 @@
+import numpy as np
+
+
+def calcGeometricFactors(A, B, M, N, zSurface=0):
+    """
+    Calculate the geometric factors of four-electrode arrays with arbitrary
+    3D electrode positions in a half-space, including buried electrodes.
+
+    Parameters:
+    -----------
+    A, B, M, N: numpy.ndarray
+        Ndata x 3 matrices of the X, Y, Z coordinates of the A, B (current)
+        and M, N (potential) electrodes of every datum; electrodes at
+        infinity (any coordinate inf) do not contribute
+    zSurface: float
+        elevation of the air-earth interface (default is 0)
+
+    Returns:
+    --------
+    K: numpy.ndarray
+        a vector of the geometric factors, so that apparent resistivity =
+        K * (VM - VN) / I
+
+    Note:
+    -----
+    K = 4 * pi / (g(AM) - g(BM) - g(AN) + g(BN)) with g = 1 / r + 1 / r',
+    where r' is the distance to the image of the current electrode above the
+    surface (see calcHalfspacePotentials); for surface electrodes this is the
+    familiar 2 * pi / (1/AM - 1/BM - 1/AN + 1/BN).
+    """
+
+    G = green(A, M, zSurface) - green(B, M, zSurface) - green(A, N, zSurface) + green(B, N, zSurface)
+    with np.errstate(divide='ignore'):
+        K = 4 * np.pi / G
+
+    return K
+
+
+def green(source, receiver, zSurface):
+    # 1 / r + 1 / r' between the rows of two electrode arrays, zero for electrodes at infinity
+    source = np.atleast_2d(source)
+    receiver = np.atleast_2d(receiver)
+    d2 = np.sum((source[:, 0:2] - receiver[:, 0:2]) ** 2, axis=1)
+    r = np.sqrt(d2 + (source[:, 2] - receiver[:, 2]) ** 2)
+    rImage = np.sqrt(d2 + (2 * zSurface - source[:, 2] - receiver[:, 2]) ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        g = 1 / r + 1 / rImage
+    g[~(np.all(np.isfinite(source), axis=1) & np.all(np.isfinite(receiver), axis=1))] = 0
+    return g
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def calcHalfspacePotentials(points, electrodes, con0, zSurface=0, rmin=0):
+    """
+    Calculate the analytic potentials of point current electrodes in a uniform
+    half-space.
+
+    Parameters:
+    -----------
+    points: numpy.ndarray
+        a Npoints x 3 matrix specifying the X, Y, Z coordinates of points
+    electrodes: numpy.ndarray
+        a Nelectrodes x 4 matrix of current electrodes in the format of
+        [x y z current(Ampere)], e.g. one set of sources in tx; electrodes at
+        infinity do not contribute
+    con0: float
+        conductivity of the half-space (S/m)
+    zSurface: float
+        elevation of the air-earth interface (default is 0)
+    rmin: float
+        distances shorter than rmin are set to rmin to avoid the singularity
+        at the electrodes (default is 0)
+
+    Returns:
+    --------
+    potentials: numpy.ndarray
+        a vector of the potentials at the points (V)
+
+    Note:
+    -----
+    V = I / (4 * pi * con0) * (1 / r + 1 / r'), where r' is the distance to
+    the image of the electrode above the surface; for a surface electrode this
+    is the familiar I / (2 * pi * con0 * r).
+    """
+
+    points = np.atleast_2d(points)
+    electrodes = np.atleast_2d(electrodes)
+    electrodes = electrodes[np.all(np.isfinite(electrodes[:, 0:3]), axis=1), :]
+
+    potentials = np.zeros(points.shape[0])
+    for x, y, z, current in electrodes:
+        d = points[:, 0:2] - np.array([x, y])
+        r = np.sqrt(np.sum(d ** 2, axis=1) + (points[:, 2] - z) ** 2)
+        rImage = np.sqrt(np.sum(d ** 2, axis=1) + (points[:, 2] - (2 * zSurface - z)) ** 2)
+        r = np.maximum(r, rmin)
+        rImage = np.maximum(rImage, rmin)
+        potentials += current / (4 * np.pi * con0) * (1 / r + 1 / rImage)
+
+    return potentials
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def calcPointFields(weights, potentials, con):
+    """
+    Calculate the electric field and current density vectors at points from
+    the potentials on the nodes.
+
+    Parameters:
+    -----------
+    weights: scipy.sparse.csr_matrix
+        the gradient weights of the points (calcTrilinearGradientWeights),
+        computed once per point set
+    potentials: numpy.ndarray
+        a Nnodes x Ntx matrix of the potentials of the source sets
+        (solveRESnet)
+    con: numpy.ndarray
+        conductivity at the points (S/m) (scalar or vector)
+
+    Returns:
+    --------
+    E: numpy.ndarray
+        a Npoints x 3 x Ntx array of the electric field [Ex Ey Ez] (V/m)
+    J: numpy.ndarray
+        a Npoints x 3 x Ntx array of the current density [Jx Jy Jz] (A/m^2)
+    """
+
+    Npoint = weights.shape[1] // 3
+    potentials = np.reshape(potentials, (weights.shape[0], -1))
+
+    E = -np.reshape(weights.T @ potentials, (3, Npoint, -1)).transpose(1, 0, 2)
+    J = np.reshape(con, (-1, 1, 1)) * E
+
+    return E, J
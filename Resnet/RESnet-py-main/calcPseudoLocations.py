@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def calcPseudoLocations(A, B, M, N):
+    """
+    Calculate the pseudo-section plotting locations (midpoints and
+    pseudo-depths) of four-electrode arrays.
+
+    Parameters:
+    -----------
+    A, B, M, N: numpy.ndarray
+        Ndata x 3 matrices of the X, Y, Z coordinates of the electrodes of
+        every datum; electrodes at infinity (any coordinate inf) are left out
+        (pole arrays)
+
+    Returns:
+    --------
+    midpoints: numpy.ndarray
+        a Ndata x 3 matrix of the midpoints between the centers of the
+        current and the potential electrodes
+    pseudoDepths: numpy.ndarray
+        a vector of the pseudo-depths below the midpoints, half the distance
+        between the two centers
+    """
+
+    txCenter = center(A, B)
+    rxCenter = center(M, N)
+    midpoints = (txCenter + rxCenter) / 2
+    pseudoDepths = np.sqrt(np.sum((txCenter - rxCenter) ** 2, axis=1)) / 2
+
+    return midpoints, pseudoDepths
+
+
+def center(P1, P2):
+    # Center of the finite electrodes of each pair
+    P1 = np.atleast_2d(P1).astype(np.float64)
+    P2 = np.atleast_2d(P2).astype(np.float64)
+    finite1 = np.all(np.isfinite(P1), axis=1)[:, np.newaxis]
+    finite2 = np.all(np.isfinite(P2), axis=1)[:, np.newaxis]
+    total = np.where(finite1, P1, 0) + np.where(finite2, P2, 0)
+    return total / np.maximum(finite1 + finite2, 1)
@@ -0,0 +1,100 @@
+import numpy as np
+from scipy.sparse import csc_matrix
+from scipy.sparse import triu
+from PyPardiso import PyPardiso
+
+from formRESnetMatrix import formRESnetMatrix
+
+
+def calcSensitivity(edges, C, sources, receivers, Prop2Edge, Cg=None, blockSize=100, filename=None):
+    """
+    Calculate the sensitivity (Jacobian) of the potential difference data with
+    respect to a conductive property model by the adjoint method.
+
+    Parameters:
+    -----------
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges
+    C: numpy.ndarray
+        a vector of conductance values on edges
+    sources: numpy.ndarray
+        a Nnodes x Ntx matrix of the current sources on the nodes
+    receivers: list
+        Ntx sparse matrices (Nnodes x Ndata of each source set) that form the
+        data from the potentials, e.g. Mw - Nw of calcTrilinearInterpWeights,
+        so that data = receivers[i]' * potentials[:, i]
+    Prop2Edge: scipy.sparse.csr_matrix
+        the mapping from the property model to conductance on edges:
+        Cell2Edge for cellCon, Face2Edge for faceCon, Edge2Edge for edgeCon, or
+        several of them stacked with scipy.sparse.hstack; extra edges appended
+        after its rows (e.g. a pipe) are not part of the model
+    Cg: numpy.ndarray
+        conductance from each node to the ground at infinity (see solveRESnet)
+    blockSize: int
+        number of adjoint problems solved at once (default is 100)
+    filename: str
+        if given, J is written block by block to this .npy file and returned
+        as a memory map instead of an in-memory array
+
+    Returns:
+    --------
+    J: numpy.ndarray
+        a Ndata x Nprop matrix of the derivatives of the data (all the source
+        sets stacked in order) with respect to the property values
+    data: numpy.ndarray
+        a vector of the simulated data in the same order
+
+    Note:
+    -----
+    With A * u = s and d = P' * u, the derivative with respect to the
+    conductance of edge e is -(G * lambda)_e * (G * u)_e where A * lambda = P,
+    so one factorization of A serves the forward and all the adjoint solves.
+    Receiver sets shared by several source sets (the usual case) are solved
+    for only once.
+    """
+
+    Ntx = sources.shape[1]
+    Nprop = Prop2Edge.shape[1]
+    NedgesProp = Prop2Edge.shape[0]
+    Ndata = np.array([r.shape[1] for r in receivers])
+    offsets = np.concatenate(([0], np.cumsum(Ndata)))
+
+    if filename is None:
+        J = np.zeros((offsets[-1], Nprop))
+    else:
+        J = np.lib.format.open_memmap(filename, mode='w+', dtype=np.float64, shape=(int(offsets[-1]), Nprop))
+
+    # One factorization for the forward and adjoint problems
+    G, A = formRESnetMatrix(edges, C, Cg)
+    solver = PyPardiso(triu(A, format='csr'), matrix_type=2)
+    potentials = np.reshape(solver.solve(sources.astype(np.float64)), (-1, Ntx))
+    fields = -(G @ potentials)[:NedgesProp, :]
+    PropT = Prop2Edge.T.tocsr()
+
+    # Group the source sets that share the same receivers
+    groups = {}
+    for i in range(Ntx):
+        P = csc_matrix(receivers[i])
+        P.sort_indices()
+        key = (P.shape, P.indptr.tobytes(), P.indices.tobytes(), P.data.tobytes())
+        groups.setdefault(key, []).append(i)
+
+    data = np.zeros(offsets[-1])
+    for members in groups.values():
+        P = csc_matrix(receivers[members[0]])
+        for i in members:
+            data[offsets[i]:offsets[i + 1]] = P.T @ potentials[:, i]
+
+        # Adjoint solves in blocks of receivers
+        for j0 in range(0, P.shape[1], blockSize):
+            j1 = min(j0 + blockSize, P.shape[1])
+            adjoint = np.reshape(solver.solve(P[:, j0:j1].toarray()), (-1, j1 - j0))
+            adjointFields = (G @ adjoint)[:NedgesProp, :]
+            for i in members:
+                J[offsets[i] + j0:offsets[i] + j1, :] = (PropT @ (adjointFields * fields[:, [i]])).T
+            if filename is not None:
+                J.flush()
+
+    solver.release()  # Release memory
+
+    return J, data
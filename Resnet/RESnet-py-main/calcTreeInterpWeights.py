@@ -0,0 +1,73 @@
+import numpy as np
+from scipy.sparse import csc_matrix
+
+from findTreeMeshCells import findTreeMeshCells
+
+
+def calcTreeInterpWeights(nodeX, nodeY, nodeZ, nodes, cellBox, points):
+    """
+    Calculate the trilinear interpolation weights of the eight corners of the
+    tree mesh cells containing the given points.
+
+    Parameters:
+    -----------
+    nodeX, nodeY, nodeZ: numpy.ndarray
+        node locations in X, Y, Z of the base rectilinear mesh of the tree mesh
+    nodes: numpy.ndarray
+        a 3-column matrix of X-Y-Z locations for the nodes (see
+        formTreeMeshConnectivity)
+    cellBox: numpy.ndarray
+        a Ncells x 6 matrix of the cells' range [xmin xmax ymin ymax zmax zmin]
+    points: numpy.ndarray
+        a Npoints x 3 matrix specifying the X, Y, Z coordinates of points
+
+    Returns:
+    --------
+    weights: scipy.sparse.csr_matrix
+        a Nnodes x Npoints sparse matrix of the calculated weights
+
+    Note:
+    -----
+    weights: distribute the point's contribution to the corners of its cell
+    weights' (transpose): estimate the point's value from the corners
+    Out-of-region points are snapped to the nearest boundary as in
+    calcTrilinearInterpWeights. Electrodes are best placed in refined regions,
+    away from the faces of cells that carry hanging nodes.
+    """
+
+    Nnodes = nodes.shape[0]
+    Npoint = points.shape[0]
+
+    # Snap out-of-region points to the nearest boundary
+    x = np.clip(points[:, 0], nodeX[0], nodeX[-1])
+    y = np.clip(points[:, 1], nodeY[0], nodeY[-1])
+    z = np.clip(points[:, 2], nodeZ[-1], nodeZ[0])
+
+    # Cell of each point and the normalized position inside
+    box = cellBox[findTreeMeshCells(nodeX, nodeY, nodeZ, cellBox, np.column_stack((x, y, z))), :]
+    tx = (x - box[:, 0]) / (box[:, 1] - box[:, 0])
+    ty = (y - box[:, 2]) / (box[:, 3] - box[:, 2])
+    tz = (box[:, 4] - z) / (box[:, 4] - box[:, 5])
+
+    # Node index of a location by its coordinates
+    X = np.unique(nodes[:, 0])
+    Y = np.unique(nodes[:, 1])
+    Z = np.unique(nodes[:, 2])
+    nodeKeys = (np.searchsorted(Y, nodes[:, 1]) * len(X) + np.searchsorted(X, nodes[:, 0])) * len(Z) + \
+        np.searchsorted(Z, nodes[:, 2])
+    order = np.argsort(nodeKeys)
+
+    I = []
+    J = []
+    W = []
+    for wx, cx in ((1 - tx, box[:, 0]), (tx, box[:, 1])):
+        for wy, cy in ((1 - ty, box[:, 2]), (ty, box[:, 3])):
+            for wz, cz in ((1 - tz, box[:, 4]), (tz, box[:, 5])):
+                k = (np.searchsorted(Y, cy) * len(X) + np.searchsorted(X, cx)) * len(Z) + np.searchsorted(Z, cz)
+                I.append(order[np.searchsorted(nodeKeys, k, sorter=order)])
+                J.append(np.arange(Npoint))
+                W.append(wx * wy * wz)
+
+    # Put weights in a sparse matrix: Nnodes x Npoints
+    weights = csc_matrix((np.concatenate(W), (np.concatenate(I), np.concatenate(J))), shape=(Nnodes, Npoint))
+    return weights.tocsr()
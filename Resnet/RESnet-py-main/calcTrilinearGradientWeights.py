@@ -0,0 +1,83 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def calcTrilinearGradientWeights(nodeX, nodeY, nodeZ, points):
+    """
+    Calculate the weights of the gradient of the trilinear interpolant at
+    given points in a lattice grid, i.e. the derivatives of the weights of
+    calcTrilinearInterpWeights.
+
+    Parameters:
+    -----------
+    nodeX, nodeY, nodeZ: numpy.ndarray
+        node locations in X, Y, Z of a rectilinear mesh
+    points: numpy.ndarray
+        a Npoints x 3 matrix specifying the X, Y, Z coordinates of points
+
+    Returns:
+    --------
+    weights: scipy.sparse.csr_matrix
+        a Nnodes x (3 * Npoints) sparse matrix; the columns are the
+        X-derivatives at all the points, then the Y- and the Z-derivatives
+
+    Note:
+    -----
+    weights' * potentials gives the potential gradients of all the sources in
+    one sparse product, and -weights' * potentials the electric field (see
+    calcPointFields). The gradient is that of the eight nodes of the cell
+    containing the point; out-of-region points are snapped to the boundary.
+    The normal derivative of the interpolant is discontinuous across node
+    lines, so for a point on one it is the average of the two adjacent
+    cells (a centred difference) rather than a one-sided difference.
+    """
+
+    # On a node line (plane) the gradient of the interpolant jumps: average the one-sided gradients of the
+    # cells on either side; elsewhere both cells are the same
+    return (gradient_weights(nodeX, nodeY, nodeZ, points, 'right')
+            + gradient_weights(nodeX, nodeY, nodeZ, points, 'left')) / 2
+
+
+def gradient_weights(nodeX, nodeY, nodeZ, points, side):
+    # Gradient weights in the cell containing each point; side picks the cell after ('right') or before
+    # ('left') a node line the point is on
+    Nnx = len(nodeX)
+    Nny = len(nodeY)
+    Nnz = len(nodeZ)
+    Npoint = points.shape[0]
+    x = np.clip(points[:, 0], nodeX[0], nodeX[-1])
+    y = np.clip(points[:, 1], nodeY[0], nodeY[-1])
+    z = np.clip(points[:, 2], nodeZ[-1], nodeZ[0])
+
+    # Cell containing each point and the local coordinates (0 to 1) in it
+    ix = np.clip(np.searchsorted(nodeX, x, side=side) - 1, 0, Nnx - 2)
+    iy = np.clip(np.searchsorted(nodeY, y, side=side) - 1, 0, Nny - 2)
+    iz = np.clip(np.searchsorted(-nodeZ, -z, side=side) - 1, 0, Nnz - 2)  # nodeZ counts downward
+    hx = nodeX[ix + 1] - nodeX[ix]
+    hy = nodeY[iy + 1] - nodeY[iy]
+    hz = nodeZ[iz] - nodeZ[iz + 1]
+    tx = (x - nodeX[ix]) / hx
+    ty = (y - nodeY[iy]) / hy
+    tz = (nodeZ[iz] - z) / hz
+
+    # Derivatives of the weights of the eight neighboring nodes
+    rows = []
+    cols = []
+    vals = []
+    for a in (0, 1):
+        for b in (0, 1):
+            for c in (0, 1):
+                fx = tx if a else 1 - tx
+                fy = ty if b else 1 - ty
+                fz = tz if c else 1 - tz
+                node = (Nnx * Nnz) * (iy + b) + Nnz * (ix + a) + (iz + c)
+                rows.append(np.tile(node, 3))
+                cols.append(np.arange(3 * Npoint))
+                vals.append(np.concatenate(((2 * a - 1) / hx * fy * fz,
+                                            fx * (2 * b - 1) / hy * fz,
+                                            fx * fy * (1 - 2 * c) / hz)))  # z increases upward, tz downward
+
+    # Assemble
+    weights = csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                         shape=(Nnx * Nny * Nnz, 3 * Npoint))
+    return weights
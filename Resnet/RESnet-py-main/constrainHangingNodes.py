@@ -0,0 +1,154 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse import diags
+from scipy.sparse import triu
+
+from formRESnetMatrix import formRESnetMatrix
+
+
+def constrainHangingNodes(nodes, edges, C, sources, cellBox):
+    """
+    Constrain the hanging nodes of a tree mesh network to the linear
+    interpolation of the corners of the coarse side or face they lie on, so
+    that the network reproduces a uniform field.
+
+    Parameters:
+    -----------
+    nodes: numpy.ndarray
+        a 3-column matrix of X-Y-Z locations for the nodes (see
+        formTreeMeshConnectivity)
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges
+    C: numpy.ndarray
+        a vector of the total conductance values on edges
+    sources: numpy.ndarray
+        the current sources on the nodes (one column per source set)
+    cellBox: numpy.ndarray
+        a Ncells x 6 matrix of the cells' range [xmin xmax ymin ymax zmax zmin]
+
+    Returns:
+    --------
+    edges: numpy.ndarray
+        the edges of the constrained network on the same nodes
+    C: numpy.ndarray
+        the conductance values on these edges; some are negative
+    sources: numpy.ndarray
+        the current sources with those on the hanging nodes moved to the
+        corners they are interpolated from
+
+    Note:
+    -----
+    In the network of formTreeMeshConnectivity a coarse cell reaches the
+    hanging nodes on its sides only through the edges in series and does not
+    reach those at the center of its faces at all, so a linear potential
+    leaves a current imbalance at the hanging nodes and their neighbors. The
+    constrained network is P' * G' * diag(C) * G * P, with P the interpolation
+    of the hanging nodes from the other nodes; its off-diagonal entries become
+    the edges. Each hanging node is also tied to its corners by edges whose
+    effect on the other nodes is cancelled, so it keeps its interpolated
+    potential. The potentials of solveRESnet are then those of all the nodes,
+    but its potentialDiffs and currents are of the constrained edges; the
+    currents on the mesh edges are C * (G @ potentials) with the original
+    edges and conductances (G of formRESnetMatrix).
+    """
+
+    Nnodes = nodes.shape[0]
+    P, hanging = hanging_node_weights(nodes, cellBox)
+
+    # Network of the constrained potentials
+    G, _ = formRESnetMatrix(edges, C)
+    A = P.T @ (G.T @ diags(C) @ G) @ P
+
+    # Ties of the hanging nodes to their corners (conductance of all their edges, shared by the weights)
+    # and the opposite of the ties' effect between the corners
+    Ctie = np.bincount(edges.ravel() - 1, np.repeat(np.abs(C), 2), minlength=Nnodes)[hanging]
+    Ph = P[hanging, :].tocoo()
+    tie = coo_matrix((-Ctie[Ph.row] * Ph.data, (hanging[Ph.row], Ph.col)), shape=(Nnodes, Nnodes))
+    A = A + tie + tie.T + P[hanging, :].T @ diags(Ctie) @ P[hanging, :]
+
+    A = triu(A, k=1).tocoo()
+    keep = A.data != 0
+    sources = P.T @ np.asarray(sources)
+
+    return np.column_stack((A.row[keep] + 1, A.col[keep] + 1)), -A.data[keep], sources
+
+
+def hanging_node_weights(nodes, cellBox):
+    # Interpolation P of all the nodes from the nodes that are not hanging, and the hanging nodes; a hanging
+    # node is at the midpoint of a cell's side or the center of a cell's face
+    Nnodes = nodes.shape[0]
+    X = np.unique(nodes[:, 0])
+    Y = np.unique(nodes[:, 1])
+    Z = np.unique(nodes[:, 2])
+
+    def key(points):
+        # Lattice key of the locations; -1 off the lattice of the nodes' coordinates
+        ind = [np.minimum(np.searchsorted(c, points[:, j]), len(c) - 1) for j, c in enumerate((X, Y, Z))]
+        onLattice = (X[ind[0]] == points[:, 0]) & (Y[ind[1]] == points[:, 1]) & (Z[ind[2]] == points[:, 2])
+        return np.where(onLattice, (ind[1] * len(X) + ind[0]) * len(Z) + ind[2], -1)
+
+    nodeKeys = key(nodes)
+    order = np.argsort(nodeKeys)
+
+    def node_index(points):
+        # 0-based node index of the locations; -1 where there is no node
+        k = key(points)
+        i = np.minimum(np.searchsorted(nodeKeys[order], k), Nnodes - 1)
+        return np.where((k >= 0) & (nodeKeys[order][i] == k), order[i], -1)
+
+    ranges = [cellBox[:, 0:2], cellBox[:, 2:4], cellBox[:, 4:6]]
+    I = []
+    J = []
+    W = []
+
+    # Midpoints of the cells' sides, from the two ends
+    for d in range(3):
+        a, b = [j for j in range(3) if j != d]
+        for sa in range(2):
+            for sb in range(2):
+                point = np.zeros((cellBox.shape[0], 3))
+                point[:, a] = ranges[a][:, sa]
+                point[:, b] = ranges[b][:, sb]
+                point[:, d] = np.mean(ranges[d], axis=1)
+                h = node_index(point)
+                found = h >= 0
+                for s in range(2):
+                    point[:, d] = ranges[d][:, s]
+                    I.append(h[found])
+                    J.append(node_index(point)[found])
+                    W.append(np.full(np.sum(found), 0.5))
+
+    # Centers of the cells' faces, from the four corners
+    for n in range(3):
+        a, b = [j for j in range(3) if j != n]
+        for s in range(2):
+            point = np.zeros((cellBox.shape[0], 3))
+            point[:, n] = ranges[n][:, s]
+            point[:, a] = np.mean(ranges[a], axis=1)
+            point[:, b] = np.mean(ranges[b], axis=1)
+            h = node_index(point)
+            found = h >= 0
+            for sa in range(2):
+                for sb in range(2):
+                    point[:, a] = ranges[a][:, sa]
+                    point[:, b] = ranges[b][:, sb]
+                    I.append(h[found])
+                    J.append(node_index(point)[found])
+                    W.append(np.full(np.sum(found), 0.25))
+
+    # A hanging node found from several cells is interpolated once
+    I = np.concatenate(I)
+    J = np.concatenate(J)
+    W = np.concatenate(W)
+    _, first = np.unique(np.column_stack((I, J)), axis=0, return_index=True)
+    I, J, W = I[first], J[first], W[first]
+    hanging = np.unique(I)
+    free = np.ones(Nnodes)
+    free[hanging] = 0
+    P1 = (coo_matrix((W, (I, J)), shape=(Nnodes, Nnodes)) + diags(free)).tocsr()
+
+    # The corners of a hanging node may hang on a coarser cell: substitute until only free nodes remain
+    P = P1
+    while P[:, hanging].nnz > 0:
+        P = P @ P1
+    return P.tocsr(), hanging
@@ -0,0 +1,149 @@
+import numpy as np
+
+from calcHalfspacePotentials import calcHalfspacePotentials
+from calcTrilinearInterpWeights import calcTrilinearInterpWeights
+from formCell2EdgeMatrix import formCell2EdgeMatrix
+from formMixedBoundaryConductances import formMixedBoundaryConductances
+from formRectMeshConnectivity import formRectMeshConnectivity
+from solveRESnet import solveRESnet
+
+
+def designRectMesh(tx, rx, hmin, tol, zSurface=0, coreDepth=None, ratios=(1.5, 1.4, 1.3, 1.2),
+                   Npads=np.arange(4, 31, 2), Nlevels=3, mixedBoundary=False):
+    """
+    Design the coarsest rectilinear mesh (uniform core plus geometric padding)
+    whose half-space data for a given survey meet a target accuracy.
+
+    Parameters:
+    -----------
+    tx: list
+        Ntx sets of current electrodes in the format of [x y z current(Ampere)]
+    rx: list
+        Ntx sets of receiver electrodes in the format of [Mx My Mz Nx Ny Nz]
+    hmin: float
+        the smallest core cell size allowed (m)
+    tol: float
+        the target relative error of the data against the analytic half-space
+        solution
+    zSurface: float
+        elevation of the air-earth interface and top of the mesh (default is 0)
+    coreDepth: float
+        depth of the uniform core below the surface (default is a quarter of
+        the horizontal extent of the electrodes, at least 4 cells)
+    ratios: tuple
+        padding expansion rates to try (default is (1.5, 1.4, 1.3, 1.2))
+    Npads: numpy.ndarray
+        numbers of padding cells to try, in ascending order (default is 4, 6, ..., 30)
+    Nlevels: int
+        core cell sizes hmin * 2^(Nlevels-1), ..., 2 * hmin, hmin are tried
+        from coarse to fine (default is 3)
+    mixedBoundary: bool
+        evaluate the candidates with the mixed boundary conductances of
+        formMixedBoundaryConductances instead of the grounded network (default
+        is False); the designed mesh should then be solved the same way
+
+    Returns:
+    --------
+    nodeX, nodeY, nodeZ: numpy.ndarray
+        node locations in X, Y, Z of the designed mesh
+    error: float
+        the largest relative data error of the designed mesh
+
+    Note:
+    -----
+    For every core cell size (coarse first) and expansion rate, padding cells
+    are added until tol is met, each candidate being checked by a half-space
+    forward simulation of the actual survey as in Example_Halfspace.py; a core
+    cell size is abandoned when more padding stops reducing the error. The
+    mesh with the fewest nodes at the coarsest passing core cell size is
+    returned. Data much smaller than the largest datum of a source set (e.g.
+    near the null of a symmetric array) are normalized by 1e-3 of that largest
+    datum.
+    """
+
+    tx = [np.atleast_2d(np.array(t, dtype=np.float64)) for t in tx]
+    rx = [np.atleast_2d(np.array(r, dtype=np.float64)) for r in rx]
+
+    # Finite electrode locations define the core
+    locations = np.vstack([t[:, 0:3] for t in tx] + [r[:, 0:3] for r in rx] + [r[:, 3:6] for r in rx])
+    locations = locations[np.all(np.isfinite(locations), axis=1), :]
+    lower = np.min(locations, axis=0)
+    upper = np.max(locations, axis=0)
+    if coreDepth is None:
+        coreDepth = max(np.max(upper[0:2] - lower[0:2]) / 4, zSurface - lower[2])
+
+    # Analytic data of each source set (unit half-space conductivity)
+    dataTrue = []
+    for t, r in zip(tx, rx):
+        dataTrue.append(calcHalfspacePotentials(r[:, 0:3], t, 1, zSurface) -
+                        calcHalfspacePotentials(r[:, 3:6], t, 1, zSurface))
+
+    best = None
+    for level in range(Nlevels - 1, -1, -1):
+        h = hmin * 2 ** level
+        for ratio in ratios:
+            # Add padding until the target is met or more padding stops helping
+            lastError = np.inf
+            for Npad in Npads:
+                nodeX, nodeY, nodeZ = make_mesh(lower, upper, h, ratio, Npad, zSurface, coreDepth)
+                Nnodes = len(nodeX) * len(nodeY) * len(nodeZ)
+                if best is not None and Nnodes >= best[0]:
+                    break
+                error = calc_halfspace_error(nodeX, nodeY, nodeZ, tx, rx, dataTrue, zSurface, mixedBoundary)
+                if error <= tol:
+                    best = (Nnodes, nodeX, nodeY, nodeZ, error)
+                    break
+                if error > 0.9 * lastError:
+                    break  # limited by the core cell size
+                lastError = error
+        if best is not None:
+            break
+
+    if best is None:
+        raise ValueError('No mesh meets the target error %g; decrease hmin or allow more padding' % tol)
+
+    _, nodeX, nodeY, nodeZ, error = best
+    return nodeX, nodeY, nodeZ, error
+
+
+def make_mesh(lower, upper, h, ratio, Npad, zSurface, coreDepth):
+    # Uniform core aligned with multiples of h, two cells of margin around the electrodes
+    pad = np.cumsum(h * np.power(ratio, np.arange(1, Npad + 1)))
+    x0 = np.floor(lower[0] / h) * h - 2 * h
+    x1 = np.ceil(upper[0] / h) * h + 2 * h
+    y0 = np.floor(lower[1] / h) * h - 2 * h
+    y1 = np.ceil(upper[1] / h) * h + 2 * h
+    Nzcore = max(int(np.ceil(coreDepth / h)), 4)
+    nodeX = np.concatenate((x0 - pad[::-1], np.arange(x0, x1 + h / 2, h), x1 + pad))
+    nodeY = np.concatenate((y0 - pad[::-1], np.arange(y0, y1 + h / 2, h), y1 + pad))
+    nodeZ = zSurface - np.concatenate((np.arange(0, Nzcore + 1) * h, Nzcore * h + pad))
+    return nodeX, nodeY, nodeZ
+
+
+def calc_halfspace_error(nodeX, nodeY, nodeZ, tx, rx, dataTrue, zSurface, mixedBoundary):
+    # Forward simulation of a unit-conductivity half-space on the candidate mesh
+    nodes, edges, lengths, faces, areas, cells, volumes = formRectMeshConnectivity(nodeX, nodeY, nodeZ)
+    cellCon = np.ones(cells.shape[0])
+    C = formCell2EdgeMatrix(edges, lengths, faces, cells, volumes).dot(cellCon)
+
+    Ntx = len(tx)
+    sources = np.zeros((nodes.shape[0], Ntx))
+    Cg = None
+    if mixedBoundary:
+        Cg = formMixedBoundaryConductances(nodes, edges, faces, areas, cells, cellCon, np.vstack(tx))
+    for i in range(Ntx):
+        t = tx[i]
+        if mixedBoundary:
+            t = t[np.all(np.isfinite(t[:, 0:3]), axis=1), :]
+        sources[:, i] = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, t[:, 0:3]).dot(t[:, 3])
+    potentials, _, _ = solveRESnet(edges, C, sources, Cg)
+    potentials = np.reshape(potentials, (nodes.shape[0], Ntx))
+
+    error = 0
+    for i in range(Ntx):
+        Mw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, 0:3])
+        Nw = calcTrilinearInterpWeights(nodeX, nodeY, nodeZ, rx[i][:, 3:6])
+        data = (Mw.T - Nw.T) @ potentials[:, i]
+        scale = np.maximum(np.abs(dataTrue[i]), 1e-3 * np.max(np.abs(dataTrue[i])))
+        error = max(error, np.max(np.abs(data - dataTrue[i]) / scale))
+    return error
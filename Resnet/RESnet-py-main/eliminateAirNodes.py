@@ -0,0 +1,85 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+def eliminateAirNodes(edges, C, sources, Cell2Edge, cellCon, Cconductor, threshold=1e-4):
+    """
+    Remove the air region from a resistor network: edges that only belong to
+    cells below a conductivity threshold and carry no line or sheet conductor
+    are dropped, and so are the nodes left without any edge.
+
+    Parameters:
+    -----------
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges
+    C: numpy.ndarray
+        a vector of the total conductance values on edges
+    sources: numpy.ndarray
+        the current sources on the nodes (one column per source set)
+    Cell2Edge: scipy.sparse.csr_matrix
+        the mapping matrix from cell conductivity to edge conductance (see
+        formCell2EdgeMatrix or formTreeCell2EdgeMatrix); edges appended after
+        its rows (e.g. an above-ground pipe) are always kept
+    cellCon: numpy.ndarray
+        a vector of the cells' conductivity (S/m)
+    Cconductor: numpy.ndarray
+        a vector of the conductance on edges from line and sheet conductors
+        (e.g. Ce + Cf); an edge with positive Cconductor is always kept
+    threshold: float
+        cells with conductivity below threshold are air (default is 1e-4 S/m)
+
+    Returns:
+    --------
+    edges: numpy.ndarray
+        the edges kept, with node index renumbered to the nodes kept
+    C: numpy.ndarray
+        the conductance values on the edges kept
+    sources: numpy.ndarray
+        the current sources on the nodes kept
+    nodeInd: numpy.ndarray
+        0-based index of the nodes kept in the original network, e.g. to put
+        the potentials back on all nodes with potentials[nodeInd] = ...
+    edgeInd: numpy.ndarray
+        0-based index of the edges kept in the original network
+
+    Note:
+    -----
+    Conductors left without an electrical connection to the ground (e.g. an
+    isolated roof in the air) would make the network singular and are dropped
+    too. A ValueError is raised if a current source sits on a dropped node.
+    """
+
+    Nnodes = np.max(edges)
+    Nedges = edges.shape[0]
+    NedgesMesh = Cell2Edge.shape[0]
+
+    # Edges of the ground and of the conductors
+    ground = np.zeros(Nedges, dtype=bool)
+    ground[:NedgesMesh] = Cell2Edge @ (cellCon >= threshold).astype(np.float64) > 0
+    conductor = np.zeros(Nedges, dtype=bool)
+    conductor[:len(Cconductor)] = Cconductor > 0
+    conductor[NedgesMesh:] = True
+    keep = ground | conductor
+
+    # Keep the largest connected part of the network
+    nodeUsed = np.zeros(Nnodes, dtype=bool)
+    nodeUsed[edges[keep, :].ravel() - 1] = True
+    graph = csr_matrix((np.ones(np.sum(keep)), (edges[keep, 0] - 1, edges[keep, 1] - 1)), shape=(Nnodes, Nnodes))
+    _, label = connected_components(graph, directed=False)
+    main = np.argmax(np.bincount(label[nodeUsed]))
+    nodeKeep = nodeUsed & (label == main)
+    keep &= nodeKeep[edges[:, 0] - 1]
+
+    sources = np.asarray(sources)
+    if np.any(sources[~nodeKeep] != 0):
+        raise ValueError('Current sources on air nodes removed from the network; '
+                         'move the electrodes or raise the air conductivity above threshold')
+
+    # Renumber the nodes kept
+    nodeInd = np.flatnonzero(nodeKeep)
+    edgeInd = np.flatnonzero(keep)
+    newIndex = np.zeros(Nnodes, dtype=np.int64)
+    newIndex[nodeInd] = np.arange(1, len(nodeInd) + 1)
+
+    return newIndex[edges[edgeInd, :] - 1], C[edgeInd], sources[nodeInd], nodeInd, edgeInd
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def findTreeMeshCells(nodeX, nodeY, nodeZ, cellBox, points):
+    """
+    Find the cells of a tree mesh that contain the given points.
+
+    Parameters:
+    -----------
+    nodeX, nodeY, nodeZ: numpy.ndarray
+        node locations in X, Y, Z of the base rectilinear mesh of the tree mesh
+    cellBox: numpy.ndarray
+        a Ncells x 6 matrix of the cells' range [xmin xmax ymin ymax zmax zmin]
+        (see formTreeMesh)
+    points: numpy.ndarray
+        a Npoints x 3 matrix specifying the X, Y, Z coordinates of points
+
+    Returns:
+    --------
+    ind: numpy.ndarray
+        a vector of 0-based cell index for the points; -1 for the points
+        outside the mesh
+
+    Note:
+    -----
+    A cell of level L is one of the 8^L sub-cells of a base cell, so a point is
+    located by computing its sub-cell at every level present in the mesh and
+    looking it up among the cells of that level. Points on a face shared by two
+    cells are assigned to the cell on the larger x, y side and the lower z side.
+    """
+
+    points = np.atleast_2d(points)
+    Npoint = points.shape[0]
+
+    # Base cell and level of every cell
+    center = np.column_stack(((cellBox[:, 0] + cellBox[:, 1]) / 2, (cellBox[:, 2] + cellBox[:, 3]) / 2,
+                              (cellBox[:, 4] + cellBox[:, 5]) / 2))
+    cellBase = locate_base_cells(nodeX, nodeY, nodeZ, center)
+    baseSize = nodeX[cellBase[:, 0] + 1] - nodeX[cellBase[:, 0]]
+    level = np.round(np.log2(baseSize / (cellBox[:, 1] - cellBox[:, 0]))).astype(np.int64)
+
+    # Base cell of every point
+    inside = (points[:, 0] >= nodeX[0]) & (points[:, 0] <= nodeX[-1]) & \
+             (points[:, 1] >= nodeY[0]) & (points[:, 1] <= nodeY[-1]) & \
+             (points[:, 2] <= nodeZ[0]) & (points[:, 2] >= nodeZ[-1])
+    pointBase = locate_base_cells(nodeX, nodeY, nodeZ, points)
+
+    ind = -np.ones(Npoint, dtype=np.int64)
+    for L in np.unique(level):
+        cellsL = np.flatnonzero(level == L)
+        cellKeys = form_keys(nodeX, nodeY, nodeZ, cellBase[cellsL], center[cellsL], L)
+        order = np.argsort(cellKeys)
+        cellKeys = cellKeys[order]
+
+        pointKeys = form_keys(nodeX, nodeY, nodeZ, pointBase, points, L)
+        pos = np.minimum(np.searchsorted(cellKeys, pointKeys), len(cellKeys) - 1)
+        found = (cellKeys[pos] == pointKeys) & inside
+        ind[found] = cellsL[order[pos[found]]]
+
+    return ind
+
+
+def locate_base_cells(nodeX, nodeY, nodeZ, points):
+    # 0-based (x, y, z) index of the base cells; z counts from the top
+    ix = np.clip(np.searchsorted(nodeX, points[:, 0], side='right') - 1, 0, len(nodeX) - 2)
+    iy = np.clip(np.searchsorted(nodeY, points[:, 1], side='right') - 1, 0, len(nodeY) - 2)
+    iz = np.clip(np.searchsorted(-nodeZ, -points[:, 2], side='right') - 1, 0, len(nodeZ) - 2)
+    return np.column_stack((ix, iy, iz))
+
+
+def form_keys(nodeX, nodeY, nodeZ, base, points, L):
+    # Unique integer key of the level-L sub-cell of the base cell containing the points
+    n = 2 ** L
+    sx = np.clip(np.floor((points[:, 0] - nodeX[base[:, 0]]) / (nodeX[base[:, 0] + 1] - nodeX[base[:, 0]]) * n),
+                 0, n - 1).astype(np.int64)
+    sy = np.clip(np.floor((points[:, 1] - nodeY[base[:, 1]]) / (nodeY[base[:, 1] + 1] - nodeY[base[:, 1]]) * n),
+                 0, n - 1).astype(np.int64)
+    sz = np.clip(np.floor((nodeZ[base[:, 2]] - points[:, 2]) / (nodeZ[base[:, 2]] - nodeZ[base[:, 2] + 1]) * n),
+                 0, n - 1).astype(np.int64)
+    baseKey = (base[:, 1] * (len(nodeX) - 1) + base[:, 0]) * (len(nodeZ) - 1) + base[:, 2]
+    return ((baseKey * n + sy) * n + sx) * n + sz
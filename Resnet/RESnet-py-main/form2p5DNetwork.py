@@ -0,0 +1,60 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+
+
+def form2p5DNetwork(edges, C, NnodesXZ):
+    """
+    Fold the resistor network of a one-cell-thick slab mesh into a 2D network
+    in the x-z plane for the 2.5D (strike-invariant) problem.
+
+    Parameters:
+    -----------
+    edges: numpy.ndarray
+        A 2-column matrix of node index for the edges of the slab mesh made by
+        formRectMeshConnectivity(nodeX, np.array([0, 1]), nodeZ)
+    C: numpy.ndarray
+        A vector of conductance values on the slab edges (Ce + Cf + Cc as in
+        the 3D workflow)
+    NnodesXZ: int
+        Number of nodes in one x-z plane, len(nodeX) * len(nodeZ)
+
+    Returns:
+    --------
+    edgesXZ: numpy.ndarray
+        A 2-column matrix of node index for the edges of the x-z network
+    Cxz: numpy.ndarray
+        A vector of in-plane conductance per unit strike length on edgesXZ (S*m)
+    Cy: numpy.ndarray
+        A vector of along-strike conductance on the nodes (S*m); the network of
+        wavenumber k has an extra conductance k^2 * Cy from every node to the
+        ground
+
+    Note:
+    -----
+    The slab is 1 m thick in the strike (y) direction, so the conductances of
+    the existing mapping matrices are already "per meter of strike". The x- and
+    z-oriented edges at y = 0 and y = 1 are summed; the y-oriented edges do not
+    exist in the x-z plane and become the k^2 term. The model vectors should be
+    painted on the same slab, e.g. with makeRectMeshModelBlocks(nodeX,
+    np.array([0, 1]), nodeZ, ...), using blocks infinite in y.
+    """
+
+    # Map both planes of the slab onto the x-z plane (node index 1..NnodesXZ)
+    n1 = (edges[:, 0] - 1) % NnodesXZ + 1
+    n2 = (edges[:, 1] - 1) % NnodesXZ + 1
+
+    # Edges joining the two planes carry the along-strike conductance
+    isY = n1 == n2
+    Cy = np.bincount(n1[isY] - 1, weights=C[isY], minlength=NnodesXZ)
+
+    # Merge the duplicated in-plane edges (same node pair in both planes)
+    lo = np.minimum(n1[~isY], n2[~isY])
+    hi = np.maximum(n1[~isY], n2[~isY])
+    Cpair = coo_matrix((C[~isY], (lo - 1, hi - 1)), shape=(NnodesXZ, NnodesXZ)).tocsr()
+    Cpair.sum_duplicates()
+    Cpair = Cpair.tocoo()
+    order = np.lexsort((Cpair.col, Cpair.row))
+    edgesXZ = np.column_stack((Cpair.row[order] + 1, Cpair.col[order] + 1))
+    Cxz = Cpair.data[order]
+
+    return edgesXZ, Cxz, Cy
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+def formMixedBoundaryConductances(nodes, edges, faces, areas, cells, cellCon, srcLoc):
+    """
+    Form the conductances from the outer boundary nodes to infinity that
+    approximate the mixed (Robin) boundary condition of Dey and Morrison (1979).
+
+    Parameters:
+    -----------
+    nodes: numpy.ndarray
+        a 3-column matrix of X-Y-Z locations for the nodes
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges
+    faces: numpy.ndarray
+        a 4-column matrix of edge index for the faces
+    areas: numpy.ndarray
+        a vector of the faces' area in square meter
+    cells: numpy.ndarray
+        a 6-column matrix of face index for the cells
+    cellCon: numpy.ndarray
+        a vector of cell conductivity (S/m)
+    srcLoc: numpy.ndarray
+        a Nsrc x 3 (or more) matrix of X, Y, Z locations of the source
+        electrodes (e.g. np.vstack(tx)); electrodes at infinity are ignored
+
+    Returns:
+    --------
+    Cg: numpy.ndarray
+        a vector of conductance (S) from each node to the ground at infinity;
+        zero for the interior nodes and the nodes on the top surface
+
+    Note:
+    -----
+    On the side and bottom faces the potential of a point source decays as 1/r,
+        dV/dn + cos(theta) / r * V = 0
+    where r is the distance to the source and theta the angle between r and the
+    outward normal. Integrated over the faces this becomes a conductance
+    cellCon * area * cos(theta) / r to the ground. The top surface keeps the
+    zero-flux condition. One expansion point (the mean of the finite source
+    electrodes) is used for all sources so that a single matrix factorization
+    serves the whole survey.
+    With these conductances the current may leave through the boundary, so the
+    electrodes at infinity (e.g. the B electrode of a pole-dipole survey) must
+    be left out of the sources instead of being snapped to the mesh boundary.
+    """
+
+    Nnodes = nodes.shape[0]
+    Nfaces = faces.shape[0]
+    Ncells = cells.shape[0]
+
+    # Expansion point of the boundary condition
+    srcLoc = np.atleast_2d(srcLoc)[:, 0:3]
+    srcLoc = srcLoc[np.all(np.isfinite(srcLoc), axis=1), :]
+    center = np.mean(srcLoc, axis=0)
+
+    # Boundary faces belong to one cell only
+    cellIndex = np.tile(np.arange(Ncells).reshape(-1, 1), cells.shape[1]).ravel()
+    count = np.bincount(cells.ravel() - 1, minlength=Nfaces)
+    owner = np.zeros(Nfaces, dtype=np.int64)
+    owner[cells.ravel() - 1] = cellIndex
+    bFaces = np.flatnonzero(count == 1)
+
+    # Face centers and cell centers
+    edgesCenter = 1 / 2 * (nodes[edges[:, 0] - 1, :] + nodes[edges[:, 1] - 1, :])
+    facesCenter = np.mean(edgesCenter[faces - 1, :], axis=1)
+    cellsCenter = np.mean(facesCenter[cells - 1, :], axis=1)
+
+    # Exclude the top surface (zero flux through the air-earth interface)
+    zTop = np.max(nodes[:, 2])
+    bFaces = bFaces[facesCenter[bFaces, 2] < zTop]
+
+    # Outward normal: along the axis in which the face has no extent
+    faceNodes = edges[faces[bFaces, :] - 1, :].reshape(len(bFaces), -1)  # 8 node references per face
+    extent = np.ptp(nodes[faceNodes - 1, :], axis=1)
+    axis = np.argmin(extent, axis=1)
+    normal = np.zeros((len(bFaces), 3))
+    normal[np.arange(len(bFaces)), axis] = np.sign(
+        facesCenter[bFaces, axis] - cellsCenter[owner[bFaces], axis])
+
+    # cos(theta) / r evaluated at each corner node of the boundary faces
+    r = nodes[faceNodes - 1, :] - center
+    rLength = np.sqrt(np.sum(r ** 2, axis=2))
+    cosTheta = np.sum(r * normal[:, np.newaxis, :], axis=2) / rLength
+    cosTheta = np.maximum(cosTheta, 0)
+
+    # Each corner appears twice among the 8 node references: area / 8 per reference
+    g = cellCon[owner[bFaces]].reshape(-1, 1) * areas[bFaces].reshape(-1, 1) / 8 * cosTheta / rLength
+    Cg = np.bincount(faceNodes.ravel() - 1, weights=g.ravel(), minlength=Nnodes)
+
+    return Cg
@@ -0,0 +1,49 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse import spdiags
+
+
+def formRESnetMatrix(edges, C, Cg=None):
+    """
+    Form the gradient operator and the system matrix of a resistor network
+    (Kirchhoff's current law in the potential's formulation).
+
+    Parameters
+    ----------
+    edges: numpy.ndarray
+        A 2-column matrix of node index for the edges (branches); the 1st
+        column for starting node and the 2nd column for ending node.
+    C: numpy.ndarray
+        A vector of conductance values on edges.
+    Cg: numpy.ndarray
+        A vector of conductance from each node to the ground at infinity (see
+        solveRESnet); if not given, the first node is grounded.
+
+    Returns
+    -------
+    G : scipy.sparse.csr_matrix
+        Nedges x Nnodes potential difference matrix (node to edge).
+    A : scipy.sparse.csr_matrix
+        Nnodes x Nnodes symmetric positive definite matrix G' * diag(C) * G
+        plus the grounding term.
+    """
+
+    Nnodes = np.max(edges)  # # of nodes
+    Nedges = edges.shape[0]  # # of edges
+
+    # Form potential difference matrix (node to edge), a.k.a. gradient operator
+    I = np.kron(np.arange(1, Nedges+1), [[1], [1]])
+    J = edges.T
+    S = np.kron(np.ones(Nedges), [[1], [-1]])
+    G = csr_matrix((S.flatten(), (I.flatten()-1, J.flatten()-1)), shape=(Nedges, Nnodes))
+
+    Cdiag = spdiags(C, 0, Nedges, Nedges)
+    if Cg is None:
+        E = csr_matrix(([1], ([0], [0])), shape=(Nnodes, Nnodes))
+    else:
+        E = spdiags(Cg, 0, Nnodes, Nnodes)
+    G_csc = G.tocsc()
+    E_csc = E.tocsc()
+    A = (G_csc.T @ Cdiag @ G_csc + E_csc).tocsr()
+
+    return G, A
@@ -0,0 +1,53 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+
+
+def formTreeCell2EdgeMatrix(nodes, edges, lengths, cells, cellBox):
+    """
+    Form the mapping matrix that transforms cell conductivity model (cellCon in S/m)
+    to conductance on the edges of a tree mesh.
+
+    Parameters:
+    -----------
+    nodes: numpy.ndarray
+        a 3-column matrix of X-Y-Z locations for the nodes
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges; 1st column for
+        starting node and 2nd column for ending node
+    lengths: numpy.ndarray
+        a vector of the edges' lengths in meter
+    cells: scipy.sparse.csr_matrix
+        a Ncells x Nedges incidence matrix of the edges on the cells' sides
+    cellBox: numpy.ndarray
+        a Ncells x 6 matrix of the cells' range [xmin xmax ymin ymax zmax zmin]
+
+    Returns:
+    --------
+    Cell2Edge: scipy.sparse.csr_matrix
+        a Nedges x Ncells matrix that acts as volume/4/side/length
+
+    Note:
+    -----
+        As in formCell2EdgeMatrix, a cell is four resistors of conductance
+        volume/4/side^2 along its sides in each direction. A side split by
+        hanging nodes is a chain of edges in series, so each edge takes
+        volume/4/side/length. Without refinement this equals
+        formCell2EdgeMatrix. The series chains alone do not reproduce a
+        uniform field at the hanging nodes; see constrainHangingNodes.
+    """
+
+    Nedges = edges.shape[0]
+    Ncells = cellBox.shape[0]
+
+    # Side length of the cell in the direction of the edge
+    direction = np.argmax(np.abs(nodes[edges[:, 1] - 1, :] - nodes[edges[:, 0] - 1, :]), axis=1)
+    sizes = np.abs(cellBox[:, 1::2] - cellBox[:, 0::2])
+    volumes = np.prod(sizes, axis=1)
+
+    cells = cells.tocoo()
+    I = cells.col
+    J = cells.row
+    V = volumes[J] / 4 / sizes[J, direction[I]] / lengths[I]
+    Cell2Edge = coo_matrix((V, (I, J)), shape=(Nedges, Ncells)).tocsr()
+
+    return Cell2Edge
@@ -0,0 +1,50 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+
+
+def formTreeFace2EdgeMatrix(nodes, edges, lengths, faces, faceBox):
+    """
+    Form the mapping matrix that transforms face conductivity model (faceCon in S)
+    to conductance on the edges of a tree mesh.
+
+    Parameters:
+    -----------
+    nodes: numpy.ndarray
+        a 3-column matrix of X-Y-Z locations for the nodes
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges;
+        1st column for starting node and 2nd column for ending node
+    lengths: numpy.ndarray
+        a vector of the edges' lengths in meter
+    faces: scipy.sparse.csr_matrix
+        a Nfaces x Nedges incidence matrix of the edges on the faces' sides
+    faceBox: numpy.ndarray
+        a Nfaces x 6 matrix of the faces' range [xmin xmax ymin ymax zmax zmin]
+
+    Returns:
+    --------
+    Face2Edge: scipy.sparse.csr_matrix
+        a Nedges x Nfaces matrix that acts as area/2/side/length
+
+    Note:
+    -----
+        As in formFace2EdgeMatrix, a face is two resistors of conductance
+        area/2/side^2 along its sides in each direction; a side split by
+        hanging nodes is a chain of edges in series.
+    """
+
+    Nedges = edges.shape[0]
+    Nfaces = faceBox.shape[0]
+
+    # Side length of the face in the direction of the edge
+    direction = np.argmax(np.abs(nodes[edges[:, 1] - 1, :] - nodes[edges[:, 0] - 1, :]), axis=1)
+    sizes = np.abs(faceBox[:, 1::2] - faceBox[:, 0::2])
+    areas = np.prod(np.where(sizes == 0, 1, sizes), axis=1)
+
+    faces = faces.tocoo()
+    I = faces.col
+    J = faces.row
+    V = areas[J] / 2 / sizes[J, direction[I]] / lengths[I]
+    Face2Edge = coo_matrix((V, (I, J)), shape=(Nedges, Nfaces)).tocsr()
+
+    return Face2Edge
@@ -0,0 +1,109 @@
+import numpy as np
+
+from findTreeMeshCells import findTreeMeshCells
+
+
+def formTreeMesh(nodeX, nodeY, nodeZ, refineLoc, refineLevel):
+    """
+    Form a tree (octree) mesh by locally refining the cells of a coarse
+    rectilinear mesh.
+
+    Parameters:
+    -----------
+    nodeX, nodeY, nodeZ: numpy.ndarray
+        node locations in X, Y, Z of the base (coarsest) rectilinear mesh
+    refineLoc: numpy.ndarray
+        a Nregion x 6 matrix whose columns are [xmin xmax ymin ymax zmax zmin]
+        specifying the regions to refine (same format as blkLoc; a range may
+        vanish to refine around points, lines and sheets such as electrodes,
+        casings and plates)
+    refineLevel: numpy.ndarray
+        a vector of the refinement level of the regions; a cell of level L is
+        2^L times smaller than its base cell in each direction
+
+    Returns:
+    --------
+    cellBox: numpy.ndarray
+        a Ncells x 6 matrix of the cells' range [xmin xmax ymin ymax zmax zmin]
+
+    Note:
+    -----
+    Every cell touching a region is split into 8 until it reaches the level of
+    the region. The mesh is then balanced so that cells sharing a face, an edge
+    or a corner differ by at most one level (2:1 rule).
+    Cells are ordered like the cells of a rectilinear mesh: count in z (top to
+    bottom), then x (left to right), then y (front to back); without
+    refinement the cells are those of the base mesh.
+    """
+
+    refineLoc = np.array(refineLoc, dtype=np.float64).reshape(-1, 6)
+    refineLevel = np.atleast_1d(refineLevel).astype(np.int64)
+
+    # Replace inf with the outmost boundary
+    refineLoc[refineLoc[:, 0] == -np.inf, 0] = nodeX[0]
+    refineLoc[refineLoc[:, 1] == np.inf, 1] = nodeX[-1]
+    refineLoc[refineLoc[:, 2] == -np.inf, 2] = nodeY[0]
+    refineLoc[refineLoc[:, 3] == np.inf, 3] = nodeY[-1]
+    refineLoc[refineLoc[:, 4] == np.inf, 4] = nodeZ[0]
+    refineLoc[refineLoc[:, 5] == -np.inf, 5] = nodeZ[-1]
+
+    # Base cells
+    a, b, c = np.meshgrid(np.arange(len(nodeX) - 1), np.arange(len(nodeY) - 1), np.arange(len(nodeZ) - 1),
+                          indexing='ij')
+    ix, iy, iz = a.ravel(), b.ravel(), c.ravel()
+    cellBox = np.column_stack((nodeX[ix], nodeX[ix + 1], nodeY[iy], nodeY[iy + 1], nodeZ[iz], nodeZ[iz + 1]))
+    level = np.zeros(cellBox.shape[0], dtype=np.int64)
+
+    # Refine the cells touching the regions
+    while True:
+        target = np.zeros(cellBox.shape[0], dtype=np.int64)
+        for i in range(refineLoc.shape[0]):
+            xmin, xmax = np.min(refineLoc[i, 0:2]), np.max(refineLoc[i, 0:2])
+            ymin, ymax = np.min(refineLoc[i, 2:4]), np.max(refineLoc[i, 2:4])
+            zmin, zmax = np.min(refineLoc[i, 4:6]), np.max(refineLoc[i, 4:6])
+            ind = (cellBox[:, 0] <= xmax) & (cellBox[:, 1] >= xmin) & \
+                  (cellBox[:, 2] <= ymax) & (cellBox[:, 3] >= ymin) & \
+                  (cellBox[:, 5] <= zmax) & (cellBox[:, 4] >= zmin)
+            target[ind] = np.maximum(target[ind], refineLevel[i])
+        split = level < target
+        if not np.any(split):
+            break
+        cellBox, level = split_cells(cellBox, level, split)
+
+    # Balance the mesh (2:1 rule) by probing just outside every face, edge and corner
+    offsets = np.array([[i, j, k] for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)
+                        if (i, j, k) != (0, 0, 0)])
+    while True:
+        center = np.column_stack(((cellBox[:, 0] + cellBox[:, 1]) / 2, (cellBox[:, 2] + cellBox[:, 3]) / 2,
+                                  (cellBox[:, 4] + cellBox[:, 5]) / 2))
+        half = np.column_stack(((cellBox[:, 1] - cellBox[:, 0]) / 2, (cellBox[:, 3] - cellBox[:, 2]) / 2,
+                                (cellBox[:, 4] - cellBox[:, 5]) / 2))
+        probes = (center[:, np.newaxis, :] + offsets[np.newaxis, :, :] * half[:, np.newaxis, :] * 1.5).reshape(-1, 3)
+        neighbor = findTreeMeshCells(nodeX, nodeY, nodeZ, cellBox, probes).reshape(-1, len(offsets))
+        owner = np.repeat(np.arange(cellBox.shape[0]), len(offsets)).reshape(-1, len(offsets))
+        valid = neighbor >= 0
+        split = np.zeros(cellBox.shape[0], dtype=bool)
+        split[neighbor[valid][level[neighbor[valid]] < level[owner[valid]] - 1]] = True
+        if not np.any(split):
+            break
+        cellBox, level = split_cells(cellBox, level, split)
+
+    # Order the cells as in a rectilinear mesh
+    order = np.lexsort((-cellBox[:, 4], cellBox[:, 0], cellBox[:, 2]))
+    return cellBox[order, :]
+
+
+def split_cells(cellBox, level, split):
+    # Replace the flagged cells by their 8 children
+    parent = cellBox[split, :]
+    xm = (parent[:, 0] + parent[:, 1]) / 2
+    ym = (parent[:, 2] + parent[:, 3]) / 2
+    zm = (parent[:, 4] + parent[:, 5]) / 2
+    children = []
+    for x0, x1 in ((parent[:, 0], xm), (xm, parent[:, 1])):
+        for y0, y1 in ((parent[:, 2], ym), (ym, parent[:, 3])):
+            for z0, z1 in ((parent[:, 4], zm), (zm, parent[:, 5])):
+                children.append(np.column_stack((x0, x1, y0, y1, z0, z1)))
+    cellBox = np.vstack([cellBox[~split, :]] + children)
+    level = np.concatenate([level[~split]] + [level[split] + 1] * 8)
+    return cellBox, level
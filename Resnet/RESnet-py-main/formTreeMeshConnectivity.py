@@ -0,0 +1,215 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def formTreeMeshConnectivity(cellBox):
+    """
+    Form the connectivity information for a given tree mesh
+
+    Parameters:
+    -----------
+    cellBox: numpy.ndarray
+        a Ncells x 6 matrix of the cells' range [xmin xmax ymin ymax zmax zmin]
+        (see formTreeMesh)
+
+    Returns:
+    --------
+    nodes: numpy.ndarray
+        a 3-column matrix of X-Y-Z locations for the nodes, including the
+        hanging nodes on the interfaces between coarse and fine cells
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges; an edge joins two
+        neighboring nodes on a cell's side, so the side of a coarse cell next
+        to fine cells is made of several edges in series
+    lengths: numpy.ndarray
+        a vector of the edges' lengths in meter
+    faces: scipy.sparse.csr_matrix
+        a Nfaces x Nedges incidence matrix of the edges on the faces' sides
+    faceBox: numpy.ndarray
+        a Nfaces x 6 matrix of the faces' range [xmin xmax ymin ymax zmax zmin]
+        (the range along the normal vanishes)
+    areas: numpy.ndarray
+        a vector of the faces' area in square meter
+    cells: scipy.sparse.csr_matrix
+        a Ncells x Nedges incidence matrix of the edges on the cells' sides
+    volumes: numpy.ndarray
+        a vector of the cells' volume in cubic meter
+
+    Note:
+    -----
+    Ordering follows formRectMeshConnectivity: edges and faces' normals in x,
+    y, z-orientation, then count in z (top to bottom), then x (left to right),
+    then y (front to back). A face shared by a coarse cell and four fine cells
+    is represented by the four fine faces. Without refinement, nodes, edges,
+    lengths, areas and volumes are identical to those of the rectilinear mesh.
+    """
+
+    Ncells = cellBox.shape[0]
+
+    # Lattice of all the coordinates in use (z counted from the top)
+    coords = [np.unique(cellBox[:, 0:2]), np.unique(cellBox[:, 2:4]), np.unique(cellBox[:, 4:6])[::-1]]
+    lo = np.column_stack((lattice_index(coords[0], cellBox[:, 0]), lattice_index(coords[1], cellBox[:, 2]),
+                          lattice_index(coords[2], cellBox[:, 4])))
+    hi = np.column_stack((lattice_index(coords[0], cellBox[:, 1]), lattice_index(coords[1], cellBox[:, 3]),
+                          lattice_index(coords[2], cellBox[:, 5])))
+    Nlat = np.array([len(c) for c in coords])
+
+    def key(lat):
+        return (lat[:, 1] * Nlat[0] + lat[:, 0]) * Nlat[2] + lat[:, 2]
+
+    # Create nodes list from the cell corners
+    corners = [np.column_stack([(lo, hi)[c[j]][:, j] for j in range(3)])
+               for c in np.ndindex(2, 2, 2)]
+    nodeKeys = np.unique(np.concatenate([key(c) for c in corners]))
+    nodeLat = np.column_stack(((nodeKeys // Nlat[2]) % Nlat[0], nodeKeys // (Nlat[2] * Nlat[0]),
+                               nodeKeys % Nlat[2]))
+    nodes = np.column_stack([coords[j][nodeLat[:, j]] for j in range(3)])
+
+    # Nodes sorted along the lattice lines of each orientation
+    rank = []
+    order = []
+    for d in range(3):
+        a, b = [j for j in range(3) if j != d]
+        o = np.lexsort((nodeLat[:, d], nodeLat[:, b], nodeLat[:, a]))
+        r = np.empty(len(o), dtype=np.int64)
+        r[o] = np.arange(len(o))
+        order.append(o)
+        rank.append(r)
+
+    def side_range(start, d, s1):
+        # Positions along the sorted lines of the first and last node of the sides
+        end = start.copy()
+        end[:, d] = s1
+        return (rank[d][np.searchsorted(nodeKeys, key(start))],
+                rank[d][np.searchsorted(nodeKeys, key(end))])
+
+    cellSides = [cell_sides(lo, hi, d) for d in range(3)]
+
+    # Create edges list: consecutive nodes along the cells' sides
+    n1 = []
+    n2 = []
+    edgeIndex = []  # edge index (0-based) of the segment starting at each line position
+    Nedges = 0
+    for d in range(3):
+        mark = np.zeros(len(nodeKeys) + 1, dtype=np.int64)
+        for start in cellSides[d]:
+            p0, p1 = side_range(start, d, hi[:, d])
+            np.add.at(mark, p0, 1)
+            np.add.at(mark, p1, -1)
+        used = np.flatnonzero(np.cumsum(mark)[:-1] > 0)
+        start = order[d][used]
+        sort = np.argsort(start)  # count as in a rectilinear mesh
+        index = -np.ones(len(nodeKeys), dtype=np.int64)
+        index[used[sort]] = Nedges + np.arange(len(used))
+        n1.append(start[sort] + 1)
+        n2.append(order[d][used[sort] + 1] + 1)
+        edgeIndex.append(index)
+        Nedges += len(used)
+    edges = np.column_stack((np.concatenate(n1), np.concatenate(n2)))
+
+    # Create lengths list (in meter)
+    lengths = np.sqrt(np.sum((nodes[edges[:, 0] - 1, :] - nodes[edges[:, 1] - 1, :]) ** 2, axis=1))
+
+    def side_edges(sides, d, s1):
+        # Edges making up the sides and the object (row) each side belongs to
+        I = []
+        J = []
+        for start in sides:
+            p0, p1 = side_range(start, d, s1)
+            count = p1 - p0
+            I.append(np.repeat(np.arange(len(p0)), count))
+            J.append(edgeIndex[d][np.repeat(p0 - np.cumsum(count) + count, count) + np.arange(np.sum(count))])
+        return I, J
+
+    # Create cells list (incidence of the edges on the 12 sides of the cells)
+    I = []
+    J = []
+    for d in range(3):
+        Id, Jd = side_edges(cellSides[d], d, hi[:, d])
+        I += Id
+        J += Jd
+    I = np.concatenate(I)
+    cells = csr_matrix((np.ones(len(I)), (I, np.concatenate(J))), shape=(Ncells, Nedges))
+
+    # Create volumes list (in meter cubed)
+    volumes = (cellBox[:, 1] - cellBox[:, 0]) * (cellBox[:, 3] - cellBox[:, 2]) * (cellBox[:, 4] - cellBox[:, 5])
+
+    # Create faces list: the six faces of the cells, each once, except those split by finer neighbors
+    faceLo = []
+    faceHi = []
+    for n in range(3):
+        for side in (lo, hi):
+            flo = lo.copy()
+            fhi = hi.copy()
+            flo[:, n] = side[:, n]
+            fhi[:, n] = side[:, n]
+            faceLo.append(flo)
+            faceHi.append(fhi)
+    faceLat = np.unique(np.hstack((np.vstack(faceLo), np.vstack(faceHi))), axis=0)
+    center = [(coords[j][faceLat[:, j]] + coords[j][faceLat[:, j + 3]]) / 2 for j in range(3)]
+    centerLat = np.column_stack([lattice_index(coords[j], center[j]) for j in range(3)])
+    onLattice = np.all(centerLat >= 0, axis=1)
+    split = np.zeros(faceLat.shape[0], dtype=bool)
+    split[onLattice] = np.isin(key(centerLat[onLattice, :]), nodeKeys)
+    faceLat = faceLat[~split, :]
+
+    # Order the faces by normal orientation, then as the cells
+    normal = np.argmax(faceLat[:, 0:3] == faceLat[:, 3:6], axis=1)
+    faceLat = faceLat[np.lexsort((faceLat[:, 2], faceLat[:, 0], faceLat[:, 1], normal)), :]
+    normal = np.argmax(faceLat[:, 0:3] == faceLat[:, 3:6], axis=1)
+    faceBox = np.column_stack((coords[0][faceLat[:, 0]], coords[0][faceLat[:, 3]],
+                               coords[1][faceLat[:, 1]], coords[1][faceLat[:, 4]],
+                               coords[2][faceLat[:, 2]], coords[2][faceLat[:, 5]]))
+    Nfaces = faceLat.shape[0]
+
+    # Create areas list (in meter squared)
+    extent = np.abs(faceBox[:, 1::2] - faceBox[:, 0::2])
+    extent[np.arange(Nfaces), normal] = 1
+    areas = np.prod(extent, axis=1)
+
+    # Incidence of the edges on the 4 sides of the faces
+    I = []
+    J = []
+    for n in range(3):
+        f = np.flatnonzero(normal == n)
+        flo = faceLat[f, 0:3]
+        fhi = faceLat[f, 3:6]
+        for d in range(3):
+            if d == n:
+                continue
+            e = 3 - n - d  # the in-plane axis across the sides
+            sides = []
+            for side in (flo, fhi):
+                start = flo.copy()
+                start[:, e] = side[:, e]
+                sides.append(start)
+            Id, Jd = side_edges(sides, d, fhi[:, d])
+            I += [f[i] for i in Id]
+            J += Jd
+    I = np.concatenate(I)
+    faces = csr_matrix((np.ones(len(I)), (I, np.concatenate(J))), shape=(Nfaces, Nedges))
+
+    return nodes, edges, lengths, faces, faceBox, areas, cells, volumes
+
+
+def lattice_index(coord, values):
+    # Index of the values in the sorted (ascending or descending) coordinates; -1 if not a coordinate
+    ascending = coord if coord[0] <= coord[-1] else coord[::-1]
+    ind = np.minimum(np.searchsorted(ascending, values), len(coord) - 1)
+    ind[ascending[ind] != values] = -1
+    if ascending is not coord:
+        ind[ind >= 0] = len(coord) - 1 - ind[ind >= 0]
+    return ind
+
+
+def cell_sides(lo, hi, d):
+    # Starting corners of the four sides of orientation d of the cells
+    a, b = [j for j in range(3) if j != d]
+    sides = []
+    for sa in (lo, hi):
+        for sb in (lo, hi):
+            start = lo.copy()
+            start[:, a] = sa[:, a]
+            start[:, b] = sb[:, b]
+            sides.append(start)
+    return sides
@@ -0,0 +1,245 @@
+import os
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse import spdiags
+from scipy.sparse import triu
+from PyPardiso import PyPardiso
+
+from formRESnetMatrix import formRESnetMatrix
+
+
+def invertRESnet(nodeX, nodeY, nodeZ, edges, Cell2Edge, sources, receivers, dobs, std, cellCon0, active=None,
+                 Cfixed=0, Cg=None, mref=None, alphas=(1e-4, 1, 1, 1), beta0=None, coolingFactor=2, maxIter=10,
+                 cgIter=20, cgTol=1e-2, targetMisfit=None, checkpoint=None, verbose=False):
+    """
+    Invert potential difference data for the cell conductivity of a
+    rectilinear mesh by matrix-free Gauss-Newton iterations.
+
+    Parameters:
+    -----------
+    nodeX, nodeY, nodeZ: numpy.ndarray
+        node locations in X, Y, Z of the rectilinear mesh
+    edges: numpy.ndarray
+        a 2-column matrix of node index for the edges
+    Cell2Edge: scipy.sparse.csr_matrix
+        the mapping from cell conductivity to conductance on edges
+        (formCell2EdgeMatrix)
+    sources: numpy.ndarray
+        a Nnodes x Ntx matrix of the current sources on the nodes
+    receivers: list
+        Ntx sparse matrices (Nnodes x Ndata of each source set) that form the
+        data from the potentials (see calcSensitivity)
+    dobs: numpy.ndarray
+        a vector of the observed data, all the source sets stacked in order
+    std: numpy.ndarray
+        the standard deviation of the data (scalar or vector)
+    cellCon0: numpy.ndarray
+        the starting cell conductivity (S/m); the inactive cells keep it
+    active: numpy.ndarray
+        a boolean vector of the cells to invert for, e.g. the cells below the
+        surface (default is all cells)
+    Cfixed: numpy.ndarray
+        conductance on edges from objects not inverted for, e.g. Ce + Cf of
+        known infrastructure (default is 0)
+    Cg: numpy.ndarray
+        conductance from each node to the ground at infinity (see solveRESnet)
+    mref: numpy.ndarray
+        the reference model of log-conductivity of the active cells (default
+        is the starting model)
+    alphas: tuple
+        weights of the smallness and the x, y, z smoothness terms (default is
+        (1e-4, 1, 1, 1))
+    beta0: float
+        the starting trade-off parameter (default balances the data misfit and
+        the regularization on a random model perturbation)
+    coolingFactor: float
+        beta is divided by coolingFactor after every iteration (default is 2)
+    maxIter: int
+        maximum number of Gauss-Newton iterations (default is 10)
+    cgIter: int
+        maximum number of conjugate gradient iterations per step (default is 20)
+    cgTol: float
+        relative residual of the conjugate gradient solution (default is 1e-2)
+    targetMisfit: float
+        stop when the data misfit falls below (default is the number of data)
+    checkpoint: str
+        a file saved (in .npz format, under exactly this name) after every
+        iteration; the inversion resumes from it if it exists
+    verbose: bool
+        print the misfits of every iteration (default is False); they are
+        returned in history either way
+
+    Returns:
+    --------
+    cellCon: numpy.ndarray
+        the recovered cell conductivity (S/m)
+    data: numpy.ndarray
+        the predicted data of the recovered model
+    history: dict
+        'phi_d', 'phi_m' and 'beta' of every iteration
+
+    Note:
+    -----
+    The model is m = ln(cellCon) on the active cells. The Gauss-Newton system
+    (J' Wd' Wd J + beta Wm' Wm) dm = -g is solved by conjugate gradients
+    using only J * v and J' * w, which cost one forward or adjoint solve per
+    source set with the factorization of the current model; J is never
+    formed, so memory grows with the mesh and not with data x cells.
+    """
+
+    Ntx = sources.shape[1]
+    Ncells = Cell2Edge.shape[1]
+    if active is None:
+        active = np.ones(Ncells, dtype=bool)
+    Ndata = np.array([r.shape[1] for r in receivers])
+    offsets = np.concatenate(([0], np.cumsum(Ndata)))
+    Wd = 1 / (np.zeros(offsets[-1]) + std)
+    if targetMisfit is None:
+        targetMisfit = offsets[-1]
+
+    Cell2EdgeActive = Cell2Edge[:, np.flatnonzero(active)]
+    m = np.log(cellCon0[active])
+    if mref is None:
+        mref = m.copy()
+    R = form_regularization(nodeX, nodeY, nodeZ, active, alphas)
+
+    def forward(m):
+        # Factorize the network of a model and compute the potentials and data
+        cellCon = cellCon0.copy()
+        cellCon[active] = np.exp(m)
+        C = np.zeros(edges.shape[0])
+        C[:Cell2Edge.shape[0]] = Cell2Edge @ cellCon
+        C[:np.size(Cfixed)] += Cfixed
+        G, A = formRESnetMatrix(edges, C, Cg)
+        solver = PyPardiso(triu(A, format='csr'), matrix_type=2)
+        potentials = np.reshape(solver.solve(sources.astype(np.float64)), (-1, Ntx))
+        data = np.concatenate([receivers[i].T @ potentials[:, i] for i in range(Ntx)])
+        return {'solver': solver, 'G': G, 'fields': G @ potentials, 'data': data, 'cellCon': cellCon,
+                'sigma': np.exp(m)}
+
+    def Jvec(state, v):
+        # Data perturbation of a model perturbation: one forward solve per source set
+        G = state['G']
+        dC = Cell2EdgeActive @ (state['sigma'] * v)
+        dC = np.pad(dC, (0, G.shape[0] - len(dC)))
+        rhs = -(G.T @ (dC[:, np.newaxis] * state['fields']))
+        du = np.reshape(state['solver'].solve(rhs), (-1, Ntx))
+        return np.concatenate([receivers[i].T @ du[:, i] for i in range(Ntx)])
+
+    def Jtvec(state, w):
+        # Model gradient of a data weighting: one adjoint solve per source set
+        G = state['G']
+        rhs = np.column_stack([receivers[i] @ w[offsets[i]:offsets[i + 1]] for i in range(Ntx)])
+        adjoint = np.reshape(state['solver'].solve(rhs), (-1, Ntx))
+        gC = -np.sum((G @ adjoint) * state['fields'], axis=1)
+        return state['sigma'] * (Cell2EdgeActive.T @ gC[:Cell2EdgeActive.shape[0]])
+
+    # Resume from the checkpoint
+    history = {'phi_d': [], 'phi_m': [], 'beta': []}
+    start = 0
+    beta = beta0
+    if checkpoint is not None and os.path.exists(checkpoint):
+        saved = np.load(checkpoint)
+        m = saved['m']
+        beta = float(saved['beta'])
+        start = int(saved['iteration'])
+        history = {'phi_d': list(saved['phi_d']), 'phi_m': list(saved['phi_m']), 'beta': list(saved['beta_history'])}
+
+    state = forward(m)
+    for iteration in range(start, maxIter):
+        r = Wd * (state['data'] - dobs)
+        phi_d = r @ r
+        phi_m = (m - mref) @ (R @ (m - mref))
+        if beta is None:
+            x = np.random.default_rng(0).standard_normal(len(m))
+            Jx = Wd * Jvec(state, x)
+            beta = (Jx @ Jx) / (x @ (R @ x))
+        history['phi_d'].append(phi_d)
+        history['phi_m'].append(phi_m)
+        history['beta'].append(beta)
+        if verbose:
+            print(f"Iteration {iteration}: phi_d = {phi_d:.4g}, phi_m = {phi_m:.4g}, beta = {beta:.4g}")
+        if phi_d <= targetMisfit:
+            break
+
+        # Gauss-Newton step by conjugate gradients
+        g = Jtvec(state, Wd * r) + beta * (R @ (m - mref))
+        dm = conjugate_gradient(lambda v: Jtvec(state, Wd ** 2 * Jvec(state, v)) + beta * (R @ v), -g, cgIter, cgTol)
+
+        # Backtracking line search on the objective function
+        phi = phi_d + beta * phi_m
+        step = 1
+        for _ in range(6):
+            trial = forward(m + step * dm)
+            rt = Wd * (trial['data'] - dobs)
+            mt = m + step * dm - mref
+            if rt @ rt + beta * (mt @ (R @ mt)) < phi:
+                break
+            trial['solver'].release()
+            trial = None
+            step /= 2
+        if trial is None:
+            break  # no descent along the step
+        state['solver'].release()
+        state = trial
+        m = m + step * dm
+        beta /= coolingFactor
+
+        if checkpoint is not None:
+            # Through a file handle np.savez keeps the name as given; replaced whole so a crash leaves the last one
+            with open(checkpoint + '.tmp', 'wb') as f:
+                np.savez(f, m=m, beta=beta, iteration=iteration + 1, phi_d=history['phi_d'],
+                         phi_m=history['phi_m'], beta_history=history['beta'])
+            os.replace(checkpoint + '.tmp', checkpoint)
+
+    state['solver'].release()  # Release memory
+    return state['cellCon'], state['data'], history
+
+
+def form_regularization(nodeX, nodeY, nodeZ, active, alphas):
+    # Wm' * Wm of the smallness and first-order smoothness on the active cells of the rectilinear grid
+    hx = np.diff(nodeX)
+    hy = np.diff(nodeY)
+    hz = -np.diff(nodeZ)
+    Nx, Ny, Nz = len(hx), len(hy), len(hz)
+    index = np.arange(Nx * Ny * Nz).reshape(Ny, Nx, Nz)  # count in z, then x, then y
+    volumes = (hy[:, np.newaxis, np.newaxis] * hx[np.newaxis, :, np.newaxis] * hz[np.newaxis, np.newaxis, :]).ravel()
+
+    R = alphas[0] * spdiags(volumes[active], 0, np.sum(active), np.sum(active))
+    newIndex = np.cumsum(active) - 1
+    pairs = ((alphas[1], index[:, :-1, :], index[:, 1:, :], ((hx[:-1] + hx[1:]) / 2)[np.newaxis, :, np.newaxis]),
+             (alphas[2], index[:-1, :, :], index[1:, :, :], ((hy[:-1] + hy[1:]) / 2)[:, np.newaxis, np.newaxis]),
+             (alphas[3], index[:, :, :-1], index[:, :, 1:], ((hz[:-1] + hz[1:]) / 2)[np.newaxis, np.newaxis, :]))
+    for alpha, c1, c2, distance in pairs:
+        distance = np.broadcast_to(distance, c1.shape).ravel()
+        c1, c2 = c1.ravel(), c2.ravel()
+        both = active[c1] & active[c2]
+        c1, c2, distance = c1[both], c2[both], distance[both]
+        weight = np.sqrt((volumes[c1] + volumes[c2]) / 2) / distance
+        Nrows = len(c1)
+        D = csr_matrix((np.concatenate((-weight, weight)),
+                        (np.tile(np.arange(Nrows), 2), np.concatenate((newIndex[c1], newIndex[c2])))),
+                       shape=(Nrows, np.sum(active)))
+        R = R + alpha * (D.T @ D)
+    return R.tocsr()
+
+
+def conjugate_gradient(Aop, b, maxIter, tol):
+    # Plain conjugate gradients for the symmetric positive definite Gauss-Newton system
+    x = np.zeros_like(b)
+    r = b.copy()
+    p = r.copy()
+    rr = r @ r
+    stop = tol ** 2 * rr
+    for _ in range(maxIter):
+        Ap = Aop(p)
+        alpha = rr / (p @ Ap)
+        x += alpha * p
+        r -= alpha * Ap
+        rrNew = r @ r
+        if rrNew <= stop:
+            break
+        p = r + rrNew / rr * p
+        rr = rrNew
+    return x
@@ -0,0 +1,123 @@
+import numpy as np
+
+
+def makeTreeMeshModelBlocks(nodes, edges, faceBox, cellBox, blkLoc, blkVal, bkgCellVal=0, bkgFaceVal=0,
+                            bkgEdgeVal=0):
+    """
+    Make edgeCon, faceCon, cellCon models on a tree mesh using blocks
+
+    Parameters:
+    -----------
+    nodes, edges, faceBox: numpy.ndarray
+        the nodes, edges and faces' range of the tree mesh as returned by
+        formTreeMeshConnectivity(cellBox)
+    cellBox: numpy.ndarray
+        A Ncells x 6 matrix of the cells' range [xmin xmax ymin ymax zmax zmin]
+        (see formTreeMesh)
+    blkLoc: numpy.ndarray
+        A Nblock x 6 matrix whose columns are [xmin xmax ymin ymax zmax zmin]
+        specifying the range of the block; if the range of any dimension is zero,
+        that dimension vanishes to represent a thin object; one dimension vanishes
+        for 2D sheet object; two dimensions vanish for 1D line object; point object
+        not allowed.
+    blkVal: numpy.ndarray
+        A vector specifying the physical property values of the blocks.
+    bkgCellVal: list
+        Background model values defined at cell centers; can be a scalar for
+        the whole-space or a vector; treat empty [] as 0. (default is 0)
+    bkgFaceVal: list
+        Background model values defined at cell faces; can be a scalar for
+        the whole-space or a vector; treat empty [] as 0. (default is 0)
+    bkgEdgeVal: list
+        Background model values defined at cell edges; can be a scalar for
+        the whole-space or a vector; treat empty [] as 0. (default is 0)
+
+    Returns:
+    --------
+    cellVal: numpy.ndarray
+        A vector of physical property values defined on all cells
+    faceVal: numpy.ndarray
+        A vector of physical property values defined on all faces (cellVal * thickness)
+    edgeVal: numpy.ndarray
+        A vector of physical property values defined on all edges (cellVal * cross-sectional area)
+
+    Notes:
+    ------
+    Same as makeRectMeshModelBlocks with the objects ordered as in
+    formTreeMeshConnectivity. Block boundaries snap to the nearest node
+    coordinate of the tree mesh, so thin objects should lie in refined
+    regions to be represented by short edges and small faces.
+    """
+
+    Nedges = edges.shape[0]
+    Nfaces = faceBox.shape[0]
+    Ncells = cellBox.shape[0]
+    nodeX = np.unique(nodes[:, 0])
+    nodeY = np.unique(nodes[:, 1])
+    nodeZ = np.unique(nodes[:, 2])[::-1]
+
+    if not np.any(bkgCellVal):
+        bkgCellVal = 0
+    if not np.any(bkgFaceVal):
+        bkgFaceVal = 0
+    if not np.any(bkgEdgeVal):
+        bkgEdgeVal = 0
+    edgeVal = np.zeros(Nedges) + bkgEdgeVal
+    faceVal = np.zeros(Nfaces) + bkgFaceVal
+    cellVal = np.zeros(Ncells) + bkgCellVal
+
+    # Replace inf with the outmost boundary
+    blkLoc = np.atleast_2d(np.array(blkLoc, dtype=np.float64))
+    blkLoc[blkLoc[:, 0] == -np.inf, 0] = nodeX[0]
+    blkLoc[blkLoc[:, 1] == np.inf, 1] = nodeX[-1]
+    blkLoc[blkLoc[:, 2] == -np.inf, 2] = nodeY[0]
+    blkLoc[blkLoc[:, 3] == np.inf, 3] = nodeY[-1]
+    blkLoc[blkLoc[:, 4] == np.inf, 4] = nodeZ[0]
+    blkLoc[blkLoc[:, 5] == -np.inf, 5] = nodeZ[-1]
+
+    # Pre-screen to identify object types: 1D, 2D or 3D
+    dim = np.vstack((~(abs(blkLoc[:, 0] - blkLoc[:, 1]) == 0), ~(abs(blkLoc[:, 2] - blkLoc[:, 3]) == 0),
+                     ~(abs(blkLoc[:, 4] - blkLoc[:, 5]) == 0))).T
+    objType = np.sum(dim, axis=1)  # dimensionality = 3 for volume, 2 for sheet, 1 for string
+
+    # Object center positions
+    edgesCenter = 1 / 2 * (nodes[edges[:, 0] - 1, :] + nodes[edges[:, 1] - 1, :])
+    facesCenter = np.column_stack(((faceBox[:, 0] + faceBox[:, 1]) / 2, (faceBox[:, 2] + faceBox[:, 3]) / 2,
+                                   (faceBox[:, 4] + faceBox[:, 5]) / 2))
+    cellsCenter = np.column_stack(((cellBox[:, 0] + cellBox[:, 1]) / 2, (cellBox[:, 2] + cellBox[:, 3]) / 2,
+                                   (cellBox[:, 4] + cellBox[:, 5]) / 2))
+
+    # Loop over blocks to make additions
+    Nblk = blkLoc.shape[0]
+    tol = 0.001  # allow small inaccuracy when locating sheets and lines
+
+    for i in range(Nblk):
+        xmin = nodeX[np.argmin(np.abs(nodeX - np.min(blkLoc[i, 0:2])))]
+        xmax = nodeX[np.argmin(np.abs(nodeX - np.max(blkLoc[i, 0:2])))]
+        ymin = nodeY[np.argmin(np.abs(nodeY - np.min(blkLoc[i, 2:4])))]
+        ymax = nodeY[np.argmin(np.abs(nodeY - np.max(blkLoc[i, 2:4])))]
+        zmax = nodeZ[np.argmin(np.abs(nodeZ - np.max(blkLoc[i, 4:6])))]
+        zmin = nodeZ[np.argmin(np.abs(nodeZ - np.min(blkLoc[i, 4:6])))]
+
+        if objType[i] == 3:  # volume -> add to cellCon
+            ind = (cellsCenter[:, 0] >= xmin) & (cellsCenter[:, 0] <= xmax) & \
+                  (cellsCenter[:, 1] >= ymin) & (cellsCenter[:, 1] <= ymax) & \
+                  (cellsCenter[:, 2] <= zmax) & (cellsCenter[:, 2] >= zmin)
+            cellVal[ind] = blkVal[i]
+
+        elif objType[i] == 2:  # sheet -> add to faceCon
+            ind = (facesCenter[:, 0] >= xmin - tol) & (facesCenter[:, 0] <= xmax + tol) & \
+                  (facesCenter[:, 1] >= ymin - tol) & (facesCenter[:, 1] <= ymax + tol) & \
+                  (facesCenter[:, 2] <= zmax + tol) & (facesCenter[:, 2] >= zmin - tol)
+            faceVal[ind] = blkVal[i]
+
+        elif objType[i] == 1:  # string -> add to edgeCon
+            ind = (edgesCenter[:, 0] >= xmin - tol) & (edgesCenter[:, 0] <= xmax + tol) & \
+                  (edgesCenter[:, 1] >= ymin - tol) & (edgesCenter[:, 1] <= ymax + tol) & \
+                  (edgesCenter[:, 2] <= zmax + tol) & (edgesCenter[:, 2] >= zmin - tol)
+            edgeVal[ind] = blkVal[i]
+
+        elif objType[i] == 0:  # point -> no action
+            pass
+
+    return cellVal, faceVal, edgeVal
@@ -1,11 +1,17 @@
+import time
+import warnings
+
 import numpy as np
-from scipy.sparse import csr_matrix
+from scipy.linalg import eigh
 from scipy.sparse import spdiags
 from scipy.sparse import triu
 from PyPardiso import PyPardiso
 
+from formRESnetMatrix import formRESnetMatrix
+
 
-def solveRESnet(edges, C, sources):
+def solveRESnet(edges, C, sources, Cg=None, solver='pardiso', warmStart=None, tol=1e-10, maxIter=None,
+                blockSize=32, Ndeflation=20, precision='double', info=None, filename=None):
     """
     Solve an arbitrary 3D resistor network circuit problem using the potential's
     formulation and Kirchoff's current law.
@@ -20,46 +26,117 @@ def solveRESnet(edges, C, sources):
         A vector of conductance values on edges.
     sources: numpy.ndarray
         A vector for the source (current injection amplitude at each node).
+    Cg: numpy.ndarray
+        A vector of conductance from each node to the ground at infinity, e.g.
+        the mixed boundary condition of formMixedBoundaryConductances; if not
+        given, the first node is grounded.
+    solver: str
+        'pardiso' for the direct solver (default), 'pcg' for conjugate
+        gradients preconditioned by the factorization of an earlier monitoring
+        cycle (see warmStart), or 'blockcg' for factorization-free block
+        conjugate gradients with Jacobi preconditioning and deflation, for
+        many sources on meshes too large to factorize.
+    warmStart: dict
+        Time-lapse state for solver='pcg', updated in place: pass the same
+        (initially empty) dict every monitoring cycle. The previous potentials
+        are the initial guess and the factorization of the last rebuilt cycle
+        is the preconditioner; it is rebuilt for the next cycle once a cycle
+        takes more than maxIter/2 iterations with it, or at once if one does
+        not converge. After the solve it also holds 'iterations', 'rebuilt',
+        'setupTime' and 'solveTime' of the cycle; release the memory with
+        warmStart['factorization'].release() after the last cycle. For
+        solver='blockcg' it carries the deflation vectors to the next call and
+        also holds 'iterations', 'matvecs' and 'solveTime'.
+    tol: float
+        Relative residual of the iterative solution (default is 1e-10).
+    maxIter: int
+        Maximum number of iterations of the iterative solution: before the
+        preconditioner is rebuilt for 'pcg' (default is 20), per block of
+        sources for 'blockcg' (default is 5000).
+    blockSize: int
+        Number of sources iterated together by 'blockcg' (default is 32).
+    Ndeflation: int
+        Number of deflation vectors recycled by 'blockcg' from one block of
+        sources to the next, and across calls through warmStart (default is
+        20).
+    precision: str
+        'double' (default) or 'single' for solver='pardiso': the factor is
+        computed and stored in single precision (half the memory) and the
+        solution is refined in double precision against A until its relative
+        residual is below tol (at most maxIter refinements, default is 20).
+    info: dict
+        Filled with 'refinements' and 'residual' (the largest relative
+        residual of the sources) of precision='single'.
+    filename: str
+        If given, the results are written one source (column) at a time to
+        the .npy files filename + '_potentials.npy', '_potentialDiffs.npy'
+        and '_currents.npy' (column-major on disk) and returned as read-only
+        memory maps, so that only one column of the edge results is in memory
+        at a time and the results are read lazily afterwards.
 
     Returns
     -------
     potentials : numpy.ndarray
-        Electric potentials on each node (assume zero potential at the first node).
+        Electric potentials on each node (assume zero potential at the first node,
+        or zero potential at infinity if Cg is given).
     potentialDiffs : numpy.ndarray
         Potential drops across each edge (branch).
     currents : numpy.ndarray
         Current flowing along each edge (branch).
     """
 
-    Nnodes = np.max(edges)  # # of nodes
     Nedges = edges.shape[0]  # # of edges
 
-    # Form potential difference matrix (node to edge), a.k.a. gradient operator
-    I = np.kron(np.arange(1, Nedges+1), [[1], [1]])
-    J = edges.T
-    S = np.kron(np.ones(Nedges), [[1], [-1]])
-    G = csr_matrix((S.flatten(), (I.flatten()-1, J.flatten()-1)), shape=(Nedges, Nnodes))
-
+    # Form potential difference matrix (node to edge) and the system matrix
+    G, A_csr = formRESnetMatrix(edges, C, Cg)
     Cdiag = spdiags(C, 0, Nedges, Nedges)
-    E = csr_matrix(([1], ([0], [0])), shape=(Nnodes, Nnodes))
-    G_csc = G.tocsc()
-    E_csc = E.tocsc()
-    A_csr = G_csc.T @ Cdiag @ G_csc + E_csc
-    A_upper_triangular = triu(A_csr, format='csr')
-
-    # Matrix factorization and Solve for multiple rhs
-    pardiso_solver = PyPardiso(A_upper_triangular, matrix_type=2)
-    if sources.shape[1] == 1:
-        potentials = pardiso_solver.solve(sources)
+    potentialsFile = None  # memory map of the potentials written to filename
+
+    if solver == 'pcg':
+        state = {} if warmStart is None else warmStart
+        potentials = solve_pcg(A_csr, sources, state, tol, 20 if maxIter is None else maxIter)
+        if warmStart is None:
+            state['factorization'].release()  # Release memory
+    elif solver == 'blockcg':
+        state = {} if warmStart is None else warmStart
+        potentials = solve_blockcg(A_csr, sources, state, tol, 5000 if maxIter is None else maxIter, blockSize,
+                                   Ndeflation)
+    elif solver == 'pardiso':
+        if precision not in ('double', 'single'):
+            raise ValueError("precision must be 'double' or 'single'")
+        A_upper_triangular = triu(A_csr, format='csr')
+
+        # Matrix factorization and Solve for multiple rhs
+        pardiso_solver = PyPardiso(A_upper_triangular, matrix_type=2, single_precision=(precision == 'single'))
+        if precision == 'single':
+            potentials = refine(A_csr, pardiso_solver, sources, {} if info is None else info, tol,
+                                20 if maxIter is None else maxIter)
+        elif filename is not None:
+            potentialsFile = open_result(filename, 'potentials', sources.shape)
+            for i in range(sources.shape[1]):
+                potentialsFile[:, i] = pardiso_solver.solve(sources[:, i].astype(np.float64))
+                potentialsFile.flush()
+            potentials = potentialsFile
+        elif sources.shape[1] == 1:
+            potentials = pardiso_solver.solve(sources)
+        else:
+            potentials_tmp = []
+            for i in range(sources.shape[1]):
+                source = sources[:, i]
+                source = source.astype(np.float64)
+                potentials_tmp.append(pardiso_solver.solve(source))
+            potentials = [list(column) for column in zip(*potentials_tmp)]
+            potentials = np.array(potentials)
+        pardiso_solver.release()  # Release memory
     else:
-        potentials_tmp = []
-        for i in range(sources.shape[1]):
-            source = sources[:, i]
-            source = source.astype(np.float64)
-            potentials_tmp.append(pardiso_solver.solve(source))
-        potentials = [list(column) for column in zip(*potentials_tmp)]
-        potentials = np.array(potentials)
-    pardiso_solver.release()  # Release memory
+        raise ValueError("solver must be 'pardiso', 'pcg' or 'blockcg'")
+
+    if filename is not None:
+        if potentialsFile is None:  # solved in memory
+            potentialsFile = open_result(filename, 'potentials', (G.shape[1], np.size(potentials) // G.shape[1]))
+            potentialsFile[:] = np.reshape(potentials, potentialsFile.shape)
+            potentialsFile.flush()
+        return write_results(filename, G, C, potentialsFile)
 
     # Compute potential difference (E field) on all edges
     potentialDiffs = G @ potentials
@@ -68,3 +145,213 @@ def solveRESnet(edges, C, sources):
     currents = Cdiag @ potentialDiffs
 
     return potentials, potentialDiffs, currents
+
+
+def open_result(filename, name, shape):
+    # A new column-major .npy file of the results opened as a writable memory map
+    return np.lib.format.open_memmap(filename + '_' + name + '.npy', mode='w+', dtype=np.float64,
+                                     shape=tuple(int(n) for n in shape), fortran_order=True)
+
+
+def write_results(filename, G, C, potentials):
+    # Write the edge results of the potentials (the memory map of open_result) column by column and
+    # reopen all of them read-only
+    potentialDiffs = open_result(filename, 'potentialDiffs', (G.shape[0], potentials.shape[1]))
+    currents = open_result(filename, 'currents', (G.shape[0], potentials.shape[1]))
+    for i in range(potentials.shape[1]):
+        potentialDiffs[:, i] = G @ potentials[:, i]
+        currents[:, i] = C * potentialDiffs[:, i]
+        potentialDiffs.flush()
+        currents.flush()
+    del potentials, potentialDiffs, currents
+
+    return tuple(np.load(filename + '_' + name + '.npy', mmap_mode='r')
+                 for name in ('potentials', 'potentialDiffs', 'currents'))
+
+
+def refine(A, factorization, sources, info, tol, maxIter):
+    # Iterative refinement in double precision of the solutions from a single precision factorization
+    sources = np.reshape(sources, (A.shape[0], -1)).astype(np.float64)
+    norms = np.linalg.norm(sources, axis=0)
+    norms[norms == 0] = 1
+    potentials = np.zeros_like(sources)
+    residuals = sources
+    residual = np.inf
+    for k in range(1, maxIter + 1):
+        potentials += np.reshape(factorization.solve(residuals), sources.shape)
+        residuals = sources - A @ potentials
+        residual, previous = np.max(np.linalg.norm(residuals, axis=0) / norms), residual
+        if residual <= tol or residual > previous / 2:
+            break  # converged or stagnated at the round-off of the double precision residual
+    if residual > tol:
+        warnings.warn('Iterative refinement reached a relative residual of %g' % residual)
+    info['refinements'] = k
+    info['residual'] = residual
+    return potentials
+
+
+def solve_pcg(A, sources, warmStart, tol, maxIter):
+    # Conjugate gradients preconditioned by the factorization of an earlier cycle, state kept in warmStart
+    Nnodes = A.shape[0]
+    sources = np.reshape(sources, (Nnodes, -1)).astype(np.float64)
+
+    x0 = warmStart.get('potentials')
+    if x0 is None or x0.shape != sources.shape:
+        x0 = np.zeros_like(sources)
+
+    start_time = time.time()
+    setup_time = 0
+    rebuilt = False
+    if warmStart.get('factorization') is None or warmStart.get('Nnodes') != Nnodes or warmStart.get('degraded'):
+        setup_time += refactorize(A, warmStart)
+        rebuilt = True
+
+    potentials, k, converged = pcg(A, sources, x0, warmStart['factorization'].solve, tol, maxIter)
+    iterations = k
+    if not converged:
+        # The model drifted too far from the factorized one: refactorize and finish from here
+        setup_time += refactorize(A, warmStart)
+        rebuilt = True
+        potentials, k, converged = pcg(A, sources, potentials, warmStart['factorization'].solve, tol, maxIter)
+        iterations += k
+        if not converged:
+            warnings.warn('PCG did not converge in %d iterations' % maxIter)
+
+    warmStart['potentials'] = potentials
+    warmStart['iterations'] = iterations
+    warmStart['degraded'] = k > maxIter // 2  # iterations with the current factorization
+    warmStart['rebuilt'] = rebuilt
+    warmStart['setupTime'] = setup_time
+    warmStart['solveTime'] = time.time() - start_time - setup_time
+    return potentials
+
+
+def refactorize(A, warmStart):
+    # Replace the preconditioner with the Cholesky factorization of the current matrix
+    start_time = time.time()
+    if warmStart.get('factorization') is not None:
+        warmStart['factorization'].release()
+    warmStart['factorization'] = PyPardiso(triu(A, format='csr'), matrix_type=2)
+    warmStart['Nnodes'] = A.shape[0]
+    return time.time() - start_time
+
+
+def pcg(A, B, X, M, tol, maxIter):
+    # Solve A * X = B for all the columns at once from the initial guess X to the relative residual tol
+    R = B - A @ X
+    stop = tol * np.linalg.norm(B, axis=0)
+    if np.all(np.linalg.norm(R, axis=0) <= stop):
+        return X, 0, True
+    Z = np.reshape(M(R), R.shape)
+    P = Z.copy()
+    rz = np.sum(R * Z, axis=0)
+    for k in range(1, maxIter + 1):
+        AP = A @ P
+        pAp = np.sum(P * AP, axis=0)
+        alpha = np.divide(rz, pAp, out=np.zeros_like(rz), where=pAp != 0)
+        X = X + alpha * P
+        R = R - alpha * AP
+        if np.all(np.linalg.norm(R, axis=0) <= stop):
+            return X, k, True
+        Z = np.reshape(M(R), R.shape)
+        rzNew = np.sum(R * Z, axis=0)
+        P = Z + np.divide(rzNew, rz, out=np.zeros_like(rz), where=rz != 0) * P
+        rz = rzNew
+    return X, maxIter, False
+
+
+def solve_blockcg(A, sources, warmStart, tol, maxIter, blockSize, Ndeflation):
+    # Block conjugate gradients over blocks of sources, recycling a deflation space kept in warmStart
+    Nnodes = A.shape[0]
+    sources = np.reshape(sources, (Nnodes, -1)).astype(np.float64)
+    d = A.diagonal()
+    M = lambda R: R / d[:, np.newaxis]
+
+    W = warmStart.get('deflation')
+    if W is not None and W.shape[0] != Nnodes:
+        W = None
+
+    start_time = time.time()
+    potentials = np.zeros_like(sources)
+    iterations = 0
+    matvecs = 0
+    for j0 in range(0, sources.shape[1], blockSize):
+        j1 = min(j0 + blockSize, sources.shape[1])
+        X, k, m, V = block_cg(A, sources[:, j0:j1], M, W, tol, maxIter, 4 * Ndeflation)
+        potentials[:, j0:j1] = X
+        iterations += k
+        matvecs += m
+        if Ndeflation > 0:
+            W, m = update_deflation(A, d, W, V, Ndeflation)
+            matvecs += m
+
+    warmStart['potentials'] = potentials
+    warmStart['deflation'] = W
+    warmStart['iterations'] = iterations
+    warmStart['matvecs'] = matvecs
+    warmStart['solveTime'] = time.time() - start_time
+    return potentials
+
+
+def block_cg(A, B, M, W, tol, maxIter, Nkeep=0):
+    # Breakdown-free block PCG (A-orthonormal search blocks, dependent directions dropped), deflated by W;
+    # the first Nkeep search directions are returned for the next deflation space
+    if W is None:
+        project = lambda Z: Z
+        X = np.zeros_like(B)
+        matvecs = 0
+    else:
+        AW = A @ W
+        E = W.T @ AW
+        project = lambda Z: Z - W @ np.linalg.solve(E, AW.T @ Z)
+        X = W @ np.linalg.solve(E, W.T @ B)  # Galerkin initial guess on the deflation space
+        matvecs = W.shape[1]
+    R = B - A @ X
+    matvecs += B.shape[1]
+    stop = tol * np.linalg.norm(B, axis=0)
+    P = np.zeros((B.shape[0], 0))
+    Q = np.zeros((B.shape[0], 0))
+    kept = []
+    for k in range(maxIter + 1):
+        if np.all(np.linalg.norm(R, axis=0) <= stop):
+            return X, k, matvecs, np.hstack(kept + [X])
+        if k == maxIter:
+            break
+        Z = project(M(R))
+        P = orthonormalize(Z - P @ (Q.T @ Z))
+        Q = A @ P
+        matvecs += P.shape[1]
+        P, Q = A_normalize(P, Q)
+        if sum(V.shape[1] for V in kept) < Nkeep:
+            kept.append(P)
+        alpha = P.T @ R  # P is A-orthonormal, so the step is a projection
+        X = X + P @ alpha
+        R = R - Q @ alpha
+    warnings.warn('Block CG did not converge in %d iterations' % maxIter)
+    return X, maxIter, matvecs, np.hstack(kept + [X])
+
+
+def orthonormalize(Z):
+    # Orthonormal basis of the columns of Z, dropping the numerically dependent ones
+    lam, V = np.linalg.eigh(Z.T @ Z)
+    keep = lam > lam.max(initial=0) * 1e-20
+    Z = Z @ (V[:, keep] / np.sqrt(lam[keep]))
+    lam, V = np.linalg.eigh(Z.T @ Z)  # second pass for orthogonality
+    return Z @ (V / np.sqrt(lam))
+
+
+def A_normalize(P, Q):
+    # Rotate P (with Q = A * P) to be A-orthonormal
+    lam, V = np.linalg.eigh(P.T @ Q)
+    keep = lam > lam.max() * 1e-12
+    T = V[:, keep] / np.sqrt(lam[keep])
+    return P @ T, Q @ T
+
+
+def update_deflation(A, d, W, V, Ndeflation):
+    # Ritz vectors of the smallest eigenvalues of the Jacobi-preconditioned matrix on span(W, V), and
+    # the number of products with A spent on them
+    V = V if W is None else np.hstack((W, V))
+    V = orthonormalize(V)
+    lam, Y = eigh(V.T @ (A @ V), V.T @ (d[:, np.newaxis] * V))
+    return V @ Y[:, :Ndeflation], V.shape[1]
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse import spdiags
+from scipy.sparse import triu
+from PyPardiso import PyPardiso
+
+
+def solveRESnet2p5D(edges, C, Cy, sources, k, g, Nworkers=None):
+    """
+    Solve a 2.5D resistor network problem (strike-invariant model, point
+    sources) by solving one 2D network per wavenumber along strike and
+    recombining the results with the inverse cosine transform.
+
+    Parameters
+    ----------
+    edges: numpy.ndarray
+        A 2-column matrix of node index for the edges of the x-z network (see
+        form2p5DNetwork).
+    C: numpy.ndarray
+        A vector of in-plane conductance per unit strike length on edges.
+    Cy: numpy.ndarray
+        A vector of along-strike conductance on the nodes.
+    sources: numpy.ndarray
+        A matrix of point current sources at the nodes (one column per source
+        configuration); all electrodes are on the profile plane y = 0.
+    k: numpy.ndarray
+        Wavenumbers along strike (see calc2p5DWavenumbers).
+    g: numpy.ndarray
+        Quadrature weights of the wavenumbers (see calc2p5DWavenumbers).
+    Nworkers: int
+        Number of wavenumbers solved at the same time (default is all).
+
+    Returns
+    -------
+    potentials : numpy.ndarray
+        Electric potentials on each node of the profile plane.
+    potentialDiffs : numpy.ndarray
+        Potential drops across each edge (branch) of the profile plane.
+    currents : numpy.ndarray
+        Current per unit strike length flowing along each edge at y = 0 (A/m).
+    """
+
+    Nnodes = len(Cy)  # # of nodes
+    Nedges = edges.shape[0]  # # of edges
+    sources = np.asarray(sources, dtype=np.float64).reshape(Nnodes, -1)
+
+    # Form potential difference matrix (node to edge), a.k.a. gradient operator
+    I = np.kron(np.arange(1, Nedges+1), [[1], [1]])
+    J = edges.T
+    S = np.kron(np.ones(Nedges), [[1], [-1]])
+    G = csr_matrix((S.flatten(), (I.flatten()-1, J.flatten()-1)), shape=(Nedges, Nnodes))
+
+    Cdiag = spdiags(C, 0, Nedges, Nedges)
+    G_csc = G.tocsc()
+    A0 = G_csc.T @ Cdiag @ G_csc
+
+    # The transformed source of a point current is I/2 on the x-z plane
+    rhs = sources / 2
+
+    def solve_wavenumber(kj):
+        # The k^2 term grounds every node, so no reference node is needed
+        A = A0 + spdiags(kj ** 2 * Cy, 0, Nnodes, Nnodes)
+        pardiso_solver = PyPardiso(triu(A, format='csr'), matrix_type=2)
+        Uk = np.zeros_like(rhs)
+        for i in range(rhs.shape[1]):
+            Uk[:, i] = pardiso_solver.solve(np.ascontiguousarray(rhs[:, i]))
+        pardiso_solver.release()  # Release memory
+        return Uk
+
+    # Independent 2D problems, one per wavenumber
+    with ThreadPoolExecutor(max_workers=Nworkers or len(k)) as executor:
+        Uks = list(executor.map(solve_wavenumber, k))
+
+    # Inverse cosine transform at y = 0
+    potentials = np.zeros_like(rhs)
+    for gj, Uk in zip(g, Uks):
+        potentials += gj * Uk
+
+    # Compute potential difference (E field) on all edges
+    potentialDiffs = G @ potentials
+
+    # Compute current on all edges
+    currents = Cdiag @ potentialDiffs
+
+    return potentials, potentialDiffs, currents
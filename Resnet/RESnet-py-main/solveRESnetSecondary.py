@@ -0,0 +1,85 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse import spdiags
+
+from calcHalfspacePotentials import calcHalfspacePotentials
+from solveRESnet import solveRESnet
+
+
+def solveRESnetSecondary(nodes, edges, C, C0, con0, tx, zSurface=0, Cg=None):
+    """
+    Solve the resistor network problem for the secondary potentials, i.e. the
+    total potentials minus the analytic potentials of the sources in a uniform
+    half-space, which removes the source singularities from the network.
+
+    Parameters
+    ----------
+    nodes: numpy.ndarray
+        A 3-column matrix of X-Y-Z locations for the nodes.
+    edges: numpy.ndarray
+        A 2-column matrix of node index for the edges (branches).
+    C: numpy.ndarray
+        A vector of conductance values on edges.
+    C0: numpy.ndarray
+        A vector of conductance values on edges for the background half-space
+        model of conductivity con0 (e.g. Cell2Edge.dot(cellCon0)).
+    con0: float
+        Conductivity of the background half-space (S/m).
+    tx: list
+        Ntx sets of current electrodes in the format of [x y z current(Ampere)].
+    zSurface: float
+        Elevation of the air-earth interface (default is 0).
+    Cg: numpy.ndarray
+        Optional conductance from each node to the ground at infinity (see
+        solveRESnet).
+
+    Returns
+    -------
+    secondaryPotentials : numpy.ndarray
+        Secondary potentials on each node (one column per source set).
+    primaryPotentials : numpy.ndarray
+        Analytic half-space potentials on each node (singular values at the
+        electrodes are capped at a quarter of the shortest edge).
+    potentialDiffs : numpy.ndarray
+        Total potential drops across each edge (branch).
+    currents : numpy.ndarray
+        Total current flowing along each edge (branch).
+
+    Note
+    ----
+    The secondary potentials solve A * us = -(A - A0) * up. Data are best
+    formed by interpolating the secondary potentials at the receivers and
+    adding the analytic primary potentials there (calcHalfspacePotentials).
+    """
+
+    Nnodes = nodes.shape[0]  # # of nodes
+    Nedges = edges.shape[0]  # # of edges
+    Ntx = len(tx)  # # of source sets
+
+    # Form potential difference matrix (node to edge), a.k.a. gradient operator
+    I = np.kron(np.arange(1, Nedges+1), [[1], [1]])
+    J = edges.T
+    S = np.kron(np.ones(Nedges), [[1], [-1]])
+    G = csr_matrix((S.flatten(), (I.flatten()-1, J.flatten()-1)), shape=(Nedges, Nnodes))
+
+    # Primary potentials on the nodes
+    lengths = np.sqrt(np.sum((nodes[edges[:, 0] - 1, :] - nodes[edges[:, 1] - 1, :]) ** 2, axis=1))
+    primaryPotentials = np.zeros((Nnodes, Ntx))
+    for i in range(Ntx):
+        primaryPotentials[:, i] = calcHalfspacePotentials(nodes, tx[i], con0, zSurface, np.min(lengths) / 4)
+
+    # Source of the secondary problem: -(A - A0) * up, only where the model departs from the background
+    dCdiag = spdiags(C - C0, 0, Nedges, Nedges)
+    sources = -(G.T @ (dCdiag @ (G @ primaryPotentials)))
+
+    secondaryPotentials, potentialDiffs, currents = solveRESnet(edges, C, sources, Cg)
+    secondaryPotentials = np.reshape(secondaryPotentials, (Nnodes, Ntx))
+    potentialDiffs = np.reshape(potentialDiffs, (Nedges, Ntx))
+    currents = np.reshape(currents, (Nedges, Ntx))
+
+    # Add the primary contributions back on the edges
+    primaryDiffs = G @ primaryPotentials
+    potentialDiffs = potentialDiffs + primaryDiffs
+    currents = currents + spdiags(C, 0, Nedges, Nedges) @ primaryDiffs
+
+    return secondaryPotentials, primaryPotentials, potentialDiffs, currents
@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from PyPardiso import PyPardiso
+
+from formRESnetMatrix import formRESnetMatrix
+
+
+def solveRESnetSpectral(edges, C, sources, Cg=None, Nworkers=1):
+    """
+    Solve the resistor network problem at several frequencies with complex
+    edge admittances, e.g. for spectral induced polarization.
+
+    Parameters
+    ----------
+    edges: numpy.ndarray
+        A 2-column matrix of node index for the edges (branches).
+    C: numpy.ndarray
+        A Nedges x Nfreq matrix of complex admittance values on edges, one
+        column per frequency, e.g. Cell2Edge @ calcColeColeConductivity(...).
+    sources: numpy.ndarray
+        A Nnodes x Ntx matrix of the current sources on the nodes (the same at
+        all frequencies).
+    Cg: numpy.ndarray
+        Conductance from each node to the ground at infinity (see
+        solveRESnet), a vector or a Nnodes x Nfreq matrix; if not given, the
+        first node is grounded.
+    Nworkers: int
+        Number of frequencies factorized at the same time (default 1). Each
+        worker analyzes the pattern once and holds its own factorization in
+        memory, so more workers trade analyses and memory for concurrency;
+        PARDISO already uses all the cores within a factorization.
+
+    Returns
+    -------
+    potentials : numpy.ndarray
+        A Nnodes x Ntx x Nfreq array of the complex potentials on each node.
+    potentialDiffs : numpy.ndarray
+        A Nedges x Ntx x Nfreq array of the complex potential drops across
+        each edge (branch).
+    currents : numpy.ndarray
+        A Nedges x Ntx x Nfreq array of the complex current along each edge
+        (branch).
+
+    Note
+    ----
+    The system matrix is complex symmetric (not Hermitian) and is factorized
+    by PARDISO as matrix type 6. All the frequencies share the sparsity
+    pattern, which is formed once and, by default, analyzed once: every
+    frequency after the first is only refactorized numerically. The phase
+    of a datum, np.angle(data), is comparable to the phase of the field
+    spectra.
+    """
+
+    Nnodes = np.max(edges)  # # of nodes
+    C = np.reshape(C, (edges.shape[0], -1))
+    Nfreq = C.shape[1]
+    sources = np.reshape(sources, (Nnodes, -1))
+    Ntx = sources.shape[1]
+    if Cg is not None:
+        Cg = np.broadcast_to(np.reshape(Cg, (Nnodes, -1)), (Nnodes, Nfreq))
+
+    # Connectivity shared by all the frequencies
+    G, _ = formRESnetMatrix(edges, np.zeros(edges.shape[0]))
+    pattern, Edge2Upper, diagonal = form_upper_map(edges, Nnodes)
+
+    def upper_matrix(k):
+        # Upper triangle of the system matrix at the k-th frequency in the shared pattern
+        data = (Edge2Upper @ C[:, k]).astype(np.complex128)
+        if Cg is None:
+            data[diagonal[0]] += 1
+        else:
+            data[diagonal] += Cg[:, k]
+        return csr_matrix((data, pattern.indices, pattern.indptr), shape=(Nnodes, Nnodes))
+
+    potentials = np.zeros((Nnodes, Ntx, Nfreq), dtype=np.complex128)
+
+    def solve_frequencies(indices):
+        # One analysis, then a numerical factorization and solve per frequency
+        solver = None
+        for k in indices:
+            if solver is None:
+                solver = PyPardiso(upper_matrix(k), matrix_type=6)
+            else:
+                solver.refactorize(upper_matrix(k))
+            potentials[:, :, k] = np.reshape(solver.solve(sources), (Nnodes, Ntx))
+        if solver is not None:
+            solver.release()  # Release memory
+
+    with ThreadPoolExecutor(max_workers=Nworkers) as pool:
+        list(pool.map(solve_frequencies, np.array_split(np.arange(Nfreq), min(Nworkers, Nfreq))))
+
+    # Compute potential difference and current on all edges
+    potentialDiffs = np.stack([G @ potentials[:, :, k] for k in range(Nfreq)], axis=2)
+    currents = C[:, np.newaxis, :] * potentialDiffs
+
+    return potentials, potentialDiffs, currents
+
+
+def form_upper_map(edges, Nnodes):
+    # Sparsity pattern of the upper triangle of G' * diag(C) * G (with the full diagonal), the mapping
+    # from edge values to its data and the positions of the diagonal in the data
+    Nedges = edges.shape[0]
+    n1 = np.min(edges, axis=1) - 1
+    n2 = np.max(edges, axis=1) - 1
+    rows = np.concatenate((n1, n1, n2, np.arange(Nnodes)))
+    cols = np.concatenate((n2, n1, n2, np.arange(Nnodes)))
+    pattern = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(Nnodes, Nnodes))
+    pattern.sort_indices()
+
+    keys = np.repeat(np.arange(Nnodes, dtype=np.int64), np.diff(pattern.indptr)) * Nnodes + pattern.indices
+    position = np.searchsorted(keys, rows[:3 * Nedges].astype(np.int64) * Nnodes + cols[:3 * Nedges])
+    sign = np.concatenate((-np.ones(Nedges), np.ones(2 * Nedges))) * np.tile(n1 != n2, 3)
+    Edge2Upper = csr_matrix((sign, (position, np.tile(np.arange(Nedges), 3))), shape=(pattern.nnz, Nedges))
+    diagonal = np.searchsorted(keys, np.arange(Nnodes, dtype=np.int64) * (Nnodes + 1))
+
+    return pattern, Edge2Upper, diagonal